@@ -0,0 +1,222 @@
+"""
+Contrôle d'admission des lectures lourdes (protection mémoire du worker).
+
+Avant de lire, une route estime la mémoire qu'elle va mobiliser à partir des
+métadonnées du canal (n_rows, type de la colonne value, plage demandée). Les
+requêtes sont admises tant que la somme des estimations en cours tient dans
+un budget global; au-delà elles attendent leur tour (FIFO) jusqu'à un délai,
+puis sont refusées (503 + Retry-After côté API). Sous charge, le service
+ralentit et refuse proprement au lieu d'être tué par l'OOM killer.
+
+Une requête en attente occupe un thread du pool des routes synchrones: la
+file est plafonnée sous la taille de ce pool (voir main.lifespan), pour que
+les routes légères restent servies pendant que les lectures lourdes attendent.
+
+Pour chaque requête admise, le pic de RSS du processus pendant son exécution
+est relevé (échantillonnage en tâche de fond) et gardé dans un historique
+consultable, pour comparer estimation et consommation réelle.
+"""
+from __future__ import annotations
+from collections import deque
+import os
+import threading
+import time
+
+from .derived import parse_expression
+from .scan import is_transitions
+from .spectral import estimate_rows
+from .lazy import lazy_import
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+
+class AdmissionRejected(Exception):
+    """File d'attente pleine ou délai dépassé."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _rss_bytes() -> int | None:
+    """RSS courant du processus (Linux: /proc/self/statm), None si indisponible."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def row_bytes(ch) -> int:
+    """
+    Octets par ligne (time int64 + value) d'un canal, lus dans le schéma Parquet
+    si disponible, sinon d'après le type déclaré à l'ingestion (canal paresseux).
+    """
+    if ch.expression:
+        # float64 + temps, pour le résultat et pour chaque canal source évalué
+        _, refs, _ = parse_expression(ch.expression)
+        return 16 * (1 + len(refs))
+    if os.path.exists(ch.parquet_path):
+        vtype = pq.read_schema(ch.parquet_path).field("value").type
+    else:
+        try:
+            vtype = pa.type_for_alias(ch.value_type or "")
+        except ValueError:
+            return 16  # type inconnu (base antérieure): float64 supposé
+    try:
+        width = max(vtype.bit_width // 8, 1)
+    except ValueError:
+        width = 32  # type à taille variable (chaînes)
+    return 8 + width
+
+def needs_materialization(ch) -> bool:
+    """Canal ingéré en mode paresseux dont le Parquet n'est pas encore écrit."""
+    return not ch.expression and bool(ch.source_path) and not os.path.exists(ch.parquet_path)
+
+def estimate_materialize_bytes(ch, group_rows: int = 262_144, overhead: float = 1.0) -> int:
+    """
+    Mémoire de la conversion d'un canal paresseux (io_tdms.materialize_channel,
+    en flux): un row group lu dans le TDMS puis écrit; 0 si déjà matérialisé.
+    """
+    if not needs_materialization(ch):
+        return 0
+    return int(min(ch.n_rows, group_rows) * row_bytes(ch) * overhead)
+
+def estimate_read_rows(ch, start: float | None = None, end: float | None = None) -> int:
+    """Lignes d'un canal sur [start, end]: n_rows, ou estimation depuis le footer si la plage est bornée."""
+    if (start is not None or end is not None) and not ch.expression and os.path.exists(ch.parquet_path) \
+            and not is_transitions(ch.parquet_path):
+        return estimate_rows(ch.parquet_path, start, end)
+    return ch.n_rows
+
+def estimate_read_bytes(ch, start: float | None = None, end: float | None = None, overhead: float = 1.0) -> int:
+    """
+    Mémoire estimée pour lire un canal sur [start, end] (canal entier sans borne):
+    lignes (n_rows ou estimation depuis le footer) x octets par ligne x facteur
+    de copies (Arrow -> pandas, filtrages, sous-échantillonnage).
+    """
+    return int(estimate_read_rows(ch, start, end) * row_bytes(ch) * overhead)
+
+def estimate_stream_bytes(ch, start: float | None = None, end: float | None = None, group_rows: int = 262_144,
+                          overhead: float = 1.0) -> int:
+    """
+    Mémoire estimée d'une lecture en flux (row group par row group): un seul
+    row group décodé à la fois, au plus les lignes de la plage. group_rows:
+    taille par défaut (canal dérivé ou pas encore matérialisé).
+    """
+    if not ch.expression and os.path.exists(ch.parquet_path) and not is_transitions(ch.parquet_path):
+        meta = pq.ParquetFile(ch.parquet_path).metadata
+        group_rows = max((meta.row_group(i).num_rows for i in range(meta.num_row_groups)), default=0)
+    return int(min(estimate_read_rows(ch, start, end), group_rows) * row_bytes(ch) * overhead)
+
+class AdmissionController:
+    """Budget mémoire global (octets) partagé par les requêtes d'un worker, avec file d'attente FIFO."""
+
+    def __init__(self, budget_bytes: int, timeout_s: float, max_queue: int, enabled: bool = True,
+                 history: int = 200, sample_interval_s: float = 0.02):
+        self.budget = budget_bytes
+        self.timeout_s = timeout_s
+        self.max_queue = max_queue
+        self.enabled = enabled
+        self.sample_interval_s = sample_interval_s
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+        self._in_use = 0
+        self._active: dict[int, dict] = {}
+        self._next_id = 0
+        self._records: deque = deque(maxlen=history)
+        self._sampler: threading.Thread | None = None
+        self.admitted = 0
+        self.rejected = 0
+        self.peak_in_use = 0
+
+    def _retry_after(self) -> int:
+        return max(1, round(self.timeout_s))
+
+    def acquire(self, route: str, estimated: int) -> dict:
+        """Attend une place dans le budget; lève AdmissionRejected si la file est pleine ou le délai dépassé."""
+        # une requête plus grosse que le budget entier passe seule
+        cost = min(estimated, self.budget)
+        t0 = time.perf_counter()
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected("File d'attente pleine", self._retry_after())
+            turn = object()
+            self._queue.append(turn)
+            deadline = t0 + self.timeout_s
+            while self._queue[0] is not turn or self._in_use + cost > self.budget:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._queue.remove(turn)
+                    self.rejected += 1
+                    self._cond.notify_all()
+                    raise AdmissionRejected(
+                        f"Mémoire insuffisante: {estimated / 1e6:.0f} Mo demandés, "
+                        f"{(self.budget - self._in_use) / 1e6:.0f} Mo libres", self._retry_after())
+                self._cond.wait(remaining)
+            self._queue.popleft()
+            self._in_use += cost
+            self.peak_in_use = max(self.peak_in_use, self._in_use)
+            self.admitted += 1
+            rss = _rss_bytes()
+            self._next_id += 1
+            ticket = {
+                "id": self._next_id, "route": route, "estimated_bytes": estimated, "cost": cost,
+                "wait_ms": round((time.perf_counter() - t0) * 1000, 3),
+                "rss_start": rss, "rss_peak": rss, "t_start": time.perf_counter(),
+            }
+            self._active[ticket["id"]] = ticket
+            self._cond.notify_all()
+        self._ensure_sampler()
+        return ticket
+
+    def release(self, ticket: dict, error: str | None = None):
+        rss = _rss_bytes()
+        with self._cond:
+            self._active.pop(ticket["id"], None)
+            self._in_use -= ticket["cost"]
+            if rss is not None and ticket["rss_peak"] is not None:
+                ticket["rss_peak"] = max(ticket["rss_peak"], rss)
+            self._records.append({
+                "route": ticket["route"],
+                "estimated_bytes": ticket["estimated_bytes"],
+                "wait_ms": ticket["wait_ms"],
+                "duration_ms": round((time.perf_counter() - ticket["t_start"]) * 1000, 3),
+                "rss_start": ticket["rss_start"],
+                "rss_peak": ticket["rss_peak"],
+                # pic du processus: inclut les requêtes concurrentes
+                "peak_delta_bytes": None if ticket["rss_start"] is None else ticket["rss_peak"] - ticket["rss_start"],
+                "error": error,
+            })
+            self._cond.notify_all()
+
+    def _ensure_sampler(self):
+        if self._sampler is None and _rss_bytes() is not None:
+            with self._cond:
+                if self._sampler is None:
+                    self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+                    self._sampler.start()
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.sample_interval_s)
+            if not self._active:
+                continue
+            rss = _rss_bytes()
+            with self._cond:
+                for ticket in self._active.values():
+                    ticket["rss_peak"] = max(ticket["rss_peak"], rss)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "budget_bytes": self.budget,
+                "in_use_bytes": self._in_use,
+                "peak_in_use_bytes": self.peak_in_use,
+                "active": len(self._active),
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "rss_bytes": _rss_bytes(),
+                "recent": list(self._records)[-50:],
+            }
@@ -0,0 +1,228 @@
+"""
+Agrégats par blocs précalculés à l'ingestion, pour des statistiques de plage
+(min/max/mean/RMS) en temps constant.
+
+Chaque canal est découpé en blocs de `block_rows` lignes. On stocke dans un
+fichier compagnon `<canal>.stats.npz`:
+- t0/t1: premier et dernier temps de chaque bloc (us ou index)
+- count/sum/sumsq en sommes préfixes (somme de blocs i..j-1 = P[j] - P[i])
+- min/max en sparse table (niveau k = extremum de 2^k blocs consécutifs)
+
+Une requête combine les blocs entiers en O(1) et lit exactement les deux
+blocs partiels des bords.
+"""
+from __future__ import annotations
+from pathlib import Path
+import os
+import tempfile
+
+from .cache import LRUCache
+from .scan import raw_bound, read_rows, time_to_int
+from .lazy import lazy_import
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+
+# Sidecars chargés, partagés entre requêtes
+_loaded = LRUCache(64 * 1024 * 1024)
+
+def stats_path(parquet_path: str) -> Path:
+    return Path(parquet_path).with_suffix(".stats.npz")
+
+def save_npz(path: Path, arrays: dict):
+    """
+    Écrit un sidecar .npz dans un temporaire du même dossier puis le publie
+    atomiquement: un lecteur (autre worker) ne voit jamais de fichier tronqué.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+def _sparse_table(values: np.ndarray, ufunc) -> np.ndarray:
+    """Sparse table (niveaux x blocs), complétée par NaN au-delà de la fin."""
+    n = len(values)
+    levels = max(1, int(np.floor(np.log2(n))) + 1) if n else 1
+    table = np.full((levels, n), np.nan)
+    table[0] = values
+    for k in range(1, levels):
+        half = 1 << (k - 1)
+        width = n - (1 << k) + 1
+        table[k, :width] = ufunc(table[k - 1, :width], table[k - 1, half:half + width])
+    return table
+
+class BlockStatsAccumulator:
+    """
+    Agrégats par blocs calculés au fil des morceaux d'un canal (t en int64,
+    v numérique): seul le dernier bloc incomplet est gardé d'un morceau à l'autre.
+    """
+
+    def __init__(self, block_rows: int):
+        self.block_rows = block_rows
+        self.n = 0
+        self.tail_t = np.empty(0, np.int64)
+        self.tail_v = np.empty(0)
+        self.parts = []
+
+    def add(self, t: np.ndarray, v: np.ndarray):
+        self.n += len(v)
+        t = np.r_[self.tail_t, t]
+        v = np.r_[self.tail_v, v.astype(np.float64)]
+        full = len(v) // self.block_rows * self.block_rows
+        if full:
+            self._blocks(t[:full], v[:full])
+        self.tail_t, self.tail_v = t[full:], v[full:]
+
+    def _blocks(self, t: np.ndarray, v: np.ndarray):
+        n, block_rows = len(v), self.block_rows
+        n_blocks = -(-n // block_rows)
+        pad = n_blocks * block_rows - n
+        padded = np.r_[v, np.full(pad, np.nan)].reshape(n_blocks, block_rows)
+        valid = ~np.isnan(padded)
+
+        count = valid.sum(axis=1)
+        with np.errstate(invalid="ignore"):
+            bmin = np.where(count > 0, np.nanmin(np.where(valid, padded, np.inf), axis=1), np.nan)
+            bmax = np.where(count > 0, np.nanmax(np.where(valid, padded, -np.inf), axis=1), np.nan)
+
+        starts = np.arange(n_blocks) * block_rows
+        self.parts.append({
+            "t0": t[starts],
+            "t1": t[np.minimum(starts + block_rows, n) - 1],
+            "count": count,
+            "sum": np.nansum(padded, axis=1),
+            "sumsq": np.nansum(padded ** 2, axis=1),
+            "min": bmin,
+            "max": bmax,
+        })
+
+    def result(self) -> dict:
+        """Sidecar .stats.npz (au moins une valeur doit avoir été ajoutée)."""
+        if len(self.tail_v):
+            self._blocks(self.tail_t, self.tail_v)
+            self.tail_t, self.tail_v = self.tail_t[:0], self.tail_v[:0]
+        cols = {k: np.concatenate([p[k] for p in self.parts]) for k in self.parts[0]}
+        return {
+            "block_rows": np.array(self.block_rows),
+            "n_rows": np.array(self.n),
+            "t0": cols["t0"],
+            "t1": cols["t1"],
+            "p_count": np.r_[0, np.cumsum(cols["count"])],
+            "p_sum": np.r_[0.0, np.cumsum(cols["sum"])],
+            "p_sumsq": np.r_[0.0, np.cumsum(cols["sumsq"])],
+            "st_min": _sparse_table(cols["min"], np.fmin),
+            "st_max": _sparse_table(cols["max"], np.fmax),
+        }
+
+def compute_block_stats(t: np.ndarray, v: np.ndarray, block_rows: int) -> dict:
+    """Calcule les agrégats par blocs d'un canal (t en int64, v numérique)."""
+    acc = BlockStatsAccumulator(block_rows)
+    acc.add(t, v)
+    return acc.result()
+
+def write_block_stats(parquet_path: str, t: np.ndarray, v: np.ndarray, block_rows: int):
+    """Écrit le fichier compagnon .stats.npz d'un canal (valeurs numériques uniquement)."""
+    if not len(v) or not (np.issubdtype(v.dtype, np.number) or v.dtype == bool):
+        return
+    save_npz(stats_path(parquet_path), compute_block_stats(t, v, block_rows))
+
+def load_block_stats(parquet_path: str) -> dict | None:
+    path = stats_path(parquet_path)
+    cached = _loaded.get(str(path))
+    if cached is not None:
+        return cached
+    if not path.exists():
+        return None
+    with np.load(path) as npz:
+        stats = {k: npz[k] for k in npz.files}
+    _loaded.put(str(path), stats, size=sum(a.nbytes for a in stats.values()))
+    return stats
+
+def _range_extreme(st: np.ndarray, i: int, j: int, ufunc) -> float:
+    """Extremum des blocs [i, j) en O(1) via la sparse table."""
+    k = int(np.floor(np.log2(j - i)))
+    return float(ufunc(st[k, i], st[k, j - (1 << k)]))
+
+class RangeAccumulator:
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.min = np.nan
+        self.max = np.nan
+
+    def add_values(self, v: np.ndarray):
+        v = v.astype(np.float64)
+        v = v[~np.isnan(v)]
+        if not len(v):
+            return
+        self.add(len(v), float(v.sum()), float(np.square(v).sum()), float(v.min()), float(v.max()))
+
+    def add(self, count, total, sumsq, vmin, vmax):
+        self.count += int(count)
+        self.sum += total
+        self.sumsq += sumsq
+        self.min = np.fmin(self.min, vmin)
+        self.max = np.fmax(self.max, vmax)
+
+    def result(self) -> dict:
+        if not self.count:
+            return {"count": 0, "min": None, "max": None, "mean": None, "rms": None, "std": None}
+        mean = self.sum / self.count
+        var = max(self.sumsq / self.count - mean * mean, 0.0)
+        return {
+            "count": self.count,
+            "min": float(self.min),
+            "max": float(self.max),
+            "mean": mean,
+            "rms": float(np.sqrt(self.sumsq / self.count)),
+            "std": float(np.sqrt(var)),
+        }
+
+def range_stats(parquet_path: str, stats: dict, start: float | None, end: float | None, time_type) -> dict:
+    """Statistiques de [start, end]: blocs entiers en O(1) + deux blocs de bord lus exactement."""
+    # les sidecars stockent le temps en us (timestamps) ou en index
+    bound_type = pa.timestamp("us") if pa.types.is_timestamp(time_type) else time_type
+    lo = raw_bound(bound_type, start)
+    hi = raw_bound(bound_type, end)
+
+    t0, t1 = stats["t0"], stats["t1"]
+    block_rows, n_rows = int(stats["block_rows"]), int(stats["n_rows"])
+    n_blocks = len(t0)
+
+    # blocs entièrement inclus: [i, j)
+    i = 0 if lo is None else int(np.searchsorted(t0, lo, side="left"))
+    j = n_blocks if hi is None else int(np.searchsorted(t1, hi, side="right"))
+
+    acc = RangeAccumulator()
+    edges = set()
+    if j > i:
+        acc.add(stats["p_count"][j] - stats["p_count"][i],
+                stats["p_sum"][j] - stats["p_sum"][i],
+                stats["p_sumsq"][j] - stats["p_sumsq"][i],
+                _range_extreme(stats["st_min"], i, j, np.fmin),
+                _range_extreme(stats["st_max"], i, j, np.fmax))
+        if i > 0:
+            edges.add(i - 1)
+        if j < n_blocks:
+            edges.add(j)
+    else:
+        # plage contenue dans un ou deux blocs
+        edges.update(b for b in (j, i - 1) if 0 <= b < n_blocks)
+
+    for b in sorted(edges):
+        if (lo is not None and t1[b] < lo) or (hi is not None and t0[b] > hi):
+            continue
+        table = read_rows(parquet_path, b * block_rows, min((b + 1) * block_rows, n_rows))
+        t = time_to_int(table.column("time"), time_type)
+        keep = np.ones(len(t), dtype=bool)
+        if lo is not None:
+            keep &= t >= lo
+        if hi is not None:
+            keep &= t <= hi
+        acc.add_values(table.column("value").to_numpy(zero_copy_only=False)[keep])
+
+    return {**acc.result(), "blocks": max(j - i, 0), "edge_blocks": len(edges)}
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Literal
 import os
 
 class Settings(BaseSettings):
@@ -17,6 +17,52 @@ class Settings(BaseSettings):
     # Valeurs par défaut
     default_points: int = 2000
     default_limit: int = 50000
+
+    # Stockage Parquet: profil d'écriture (voir io_tdms.PARQUET_PROFILES)
+    parquet_profile: Literal["fast-read", "balanced", "compact"] = "balanced"
+    # Taille des blocs d'agrégats (min/max/somme) calculés à l'ingestion
+    stats_block_rows: int = 4096
+    # Classes des histogrammes par row group (distribution / quantiles approchés à 1/hist_bins de l'étendue près)
+    hist_bins: int = 512
+    # Ingestion paresseuse par défaut: métadonnées seules, canaux convertis à la première lecture
+    lazy_ingest: bool = False
+    # Canaux à paliers (TOR, carrés, consignes) stockés en transitions: seuils d'éligibilité
+    transition_encoding: bool = True
+    transition_max_ratio: float = 0.05
+    transition_max_levels: int = 16
+
+    # Canaux dérivés: taille du cache des résultats évalués
+    derived_cache_mb: int = 256
+
+    # Cache disque partagé entre workers (tableaux décodés, tuiles, métadonnées)
+    shared_cache_enabled: bool = True
+    shared_cache_dir: str = "cache"
+    shared_cache_max_mb: int = 2048
+
+    # Démarrage: nombre de canaux récemment utilisés à précharger (0 = désactivé)
+    warmup_channels: int = 0
+
+    # Contrôle d'admission des lectures lourdes: budget mémoire par worker, attente max, file max
+    admission_enabled: bool = True
+    admission_budget_mb: int = 1024
+    admission_timeout_s: float = 10.0
+    admission_max_queue: int = 64
+    # Threads du pool des routes sync jamais occupés par des requêtes en attente d'admission
+    admission_reserved_threads: int = 8
+    # Facteur appliqué aux octets lus (copies Arrow -> pandas, filtres, sous-échantillonnage)
+    admission_overhead: float = 4.0
+
+    # Préchargement des fenêtres voisines / parentes: débit max (calculs/s), inactivité requise, canaux suivis
+    prefetch_enabled: bool = True
+    prefetch_rate: float = 4.0
+    prefetch_idle_ms: int = 100
+    prefetch_max_channels: int = 8
+
+    # Requêtes multi-datasets: fichiers Parquet décodés en parallèle
+    fleet_readahead: int = 8
+
+    # Analyse spectrale: taille du cache des PSD / spectrogrammes
+    spectrum_cache_mb: int = 64
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,30 @@
+from sqlalchemy import inspect
+from sqlmodel import SQLModel, create_engine
+
+from .config import settings
+from . import models  # noqa: F401  (enregistre les tables dans SQLModel.metadata)
+
+# Utilisation de la configuration centralisée
+DB_URL = settings.db_url
+engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
+
+def _add_missing_columns():
+    """
+    create_all ne modifie pas les tables existantes: on ajoute les colonnes
+    nouvellement déclarées (toujours nullables) pour garder les bases déjà créées.
+    """
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing:
+                    ddl = col.type.compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{col.name}" {ddl}')
+
+def init_db():
+    """Crée les tables manquantes et complète les colonnes des tables existantes."""
+    SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
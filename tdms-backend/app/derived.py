@@ -0,0 +1,184 @@
+"""
+Canaux dérivés (virtuels) définis par une expression sur d'autres canaux.
+
+Syntaxe: `chN` référence le canal d'id N. Opérateurs + - * / ** et fonctions:
+    abs, sqrt, log, exp, sin, cos
+    rolling_mean(x, n), rolling_rms(x, n), rolling_std(x, n), rolling_min(x, n), rolling_max(x, n)
+Exemples: "ch3 - ch2", "rolling_rms(ch5, 100)", "0.5 * ch1 + 2"
+
+L'évaluation est paresseuse et vectorisée: on parcourt la fenêtre demandée
+row group par row group du premier canal référencé (canal de référence, qui
+fournit l'axe de temps). Les autres canaux sont lus sur la même plage puis
+alignés (interpolation linéaire si leurs temps diffèrent). Les fenêtres
+glissantes sont amorcées avec les échantillons qui précèdent la fenêtre.
+"""
+from __future__ import annotations
+import ast
+import re
+from sqlmodel import Session
+
+from .db import engine
+from .models import Channel
+from .io_tdms import ensure_materialized
+from .scan import iter_arrays, read_before, time_to_int
+from .lazy import lazy_import
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+_REF = re.compile(r"^ch(\d+)$")
+
+def _rolling(op):
+    def f(x, n):
+        return getattr(pd.Series(x).rolling(n, min_periods=1), op)().to_numpy()
+    return f
+
+def _rolling_rms(x, n):
+    return np.sqrt(pd.Series(np.square(x)).rolling(n, min_periods=1).mean().to_numpy())
+
+# fonctions numpy (résolues à l'appel: numpy n'est chargé qu'à la première évaluation)
+FUNCTIONS = ("abs", "sqrt", "log", "exp", "sin", "cos")
+ROLLING = {
+    "rolling_mean": _rolling("mean"),
+    "rolling_rms": _rolling_rms,
+    "rolling_std": _rolling("std"),
+    "rolling_min": _rolling("min"),
+    "rolling_max": _rolling("max"),
+}
+_BINOPS = {ast.Add: "add", ast.Sub: "subtract", ast.Mult: "multiply", ast.Div: "divide", ast.Pow: "power"}
+
+def parse_expression(expr: str):
+    """
+    Valide une expression et renvoie (arbre, ids référencés dans l'ordre, lookback).
+    Le lookback est le nombre d'échantillons antérieurs nécessaires aux fenêtres glissantes.
+    Lève ValueError si l'expression n'est pas autorisée.
+    """
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Expression invalide: {e.msg}")
+
+    refs: list[int] = []
+
+    def visit(node) -> int:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return 0
+        if isinstance(node, ast.Name):
+            m = _REF.match(node.id)
+            if not m:
+                raise ValueError(f"Nom inconnu: {node.id} (utiliser chN pour le canal N)")
+            if int(m.group(1)) not in refs:
+                refs.append(int(m.group(1)))
+            return 0
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+            return max(visit(node.left), visit(node.right))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            return visit(node.operand)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name = node.func.id
+            if name in FUNCTIONS and len(node.args) == 1:
+                return visit(node.args[0])
+            if name in ROLLING and len(node.args) == 2:
+                n = node.args[1]
+                if not (isinstance(n, ast.Constant) and isinstance(n.value, int) and n.value > 0):
+                    raise ValueError(f"{name}: la taille de fenêtre doit être un entier > 0")
+                return visit(node.args[0]) + n.value - 1
+            raise ValueError(f"Fonction non supportée ou mauvais nombre d'arguments: {name}")
+        raise ValueError(f"Construction non supportée: {ast.dump(node)[:60]}")
+
+    lookback = visit(tree.body)
+    if not refs:
+        raise ValueError("L'expression doit référencer au moins un canal (chN)")
+    return tree.body, refs, lookback
+
+def _eval(node, env: dict):
+    if isinstance(node, ast.Constant):
+        return float(node.value)
+    if isinstance(node, ast.Name):
+        return env[int(_REF.match(node.id).group(1))]
+    if isinstance(node, ast.BinOp):
+        return getattr(np, _BINOPS[type(node.op)])(_eval(node.left, env), _eval(node.right, env))
+    if isinstance(node, ast.UnaryOp):
+        value = _eval(node.operand, env)
+        return np.negative(value) if isinstance(node.op, ast.USub) else value
+    name = node.func.id
+    if name in ROLLING:
+        return ROLLING[name](np.asarray(_eval(node.args[0], env), dtype=np.float64), node.args[1].value)
+    return getattr(np, name)(_eval(node.args[0], env))
+
+def resolve_refs(refs) -> dict[int, Channel]:
+    """Charge les canaux référencés (KeyError si absent, ValueError si dérivé)."""
+    with Session(engine) as s:
+        bases = {}
+        for cid in refs:
+            base = s.get(Channel, cid)
+            if base is None:
+                raise KeyError(cid)
+            if base.expression:
+                raise ValueError(f"Le canal {cid} est lui-même dérivé")
+            bases[cid] = ensure_materialized(base)
+    return bases
+
+def _seconds(t: int, has_time: bool) -> float:
+    return t / 1_000_000 if has_time else float(t)
+
+def _read_after(path: str, t_end: int, has_time: bool):
+    """Premier échantillon strictement postérieur à t_end (ou None)."""
+    for t, v in iter_arrays(path, _seconds(t_end, has_time), None):
+        later = np.flatnonzero(t > t_end)
+        if len(later):
+            return t[later[:1]], v[later[:1]]
+    return None
+
+def _aligned(base: Channel, grid: np.ndarray, has_time: bool) -> np.ndarray:
+    """
+    Valeurs d'un canal sur la grille de temps de référence. Un échantillon est
+    lu de part et d'autre de la grille pour interpoler jusqu'aux bords du chunk;
+    hors de l'étendue du canal la valeur est NaN (pas de prolongement du bord).
+    """
+    parts = list(iter_arrays(base.parquet_path, _seconds(grid[0], has_time), _seconds(grid[-1], has_time)))
+    if parts:
+        t = np.concatenate([p[0] for p in parts])
+        v = np.concatenate([p[1] for p in parts]).astype(np.float64)
+        if len(t) == len(grid) and np.array_equal(t, grid):
+            return v
+        parts = [(t, v)]
+    head = read_before(base.parquet_path, _seconds(grid[0], has_time), 1)
+    if len(head):
+        parts.insert(0, (time_to_int(head.column("time"), head.schema.field("time").type),
+                         head.column("value").to_numpy(zero_copy_only=False)))
+    tail = _read_after(base.parquet_path, int(grid[-1]), has_time)
+    if tail is not None:
+        parts.append(tail)
+    if not parts:
+        return np.full(len(grid), np.nan)
+    t = np.concatenate([p[0] for p in parts])
+    v = np.concatenate([p[1] for p in parts]).astype(np.float64)
+    return np.interp(grid, t, v, left=np.nan, right=np.nan)
+
+def iter_derived_arrays(ch: Channel, start: float | None = None, end: float | None = None):
+    """Évalue un canal dérivé chunk par chunk: renvoie des tuples (time int64, value float64)."""
+    node, refs, lookback = parse_expression(ch.expression)
+    bases = resolve_refs(refs)
+    ref = bases[refs[0]]
+    has_time = ref.has_time
+
+    # amorçage des fenêtres glissantes avec les échantillons précédant la fenêtre
+    tail_t = np.empty(0, np.int64)
+    tails = {cid: np.empty(0) for cid in refs}
+    if lookback and start is not None:
+        head = read_before(ref.parquet_path, start, lookback, ("time",))
+        if len(head):
+            tail_t = time_to_int(head.column("time"), head.schema.field("time").type)
+            tails = {cid: _aligned(b, tail_t, has_time) for cid, b in bases.items()}
+
+    for t, v in iter_arrays(ref.parquet_path, start, end):
+        env = {}
+        for cid, base in bases.items():
+            values = v.astype(np.float64) if cid == ref.id else _aligned(base, t, has_time)
+            env[cid] = np.concatenate([tails[cid], values])
+        out = np.broadcast_to(_eval(node, env), (len(tail_t) + len(t),))[len(tail_t):]
+        yield t, np.asarray(out, dtype=np.float64)
+
+        if lookback:
+            tail_t = np.concatenate([tail_t, t])[-lookback:]
+            tails = {cid: arr[-lookback:] for cid, arr in env.items()}
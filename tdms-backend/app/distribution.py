@@ -0,0 +1,254 @@
+"""
+Distribution des valeurs d'un canal sur une plage: histogramme et quantiles
+approchés, sans relire les données.
+
+À l'ingestion, chaque row group du Parquet reçoit un histogramme compact
+(fichier compagnon `<canal>.hist.npz`), sur une grille de `bins` classes
+commune à tout le canal (du min au max global):
+- rows: première ligne de chaque row group (+ n_rows en fin)
+- t0/t1: premier et dernier temps de chaque row group (us ou index)
+- counts: effectifs par row group et par classe (uint32)
+- vmin/vmax/nans: extrema exacts et nombre de NaN par row group
+
+Une requête additionne les row groups entièrement inclus et lit exactement
+les deux row groups des bords. Un quantile est interpolé dans sa classe:
+l'erreur est d'au plus une largeur de classe ((max - min) / bins).
+"""
+from __future__ import annotations
+from pathlib import Path
+
+from .aggregates import save_npz
+from .cache import LRUCache
+from .scan import raw_bound, read_rows, time_to_int
+from .lazy import lazy_import
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+
+# Sidecars chargés, partagés entre requêtes
+_loaded = LRUCache(32 * 1024 * 1024)
+
+def hist_path(parquet_path: str) -> Path:
+    return Path(parquet_path).with_suffix(".hist.npz")
+
+def grid_edges(vmin: float, vmax: float, bins: int) -> np.ndarray:
+    """Bornes de la grille de classes (canal constant: classe de largeur 1)."""
+    if not vmax > vmin:
+        vmax = vmin + 1.0
+    return np.linspace(vmin, vmax, bins + 1)
+
+def _bin_counts(v: np.ndarray, edges: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+    """Effectifs par classe (valeurs hors grille rattachées à la classe extrême)."""
+    bins = len(edges) - 1
+    k = ((v - edges[0]) * (bins / (edges[-1] - edges[0]))).astype(np.int64)
+    return np.bincount(np.clip(k, 0, bins - 1), weights=weights, minlength=bins)
+
+def compute_histograms(t: np.ndarray, v: np.ndarray, group_rows: int, bins: int) -> dict | None:
+    """Histogrammes par row group d'un canal (t en int64, v numérique); None si aucune valeur."""
+    starts = range(0, len(v), group_rows)
+    return group_histograms(lambda: ((t[s:s + group_rows], v[s:s + group_rows]) for s in starts), bins)
+
+def group_histograms(groups, bins: int) -> dict | None:
+    """
+    Même calcul à partir de groups(), qui itère sur les (t, v) de chaque row
+    group. Deux parcours (extrema, puis effectifs sur la grille commune):
+    la mémoire reste bornée à un row group.
+    """
+    rows, t0, t1, vmin, vmax, nans = [0], [], [], [], [], []
+    for t, v in groups():
+        v = v.astype(np.float64)
+        seg = v[~np.isnan(v)]
+        rows.append(rows[-1] + len(v))
+        t0.append(t[0])
+        t1.append(t[-1])
+        nans.append(len(v) - len(seg))
+        vmin.append(seg.min() if len(seg) else np.nan)
+        vmax.append(seg.max() if len(seg) else np.nan)
+    if not len(t0) or np.isnan(vmin).all():
+        return None
+    edges = grid_edges(float(np.nanmin(vmin)), float(np.nanmax(vmax)), bins)
+
+    counts = np.zeros((len(t0), bins), np.uint32)
+    for g, (_, v) in enumerate(groups()):
+        v = v.astype(np.float64)
+        seg = v[~np.isnan(v)]
+        if len(seg):
+            counts[g] = _bin_counts(seg, edges)
+
+    return {
+        "edges": edges,
+        "rows": np.array(rows, np.int64),
+        "t0": np.array(t0, np.int64),
+        "t1": np.array(t1, np.int64),
+        "counts": counts,
+        "vmin": np.array(vmin),
+        "vmax": np.array(vmax),
+        "nans": np.array(nans, np.int64),
+    }
+
+def write_histograms(parquet_path: str, t: np.ndarray, v: np.ndarray, group_rows: int, bins: int):
+    """Écrit le fichier compagnon .hist.npz d'un canal (valeurs numériques uniquement)."""
+    hist = None
+    if len(v) and (np.issubdtype(v.dtype, np.number) or v.dtype == bool):
+        hist = compute_histograms(t, v, group_rows, bins)
+    save_histograms(parquet_path, hist)
+
+def save_histograms(parquet_path: str, hist: dict | None):
+    """Publie le sidecar .hist.npz (ou le supprime si le canal n'en a pas)."""
+    path = hist_path(parquet_path)
+    if hist is None:
+        path.unlink(missing_ok=True)
+        return
+    save_npz(path, hist)
+
+def load_histograms(parquet_path: str) -> dict | None:
+    path = hist_path(parquet_path)
+    cached = _loaded.get(str(path))
+    if cached is not None:
+        return cached
+    if not path.exists():
+        return None
+    with np.load(path) as npz:
+        hist = {k: npz[k] for k in npz.files}
+    _loaded.put(str(path), hist, size=sum(a.nbytes for a in hist.values()))
+    return hist
+
+class Histogram:
+    """Histogramme sur une grille fixe + extrema exacts, fusionnable par addition."""
+
+    def __init__(self, edges: np.ndarray):
+        self.edges = edges
+        self.counts = np.zeros(len(edges) - 1, np.int64)
+        self.nan_count = 0
+        self.min = np.nan
+        self.max = np.nan
+
+    @property
+    def width(self) -> float:
+        return float(self.edges[1] - self.edges[0])
+
+    def add_values(self, v: np.ndarray, weights: np.ndarray | None = None):
+        v = v.astype(np.float64)
+        ok = ~np.isnan(v)
+        w = None if weights is None else weights[ok]
+        self.nan_count += int((~ok).sum() if weights is None else weights[~ok].sum())
+        v = v[ok]
+        if not len(v):
+            return
+        self.counts += _bin_counts(v, self.edges, w).astype(np.int64)
+        self.min = np.fmin(self.min, v.min())
+        self.max = np.fmax(self.max, v.max())
+
+    def add_counts(self, counts: np.ndarray, vmin: float, vmax: float, nans: int):
+        self.counts += counts.astype(np.int64)
+        self.nan_count += int(nans)
+        self.min = np.fmin(self.min, vmin)
+        self.max = np.fmax(self.max, vmax)
+
+    def quantiles(self, qs: list[float]) -> list[float | None]:
+        """Quantiles interpolés linéairement dans leur classe, bornés par les extrema exacts."""
+        n = int(self.counts.sum())
+        if not n:
+            return [None] * len(qs)
+        cum = np.cumsum(self.counts)
+        out = []
+        for q in qs:
+            if q <= 0:
+                out.append(float(self.min))
+                continue
+            if q >= 1:
+                out.append(float(self.max))
+                continue
+            r = q * n
+            k = int(np.searchsorted(cum, r, side="left"))
+            before = cum[k] - self.counts[k]
+            value = self.edges[k] + (r - before) / self.counts[k] * self.width
+            out.append(float(min(max(value, self.min), self.max)))
+        return out
+
+    def result(self, bins: int, qs: list[float], exact_levels: tuple | None = None) -> dict:
+        """
+        Histogramme restreint aux classes occupées puis regroupé en au plus `bins`
+        classes. exact_levels=(valeurs, effectifs): quantiles exacts d'une
+        distribution discrète (canal à paliers).
+        """
+        n = int(self.counts.sum())
+        if not n:
+            return {"count": 0, "nan_count": self.nan_count, "min": None, "max": None,
+                    "histogram": {"edges": [], "counts": []},
+                    "quantiles": [{"q": q, "value": None} for q in qs], "quantile_error": None}
+
+        occupied = np.flatnonzero(self.counts)
+        a, b = int(occupied[0]), int(occupied[-1]) + 1
+        splits = np.unique(np.linspace(a, b, min(bins, b - a) + 1).round().astype(np.int64))
+        counts = np.add.reduceat(self.counts[a:b], splits[:-1] - a)
+
+        if exact_levels is not None:
+            values = _discrete_quantiles(*exact_levels, qs)
+            error = 0.0
+        else:
+            values = self.quantiles(qs)
+            error = self.width
+        return {
+            "count": n,
+            "nan_count": self.nan_count,
+            "min": float(self.min),
+            "max": float(self.max),
+            "histogram": {"edges": self.edges[splits].tolist(), "counts": counts.tolist()},
+            "quantiles": [{"q": q, "value": v} for q, v in zip(qs, values)],
+            "quantile_error": error,
+        }
+
+def _discrete_quantiles(values: np.ndarray, counts: np.ndarray, qs: list[float]) -> list[float]:
+    """Quantiles exacts (CDF inverse) d'une distribution donnée par valeurs et effectifs."""
+    order = np.argsort(values, kind="stable")
+    v, cum = values[order], np.cumsum(counts[order])
+    n = cum[-1]
+    return [float(v[min(int(np.searchsorted(cum, max(q * n, 1), side="left")), len(v) - 1)]) for q in qs]
+
+def range_histogram(parquet_path: str, hist: dict, start: float | None, end: float | None, time_type) -> tuple[Histogram, int, int]:
+    """
+    Histogramme de [start, end]: row groups entiers additionnés + deux row groups
+    de bord lus exactement. Renvoie (histogramme, row groups fusionnés, row groups lus).
+    """
+    bound_type = pa.timestamp("us") if pa.types.is_timestamp(time_type) else time_type
+    lo = raw_bound(bound_type, start)
+    hi = raw_bound(bound_type, end)
+
+    t0, t1, rows = hist["t0"], hist["t1"], hist["rows"]
+    n_groups = len(t0)
+
+    # row groups entièrement inclus: [i, j)
+    i = 0 if lo is None else int(np.searchsorted(t0, lo, side="left"))
+    j = n_groups if hi is None else int(np.searchsorted(t1, hi, side="right"))
+
+    acc = Histogram(hist["edges"])
+    edges = set()
+    if j > i:
+        acc.add_counts(hist["counts"][i:j].sum(axis=0),
+                       np.nanmin(np.r_[hist["vmin"][i:j], np.inf]),
+                       np.nanmax(np.r_[hist["vmax"][i:j], -np.inf]),
+                       hist["nans"][i:j].sum())
+        if np.isinf(acc.min):
+            acc.min = acc.max = np.nan  # row groups uniquement NaN
+        if i > 0:
+            edges.add(i - 1)
+        if j < n_groups:
+            edges.add(j)
+    else:
+        edges.update(g for g in (j, i - 1) if 0 <= g < n_groups)
+
+    scanned = 0
+    for g in sorted(edges):
+        if (lo is not None and t1[g] < lo) or (hi is not None and t0[g] > hi):
+            continue
+        table = read_rows(parquet_path, int(rows[g]), int(rows[g + 1]))
+        t = time_to_int(table.column("time"), time_type)
+        keep = np.ones(len(t), dtype=bool)
+        if lo is not None:
+            keep &= t >= lo
+        if hi is not None:
+            keep &= t <= hi
+        acc.add_values(table.column("value").to_numpy(zero_copy_only=False)[keep])
+        scanned += 1
+
+    return acc, max(j - i, 0), scanned
@@ -0,0 +1,243 @@
+"""
+Recherche d'évènements sur un canal: dépassements de seuil (intervalles) et
+fronts montants/descendants (franchissements du seuil).
+
+Le canal est vu comme une suite de blocs résumés par (t0, t1, min, max):
+blocs du sidecar d'agrégats (.stats.npz) s'il existe, sinon row groups
+Parquet avec les statistiques min/max du footer. Un bloc dont le min et le
+max sont du même côté du seuil est « pur »: il est traité sans être lu, et
+un franchissement entre deux blocs purs est daté par le t0 du second. Seuls
+les blocs mixtes (qui contiennent le seuil) sont décodés, de sorte que le
+coût suit le nombre d'évènements et non le volume de données.
+"""
+from __future__ import annotations
+
+from .aggregates import load_block_stats
+from .scan import column_to_numpy, raw_bound, read_transitions, time_to_int, transition_meta
+from .store import iter_channel_arrays
+from .transitions import transition_runs
+from .lazy import lazy_import
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+
+CONDITIONS = ("above", "below", "rising", "falling", "cross")
+
+def _side(v: np.ndarray, condition: str, threshold: float) -> np.ndarray:
+    """Côté de chaque échantillon (True = condition vraie). NaN -> False."""
+    v = v.astype(np.float64)
+    with np.errstate(invalid="ignore"):
+        return v < threshold if condition == "below" else v > threshold
+
+class _Tracker:
+    """Suit le côté courant et note chaque changement (t du premier échantillon, t du précédent, nouveau côté)."""
+
+    def __init__(self, max_changes: int):
+        self.max_changes = max_changes
+        self.side = None
+        self.first_side = None
+        self.first_t = None
+        self.last_t = None
+        self.changes: list[tuple[int, int, bool]] = []
+
+    @property
+    def full(self) -> bool:
+        return len(self.changes) >= self.max_changes
+
+    def _enter(self, side: bool, t: int):
+        if self.side is None:
+            self.first_side, self.first_t = side, t
+        elif side != self.side:
+            self.changes.append((t, self.last_t, side))
+
+    def feed_constant(self, side: bool, t_first: int, t_last: int):
+        self._enter(side, t_first)
+        self.side, self.last_t = side, t_last
+
+    def feed(self, t: np.ndarray, side: np.ndarray):
+        if not len(t):
+            return
+        self._enter(bool(side[0]), int(t[0]))
+        idx = np.flatnonzero(side[1:] != side[:-1]) + 1
+        self.changes.extend(zip(t[idx].tolist(), t[idx - 1].tolist(), side[idx].tolist()))
+        self.side, self.last_t = bool(side[-1]), int(t[-1])
+
+def _footer_blocks(pf, time_type) -> dict:
+    """Résumés par row group lus dans le footer (min/max NaN si absents -> bloc lu)."""
+    schema = pf.schema_arrow
+    t_idx, v_idx = schema.get_field_index("time"), schema.get_field_index("value")
+    numeric = pa.types.is_integer(schema.field("value").type) or pa.types.is_floating(schema.field("value").type) \
+        or pa.types.is_boolean(schema.field("value").type)
+    n = pf.metadata.num_row_groups
+    out = {k: np.full(n, np.nan) for k in ("vmin", "vmax")}
+    out["t0"] = np.zeros(n, np.int64)
+    out["t1"] = np.zeros(n, np.int64)
+    out["row0"] = np.zeros(n, np.int64)
+    out["rows"] = np.zeros(n, np.int64)
+    offset = 0
+    for i in range(n):
+        rg = pf.metadata.row_group(i)
+        out["row0"][i], out["rows"][i] = offset, rg.num_rows
+        offset += rg.num_rows
+        ts = rg.column(t_idx).statistics
+        if ts is not None and ts.has_min_max:
+            raw = pa.array([ts.min_raw, ts.max_raw])
+            out["t0"][i], out["t1"][i] = time_to_int(raw.cast(time_type) if pa.types.is_timestamp(time_type) else raw, time_type)
+        else:
+            t = time_to_int(pf.read_row_group(i, columns=["time"]).column("time"), time_type)
+            out["t0"][i], out["t1"][i] = (t[0], t[-1]) if len(t) else (0, -1)
+        vs = rg.column(v_idx).statistics
+        if numeric and vs is not None and vs.has_min_max:
+            out["vmin"][i], out["vmax"][i] = float(vs.min), float(vs.max)
+    return out
+
+def _blocks(path: str, pf, time_type) -> dict:
+    """Résumés de blocs: sidecar d'agrégats (blocs fins) ou row groups."""
+    stats = load_block_stats(path)
+    if stats is None:
+        return _footer_blocks(pf, time_type)
+    block_rows, n_rows = int(stats["block_rows"]), int(stats["n_rows"])
+    row0 = np.arange(len(stats["t0"]), dtype=np.int64) * block_rows
+    return {
+        "t0": stats["t0"], "t1": stats["t1"],
+        "vmin": stats["st_min"][0], "vmax": stats["st_max"][0],
+        "row0": row0, "rows": np.minimum(row0 + block_rows, n_rows) - row0,
+    }
+
+class _RowReader:
+    """Lecture de plages de lignes; le dernier row group décodé est gardé (blocs consécutifs)."""
+
+    def __init__(self, pf, time_type):
+        self.pf = pf
+        self.time_type = time_type
+        sizes = [pf.metadata.row_group(i).num_rows for i in range(pf.metadata.num_row_groups)]
+        self.offsets = np.r_[0, np.cumsum(sizes)]
+        self._current = (None, None, None)
+
+    def _group(self, i: int):
+        if self._current[0] != i:
+            table = self.pf.read_row_group(i, columns=["time", "value"])
+            self._current = (i, time_to_int(table.column("time"), self.time_type), column_to_numpy(table.column("value")))
+        return self._current[1], self._current[2]
+
+    def read(self, row0: int, rows: int):
+        ts, vs = [], []
+        first = int(np.searchsorted(self.offsets, row0, side="right")) - 1
+        for i in range(first, len(self.offsets) - 1):
+            g0, g1 = self.offsets[i], self.offsets[i + 1]
+            if g0 >= row0 + rows:
+                break
+            t, v = self._group(i)
+            a, b = max(row0 - g0, 0), min(row0 + rows, g1) - g0
+            ts.append(t[a:b])
+            vs.append(v[a:b])
+        return np.concatenate(ts), np.concatenate(vs)
+
+def _track_transitions(tr: dict, condition: str, threshold: float, lo, hi, tracker: _Tracker) -> dict:
+    """Canal stocké en transitions: chaque palier est un bloc pur, rien n'est décodé."""
+    t_first, t_last, values, _ = transition_runs(tr, lo, hi)
+    side = _side(values, condition, threshold)
+    # paliers consécutifs du même côté du seuil regroupés
+    cut = np.flatnonzero(side[1:] != side[:-1]) + 1
+    for a, e in zip(np.r_[0, cut].tolist(), np.r_[cut, len(side)].tolist()):
+        if a >= e or tracker.full:
+            break
+        tracker.feed_constant(bool(side[a]), int(t_first[a]), int(t_last[e - 1]))
+    return {"blocks_total": len(values), "blocks_scanned": 0}
+
+def _track_parquet(path: str, condition: str, threshold: float, start, end, tracker: _Tracker) -> dict:
+    pf = pq.ParquetFile(path)
+    time_type = pf.schema_arrow.field("time").type
+    bound_type = pa.timestamp("us") if pa.types.is_timestamp(time_type) else time_type
+    lo, hi = raw_bound(bound_type, start), raw_bound(bound_type, end)
+    if transition_meta(pf.schema_arrow) is not None:
+        return _track_transitions(read_transitions(path), condition, threshold, lo, hi, tracker)
+    b = _blocks(path, pf, time_type)
+    t0, t1, vmin, vmax = b["t0"], b["t1"], b["vmin"], b["vmax"]
+
+    # blocs qui recoupent la fenêtre
+    i = 0 if lo is None else int(np.searchsorted(t1, lo, side="left"))
+    j = len(t0) if hi is None else int(np.searchsorted(t0, hi, side="right"))
+
+    # classement: 1 = condition vraie sur tout le bloc, 0 = fausse partout, -1 = à lire
+    with np.errstate(invalid="ignore"):
+        if condition == "below":
+            all_true, all_false = vmax < threshold, vmin >= threshold
+        else:
+            all_true, all_false = vmin > threshold, vmax <= threshold
+    cls = np.where(all_true, 1, np.where(all_false, 0, -1))[i:j]
+    # les blocs coupés par les bornes sont lus pour être rognés exactement
+    if len(cls):
+        if lo is not None and t0[i] < lo:
+            cls[0] = -1
+        if hi is not None and t1[j - 1] > hi:
+            cls[-1] = -1
+
+    # runs de blocs purs de même côté; chaque bloc à lire forme son propre run
+    cut = np.flatnonzero((cls[1:] != cls[:-1]) | (cls[1:] == -1)) + 1
+    starts = np.r_[0, cut].astype(np.int64) if len(cls) else np.empty(0, np.int64)
+    ends = np.r_[cut, len(cls)].astype(np.int64) if len(cls) else np.empty(0, np.int64)
+
+    reader = _RowReader(pf, time_type)
+    scanned = 0
+    for a, e in zip(starts.tolist(), ends.tolist()):
+        if tracker.full:
+            break
+        k = i + a
+        if cls[a] >= 0:
+            tracker.feed_constant(bool(cls[a]), int(t0[k]), int(t1[i + e - 1]))
+            continue
+        t, v = reader.read(int(b["row0"][k]), int(b["rows"][k]))
+        keep = np.ones(len(t), dtype=bool)
+        if lo is not None:
+            keep &= t >= lo
+        if hi is not None:
+            keep &= t <= hi
+        tracker.feed(t[keep], _side(v[keep], condition, threshold))
+        scanned += 1
+    return {"blocks_total": j - i, "blocks_scanned": scanned}
+
+def search_channel(ch, condition: str, threshold: float, start: float | None = None,
+                   end: float | None = None, max_events: int = 1000) -> dict:
+    """
+    Évènements d'un canal sur [start, end] (secondes Unix ou index).
+    above/below: intervalles où la valeur est au-dessus/en dessous du seuil;
+    rising/falling/cross: instants de franchissement (premier échantillon du nouveau côté).
+    """
+    tracker = _Tracker(2 * max_events + 2)
+    if ch.expression:
+        # canal dérivé: pas de résumés, parcours de la fenêtre
+        info = {"blocks_total": None, "blocks_scanned": None}
+        for t, v in iter_channel_arrays(ch, start, end):
+            tracker.feed(t, _side(v, condition, threshold))
+            if tracker.full:
+                break
+    else:
+        info = _track_parquet(ch.parquet_path, condition, threshold, start, end, tracker)
+
+    scale = 1_000_000 if ch.has_time else 1
+    conv = (lambda t: t / scale) if ch.has_time else int
+    events = []
+    if condition in ("above", "below"):
+        open_t = tracker.first_t if tracker.first_side else None
+        for t_new, t_prev, side in tracker.changes:
+            if side:
+                open_t = t_new
+            elif open_t is not None:
+                events.append({"start": conv(open_t), "end": conv(t_prev), "duration": (t_prev - open_t) / scale})
+                open_t = None
+        if open_t is not None and not tracker.full:
+            # intervalle encore en cours à la fin de la fenêtre
+            events.append({"start": conv(open_t), "end": conv(tracker.last_t),
+                           "duration": (tracker.last_t - open_t) / scale, "open": True})
+    else:
+        for t_new, _, side in tracker.changes:
+            if condition == "cross" or side == (condition == "rising"):
+                events.append({"time": conv(t_new), "direction": "rising" if side else "falling"})
+
+    return {
+        "events": events[:max_events],
+        "count": min(len(events), max_events),
+        "truncated": tracker.full or len(events) > max_events,
+        **info,
+    }
@@ -0,0 +1,161 @@
+"""
+Export brut (non sous-échantillonné) de plusieurs canaux alignés dans le temps.
+
+Chaque canal est lu row group par row group (voir store.iter_channel_arrays), puis les
+flux sont fusionnés par une jointure externe sur le temps: on n'émet que les
+lignes antérieures au "watermark" (plus petit dernier timestamp bufferisé),
+ce qui garde la mémoire constante quelle que soit la taille de l'export.
+Un instant répété dans un canal (piste de temps explicite) donne autant de
+lignes: aucun échantillon n'est perdu.
+"""
+from __future__ import annotations
+
+from .store import iter_channel_arrays, value_type
+from .lazy import lazy_import
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pcsv = lazy_import("pyarrow.csv")
+ipc = lazy_import("pyarrow.ipc")
+pq = lazy_import("pyarrow.parquet")
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+class _ChunkSink:
+    """Pseudo-fichier qui accumule les octets écrits jusqu'au prochain take()."""
+    def __init__(self):
+        self._buf = bytearray()
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._buf += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+def align_arrays(sources, dtypes):
+    """
+    Jointure externe en flux sur le temps.
+
+    sources: itérateurs de (time int64, value) triés par temps, un par canal.
+    Renvoie des tuples (times, [(values, missing_mask), ...]).
+    """
+    k = len(sources)
+    bufs = [(np.empty(0, np.int64), np.empty(0, dt)) for dt in dtypes]
+    done = [False] * k
+
+    while True:
+        # 1) recharger les buffers vides
+        for i in range(k):
+            while not done[i] and len(bufs[i][0]) == 0:
+                try:
+                    bufs[i] = next(sources[i])
+                except StopIteration:
+                    done[i] = True
+
+        if not any(len(t) for t, _ in bufs):
+            return
+
+        # 2) watermark: on ne peut émettre que jusqu'au plus petit dernier temps des canaux encore actifs
+        active = [bufs[i][0][-1] for i in range(k) if not done[i]]
+        watermark = min(active) if active else None
+
+        parts = []
+        for i, (t, v) in enumerate(bufs):
+            cut = len(t) if watermark is None else int(np.searchsorted(t, watermark, side="right"))
+            parts.append((t[:cut], v[:cut]))
+            bufs[i] = (t[cut:], v[cut:])
+
+        # 3) axe de temps commun + placement vectorisé des valeurs
+        times, positions = _merge_times([t for t, _ in parts])
+        cols = []
+        for (t, v), pos, dt in zip(parts, positions, dtypes):
+            values = np.zeros(len(times), dtype=dt)
+            missing = np.ones(len(times), dtype=bool)
+            values[pos] = v
+            missing[pos] = False
+            cols.append((values, missing))
+        yield times, cols
+
+def _merge_times(parts):
+    """
+    Axe de temps commun de plusieurs séries triées, sans perdre d'échantillon:
+    un instant répété n fois dans un canal occupe n lignes (la k-ième
+    occurrence de chaque canal partage la même ligne). Renvoie (times, positions par canal).
+    """
+    uniques = [np.unique(t, return_counts=True) for t in parts]
+    axis = np.unique(np.concatenate([u for u, _ in uniques]))
+    rows = np.zeros(len(axis), np.int64)
+    for u, n in uniques:
+        idx = np.searchsorted(axis, u)
+        rows[idx] = np.maximum(rows[idx], n)
+    first = np.cumsum(rows) - rows
+    positions = []
+    for t in parts:
+        # rang de chaque échantillon parmi ceux du même instant
+        rank = np.arange(len(t)) - np.searchsorted(t, t, side="left")
+        positions.append(first[np.searchsorted(axis, t)] + rank)
+    return np.repeat(axis, rows), positions
+
+def export_schema(names, value_types, has_time: bool) -> pa.Schema:
+    time_type = pa.timestamp("us") if has_time else pa.int64()
+    return pa.schema([pa.field("time", time_type)] + [pa.field(n, t) for n, t in zip(names, value_types)])
+
+def iter_record_batches(channels, start: float | None, end: float | None):
+    """Construit le schéma et le flux de RecordBatch alignés pour une liste de Channel."""
+    value_types = [value_type(ch) for ch in channels]
+    dtypes = [t.to_pandas_dtype() for t in value_types]
+    has_time = channels[0].has_time
+
+    # noms de colonnes lisibles, désambiguïsés par dataset si besoin
+    names = [f"{ch.group_name}/{ch.channel_name}" for ch in channels]
+    names = [f"{n}@ds{ch.dataset_id}" if names.count(n) > 1 else n for n, ch in zip(names, channels)]
+    schema = export_schema(names, value_types, has_time)
+
+    def batches():
+        sources = [iter_channel_arrays(ch, start, end) for ch in channels]
+        for times, cols in align_arrays(sources, dtypes):
+            time_arr = pa.array(times.astype("datetime64[us]")) if has_time else pa.array(times)
+            arrays = [time_arr] + [pa.array(v, type=t, mask=m) for (v, m), t in zip(cols, value_types)]
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    return schema, batches()
+
+def stream_export(channels, start: float | None, end: float | None, fmt: str):
+    """Générateur d'octets pour StreamingResponse (csv | parquet | arrow)."""
+    schema, batches = iter_record_batches(channels, start, end)
+    sink = _ChunkSink()
+
+    if fmt == "csv":
+        writer = pcsv.CSVWriter(sink, schema)
+    elif fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = ipc.new_stream(sink, schema)
+
+    try:
+        for batch in batches:
+            if fmt == "parquet":
+                writer.write_batch(batch)
+            else:
+                writer.write(batch)
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    tail = sink.take()
+    if tail:
+        yield tail
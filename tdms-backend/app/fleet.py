@@ -0,0 +1,184 @@
+"""
+Requêtes multi-datasets sur un même canal (ex. « Sine50Hz sur tous les essais
+du mois ») en un seul appel, au lieu d'une requête et d'une ouverture de
+fichier par dataset.
+
+Les Parquet restent là où l'ingestion les écrit (data/<stem>/); la table
+Channel sert d'index de partitions, au sens hive: dataset / group / channel /
+date (jour UTC du premier échantillon). Une requête:
+1. élague les partitions en SQL (nom de canal, datasets, groupe, dates et
+   étendue temporelle enregistrée à l'ingestion), sans ouvrir de fichier
+2. assemble les fichiers retenus en un seul pyarrow.dataset dont chaque
+   fichier porte ses clés de partition comme colonnes constantes
+3. le scanne en parallèle (plusieurs fichiers décodés à la fois), le filtre
+   sur le temps étant poussé jusqu'aux statistiques des row groups
+4. agrège chaque lot de façon vectorisée (group_by Arrow) par canal et par
+   case de temps: count/sum/sumsq/min/max, fusionnés en numpy
+
+Le type des valeurs et l'encodage (plain | transitions) sont enregistrés sur
+Channel à l'ingestion (à la matérialisation pour un canal paresseux): le
+filtrage par type se fait aussi en SQL. Les canaux dérivés et les canaux
+stockés en transitions (schéma différent) sont lus à part, canal par canal,
+et agrégés de la même façon.
+"""
+from __future__ import annotations
+from datetime import datetime, timezone
+
+from .scan import raw_bound, time_bounds, time_to_int, transition_meta
+from .store import iter_channel_arrays, time_source_path
+from .lazy import lazy_import
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+ds = lazy_import("pyarrow.dataset")
+pafs = lazy_import("pyarrow.fs")
+
+def partition_date(ch) -> str | None:
+    """Jour UTC (AAAA-MM-JJ) du premier échantillon d'un canal horodaté."""
+    if not ch.has_time or ch.time_start is None:
+        return None
+    return datetime.fromtimestamp(ch.time_start, tz=timezone.utc).date().isoformat()
+
+def partition_path(ch) -> str:
+    """Clé de partition hive d'un canal, ex. dataset=3/group=DAQ/channel=Sine50Hz/date=2024-01-01."""
+    parts = [f"dataset={ch.dataset_id}", f"group={ch.group_name}", f"channel={ch.channel_name}"]
+    date = partition_date(ch)
+    if date:
+        parts.append(f"date={date}")
+    return "/".join(parts)
+
+# Types Arrow (Channel.value_type) agrégeables: nombres et booléens
+NUMERIC_TYPES = ("bool", "int8", "int16", "int32", "int64", "uint8", "uint16", "uint32", "uint64",
+                 "halffloat", "float", "double")
+
+def is_numeric(ch) -> bool:
+    """Valeurs agrégeables d'après le type enregistré; un canal dérivé l'est toujours."""
+    return bool(ch.expression) or ch.value_type in NUMERIC_TYPES
+
+def is_scannable(ch) -> bool:
+    """Canal lisible tel quel par le scan Arrow (Parquet classique time/value)."""
+    return not ch.expression and ch.encoding == "plain"
+
+def footer_fields(ch) -> dict:
+    """
+    Champs d'un canal encore inconnus en base (type, encodage, étendue), lus
+    dans le footer de son Parquet: ingestion antérieure à leur enregistrement,
+    ou canal paresseux matérialisé par un autre worker. {} si rien ne manque.
+    """
+    fields = {}
+    if not ch.expression and (ch.value_type is None or ch.encoding is None):
+        schema = pq.read_schema(ch.parquet_path)
+        fields["value_type"] = str(schema.field("value").type)
+        fields["encoding"] = "plain" if transition_meta(schema) is None else "transitions"
+    if ch.time_start is None:
+        bounds = time_bounds(time_source_path(ch))
+        if bounds is not None:
+            scale = 1e6 if ch.has_time else 1
+            fields["time_start"], fields["time_end"] = bounds[0] / scale, bounds[1] / scale
+    return fields
+
+def arrow_dataset(channels, has_time: bool):
+    """Un seul pyarrow.dataset sur les Parquet des canaux, clés de partition en colonnes."""
+    schema = pa.schema([
+        ("time", pa.timestamp("us") if has_time else pa.int64()),
+        ("value", pa.float64()),
+        ("channel_id", pa.int64()),
+        ("dataset_id", pa.int64()),
+        ("group", pa.string()),
+        ("channel", pa.string()),
+        ("date", pa.string()),
+    ])
+    partitions = []
+    for ch in channels:
+        expr = (ds.field("channel_id") == ch.id) & (ds.field("dataset_id") == ch.dataset_id) \
+            & (ds.field("group") == ch.group_name) & (ds.field("channel") == ch.channel_name)
+        date = partition_date(ch)
+        if date:
+            expr = expr & (ds.field("date") == date)
+        partitions.append(expr)
+    return ds.FileSystemDataset.from_paths(
+        [ch.parquet_path for ch in channels], schema=schema, format=ds.ParquetFileFormat(),
+        filesystem=pafs.LocalFileSystem(), partitions=partitions,
+    )
+
+class FleetAccumulator:
+    """Agrégats (count, sum, sumsq, min, max) par (série, case de temps)."""
+
+    def __init__(self, series_ids: list[int], origins: list[int], width: float | None, points: int):
+        self.ids = np.array(series_ids, dtype=np.int64)
+        self.order = np.argsort(self.ids)
+        self.origins = np.array(origins, dtype=np.float64)
+        self.width = width
+        self.points = points
+        size = len(series_ids) * points
+        self.count = np.zeros(size, np.int64)
+        self.sum = np.zeros(size)
+        self.sumsq = np.zeros(size)
+        self.min = np.full(size, np.nan)
+        self.max = np.full(size, np.nan)
+
+    def add(self, ids: np.ndarray, t: np.ndarray, v: np.ndarray):
+        v = v.astype(np.float64)
+        ok = ~np.isnan(v)
+        ids, t, v = ids[ok], t[ok], v[ok]
+        series = self.order[np.searchsorted(self.ids, ids, sorter=self.order)]
+        if self.width is None:
+            keys = series
+        else:
+            bins = np.floor((t - self.origins[series]) / self.width).astype(np.int64)
+            # le dernier échantillon de la plage tombe sur la borne droite de la dernière case
+            bins = np.minimum(bins, self.points - 1)
+            keep = bins >= 0
+            keys, v = series[keep] * self.points + bins[keep], v[keep]
+        if not len(v):
+            return
+        g = pa.table({"k": keys, "v": v, "v2": v * v}).group_by("k").aggregate(
+            [("v", "count"), ("v", "sum"), ("v2", "sum"), ("v", "min"), ("v", "max")])
+        k = g.column("k").to_numpy()
+        self.count[k] += g.column("v_count").to_numpy()
+        self.sum[k] += g.column("v_sum").to_numpy()
+        self.sumsq[k] += g.column("v2_sum").to_numpy()
+        self.min[k] = np.fmin(self.min[k], g.column("v_min").to_numpy())
+        self.max[k] = np.fmax(self.max[k], g.column("v_max").to_numpy())
+
+    def result(self) -> dict:
+        shape = (len(self.ids), self.points)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            n = np.where(self.count > 0, self.count, np.nan)
+            mean = self.sum / n
+            rms = np.sqrt(self.sumsq / n)
+            std = np.sqrt(np.maximum(self.sumsq / n - mean * mean, 0.0))
+        return {"count": self.count.reshape(shape), "mean": mean.reshape(shape), "rms": rms.reshape(shape),
+                "std": std.reshape(shape), "min": self.min.reshape(shape), "max": self.max.reshape(shape)}
+
+def scan_fleet(channels, has_time: bool, start: float | None, end: float | None, acc: FleetAccumulator,
+               readahead: int) -> dict:
+    """Alimente acc avec les échantillons des canaux sur [start, end]; renvoie le détail du parcours."""
+    time_type = pa.timestamp("us") if has_time else pa.int64()
+    lo, hi = raw_bound(time_type, start), raw_bound(time_type, end)
+    scannable = [ch for ch in channels if is_scannable(ch)]
+    ids = {ch.id for ch in scannable}
+    others = [ch for ch in channels if ch.id not in ids]
+
+    batches = 0
+    if scannable:
+        expr = None
+        if lo is not None:
+            expr = ds.field("time") >= pa.scalar(lo, time_type)
+        if hi is not None:
+            cond = ds.field("time") <= pa.scalar(hi, time_type)
+            expr = cond if expr is None else expr & cond
+        scanner = arrow_dataset(scannable, has_time).scanner(
+            columns=["time", "value", "channel_id"], filter=expr, use_threads=True, fragment_readahead=readahead)
+        for batch in scanner.to_batches():
+            if not batch.num_rows:
+                continue
+            acc.add(batch.column("channel_id").to_numpy(), time_to_int(batch.column("time"), time_type),
+                    batch.column("value").to_numpy(zero_copy_only=False))
+            batches += 1
+
+    for ch in others:
+        for t, v in iter_channel_arrays(ch, start, end):
+            acc.add(np.full(len(t), ch.id, dtype=np.int64), t, v)
+
+    return {"files_scanned": len(scannable), "channels_read_separately": len(others), "batches": batches}
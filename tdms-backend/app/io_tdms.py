@@ -1,10 +1,25 @@
-from nptdms import TdmsFile
-import pandas as pd
-import numpy as np
-import pyarrow as pa
-import pyarrow.parquet as pq
+from __future__ import annotations
 from pathlib import Path
+import os
 import re
+import tempfile
+import threading
+
+from sqlmodel import Session
+
+from .aggregates import BlockStatsAccumulator, save_npz, stats_path
+from .distribution import group_histograms, hist_path, save_histograms
+from .config import settings
+from .db import engine
+from .models import Channel
+from .scan import column_to_numpy, iter_arrays, sample_times, time_to_int
+from .properties import collect_properties
+from .transitions import TransitionEncoder
+from .lazy import lazy_import
+nptdms = lazy_import("nptdms")
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
 
 # Remplace les caractères interdits Windows et nettoie la fin
 def safe_filename(name: str) -> str:
@@ -15,50 +30,324 @@ def safe_filename(name: str) -> str:
     # Longueurs de chemin: on coupe large pour éviter 260+ chars
     return name[:200]
 
-def tdms_to_parquet(tdms_path: str, out_dir: str):
-    tdms = TdmsFile.read(tdms_path)
+# Profils d'écriture Parquet (sélectionnables via PARQUET_PROFILE)
+# - fast-read : compression légère (LZ4), décodage le plus rapide
+# - balanced  : ZSTD niveau moyen, encodages par défaut
+# - compact   : BYTE_STREAM_SPLIT (flottants) + DELTA_BINARY_PACKED (temps) + ZSTD élevé
+PARQUET_PROFILES = {
+    "fast-read": {
+        "compression": "lz4",
+        "compression_level": None,
+        "float_encoding": None,
+        "time_encoding": None,
+        "row_group_size": 131_072,
+    },
+    "balanced": {
+        "compression": "zstd",
+        "compression_level": 3,
+        "float_encoding": None,
+        "time_encoding": None,
+        "row_group_size": 262_144,
+    },
+    "compact": {
+        "compression": "zstd",
+        "compression_level": 19,
+        "float_encoding": "BYTE_STREAM_SPLIT",
+        "time_encoding": "DELTA_BINARY_PACKED",
+        "row_group_size": 1_048_576,
+    },
+}
+
+def get_parquet_profile(name: str) -> dict:
+    """Retourne la configuration d'un profil d'écriture (ValueError si inconnu)."""
+    try:
+        return PARQUET_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Profil Parquet inconnu: {name!r} (attendu: {', '.join(PARQUET_PROFILES)})")
+
+def channel_table(ch) -> tuple[pa.Table, bool]:
+    """
+    Construit la table Arrow (time, value) d'un canal TDMS sans passer par pandas,
+    pour conserver le dtype natif (float32, int16, bool...) de bout en bout.
+    """
+    # 1) valeurs (dtype natif nptdms)
+    values = pa.array(ch[:])
+
+    # 2) temps absolu si dispo (timestamp[us]), sinon index d'échantillon
+    has_time = False
+    try:
+        t = ch.time_track(absolute_time=True, accuracy="us")
+        time = pa.array(t.astype("datetime64[us]"))
+        has_time = True
+    except Exception:
+        time = pa.array(np.arange(len(values), dtype=np.int64))
+
+    return pa.table({"time": time, "value": values}), has_time
+
+def iter_channel_tables(ch, has_time: bool, chunk_rows: int):
+    """
+    Même table que channel_table, lue par morceaux de chunk_rows lignes
+    (ch.read_data): les temps de chaque morceau sont recalculés sur la grille
+    TDMS comme le ferait time_track. Un canal vide donne une table vide.
+    """
+    n = len(ch)
+    tr = {"grid": time_grid(ch) if has_time else None, "n_rows": n}
+    for offset in range(0, max(n, 1), chunk_rows):
+        values = ch.read_data(offset, chunk_rows)
+        idx = np.arange(offset, offset + len(values), dtype=np.int64)
+        time = pa.array(sample_times(tr, idx).astype("datetime64[us]")) if has_time else pa.array(idx)
+        yield pa.table({"time": time, "value": pa.array(values)})
+
+def parquet_options(schema: pa.Schema, profile: str) -> dict:
+    """Options d'écriture (compression, encodages par colonne) du profil choisi pour ce schéma."""
+    cfg = get_parquet_profile(profile)
+
+    # Encodages par colonne: uniquement là où le type physique le permet
+    column_encoding = {}
+    time_type = schema.field("time").type
+    if cfg["time_encoding"] and (pa.types.is_integer(time_type) or pa.types.is_timestamp(time_type)):
+        column_encoding["time"] = cfg["time_encoding"]
+    if cfg["float_encoding"] and pa.types.is_floating(schema.field("value").type):
+        column_encoding["value"] = cfg["float_encoding"]
+
+    # Le dictionnaire est incompatible avec un encodage explicite
+    use_dictionary = [c for c in schema.names if c not in column_encoding]
+
+    return {
+        "compression": cfg["compression"],
+        "compression_level": cfg["compression_level"],
+        "use_dictionary": use_dictionary,
+        "column_encoding": column_encoding or None,
+    }
+
+def write_channel_parquet(table: pa.Table, path: str, profile: str = "balanced"):
+    """Écrit une table (time, value) avec les encodages du profil choisi."""
+    pq.write_table(table, path, row_group_size=get_parquet_profile(profile)["row_group_size"],
+                   **parquet_options(table.schema, profile))
+
+def channel_parquet_path(out: Path, group_name: str, channel_name: str) -> Path:
+    """Chemin Parquet d'un canal, nom PARFAITEMENT SAFE pour Windows."""
+    return out / f"{safe_filename(group_name)}__{safe_filename(channel_name)}.parquet"
+
+def channel_unit(ch) -> str | None:
+    return ch.properties.get("NI_UnitDescription") or ch.properties.get("unit_string")
+
+def time_grid(ch) -> dict | None:
+    """Paramètres de la piste de temps TDMS (pour reconstituer les temps d'un canal en transitions)."""
+    if not has_time_track(ch):
+        return None
+    start = ch.properties["wf_start_time"]
+    if hasattr(start, "as_datetime64"):
+        start = start.as_datetime64("us")
+    return {
+        "start": int(np.datetime64(start, "us").astype(np.int64)),
+        "offset": float(ch.properties["wf_start_offset"]),
+        "increment": float(ch.properties["wf_increment"]),
+    }
+
+def time_extent(table: pa.Table, has_time: bool) -> tuple[float | None, float | None]:
+    """(premier, dernier) temps d'un canal: secondes Unix, ou index sans piste de temps."""
+    if not len(table):
+        return None, None
+    col = table.column("time")
+    ends = pa.chunked_array([col.slice(0, 1), col.slice(len(col) - 1, 1)])
+    t = time_to_int(ends, table.schema.field("time").type)
+    return (t[0] / 1e6, t[1] / 1e6) if has_time else (float(t[0]), float(t[1]))
+
+def grid_extent(grid: dict | None, n: int) -> tuple[float | None, float | None]:
+    """Même chose depuis les seules métadonnées (grille TDMS), sans lire les données."""
+    if not n:
+        return None, None
+    if grid is None:
+        return 0.0, float(n - 1)
+    start = grid["start"] / 1e6 + grid["offset"]
+    return start, start + (n - 1) * grid["increment"]
+
+def write_channel_files(chunks, n_rows: int, pq_path: str, stats_target: str, profile: str,
+                        stats_block_rows: int, grid: dict | None = None) -> str | None:
+    """
+    Écrit le Parquet d'un canal de n_rows lignes à partir de ses morceaux
+    (tables time/value), un row group par morceau, et ses sidecars d'agrégats
+    et d'histogrammes pour stats_target. Les agrégats et l'éligibilité aux
+    transitions sont suivis morceau par morceau, les histogrammes relus row
+    group par row group: la mémoire reste bornée à un morceau. Un canal à
+    paliers éligible est réécrit en transitions, sans sidecar: ses statistiques
+    se calculent directement sur les paliers. Renvoie l'encodage.
+    """
+    row_group_size = get_parquet_profile(profile)["row_group_size"]
+    writer = encoder = blocks = None
+    try:
+        for table in chunks:
+            if writer is None:
+                writer = pq.ParquetWriter(pq_path, table.schema, **parquet_options(table.schema, profile))
+                if settings.transition_encoding:
+                    encoder = TransitionEncoder(n_rows, table.schema, settings.transition_max_ratio,
+                                                settings.transition_max_levels, grid)
+            writer.write_table(table, row_group_size=row_group_size)
+            if encoder is not None:
+                encoder.add(table)
+            v = column_to_numpy(table.column("value"))
+            if len(v) and (np.issubdtype(v.dtype, np.number) or v.dtype == bool):
+                if blocks is None:
+                    blocks = BlockStatsAccumulator(stats_block_rows)
+                blocks.add(time_to_int(table.column("time"), table.schema.field("time").type), v)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    encoded = encoder.result() if encoder is not None else None
+    if encoded is not None:
+        stats_path(stats_target).unlink(missing_ok=True)
+        hist_path(stats_target).unlink(missing_ok=True)
+        write_channel_parquet(encoded, pq_path, profile)
+        return "transitions"
+    if blocks is None:
+        stats_path(stats_target).unlink(missing_ok=True)
+        hist_path(stats_target).unlink(missing_ok=True)
+        return None
+    save_npz(stats_path(stats_target), blocks.result())
+    # un histogramme par row group du Parquet: les bords d'une plage se lisent row group par row group
+    save_histograms(stats_target, group_histograms(lambda: iter_arrays(pq_path), settings.hist_bins))
+    return None
+
+def tdms_to_parquet(tdms_path: str, out_dir: str, profile: str = "balanced", stats_block_rows: int = 4096):
+    """
+    Convertit chaque canal en Parquet. Renvoie (description des canaux,
+    propriétés fichier/groupes/canaux extraites dans la même lecture).
+    """
+    tdms = nptdms.TdmsFile.read(tdms_path)
     out = Path(out_dir)
     out.mkdir(parents=True, exist_ok=True)
 
     meta = []
     for group in tdms.groups():
         for ch in group.channels():
-            # 1) valeurs
-            values = ch[:]
-            df = pd.DataFrame({"value": values})
-
-            # 2) temps si dispo
-            has_time = False
-            try:
-                t = ch.time_track()
-                if t is not None:
-                    df.insert(0, "time", pd.to_datetime(t))
-                    has_time = True
-            except Exception:
-                # fallback: index échantillon
-                df.insert(0, "time", np.arange(len(df)))
-
-            # 3) unité si dispo
-            unit = ch.properties.get("NI_UnitDescription") or ch.properties.get("unit_string")
-
-            # 4) nom de fichier PARFAITEMENT SAFE pour Windows
-            g = safe_filename(group.name)
-            c = safe_filename(ch.name)
-            pq_path = out / f"{g}__{c}.parquet"
+            # 1) valeurs + temps (dtypes natifs conservés)
+            table, has_time = channel_table(ch)
+
+            # 2) unité si dispo
+            unit = channel_unit(ch)
+
+            # 3) nom de fichier PARFAITEMENT SAFE pour Windows
+            pq_path = channel_parquet_path(out, group.name, ch.name)
 
             # (debug utile) affiche le chemin avant écriture
-            print(f"[TDMS→Parquet] Écriture: {pq_path}")
+            print(f"[TDMS→Parquet] Écriture ({profile}): {pq_path}")
 
-            # 5) écriture Parquet (ZSTD)
-            table = pa.Table.from_pandas(df, preserve_index=False)
-            pq.write_table(table, str(pq_path), compression="zstd")
+            # 4) écriture Parquet selon le profil (+ agrégats par blocs, ou transitions)
+            rows = get_parquet_profile(profile)["row_group_size"]
+            chunks = (table.slice(offset, rows) for offset in range(0, max(len(table), 1), rows))
+            encoding = write_channel_files(chunks, len(table), str(pq_path), str(pq_path), profile, stats_block_rows,
+                                           time_grid(ch) if has_time else None)
+            time_start, time_end = time_extent(table, has_time)
 
             meta.append({
                 "group": group.name,
                 "channel": ch.name,
-                "rows": len(df),
+                "rows": len(table),
                 "parquet": str(pq_path),
                 "has_time": has_time,
                 "unit": unit,
+                "value_type": str(table.schema.field("value").type),
+                "encoding": encoding,
+                "time_start": time_start,
+                "time_end": time_end,
             })
-    return meta
+    return meta, collect_properties(tdms)
+
+# ---- Ingestion paresseuse: métadonnées seules, Parquet écrit à la première lecture ----
+
+def has_time_track(ch) -> bool:
+    """Même critère que channel_table (time_track absolu), mais sans construire le tableau."""
+    return all(k in ch.properties for k in ("wf_increment", "wf_start_offset", "wf_start_time"))
+
+def metadata_value_type(ch) -> str | None:
+    """Type Arrow des valeurs d'après le type de données TDMS déclaré (sans lire les données)."""
+    try:
+        return str(pa.from_numpy_dtype(ch.dtype))
+    except (TypeError, ValueError, pa.ArrowNotImplementedError):
+        return "string" if ch.dtype == np.dtype("O") else None
+
+def tdms_metadata(tdms_path: str, out_dir: str) -> tuple[list[dict], list[dict]]:
+    """
+    Lit uniquement les métadonnées d'un TDMS (via le .tdms_index voisin s'il
+    existe, sinon en parcourant les en-têtes de segments) et renvoie la même
+    description que tdms_to_parquet, sans écrire de Parquet.
+    """
+    tdms = nptdms.TdmsFile.read_metadata(tdms_path)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    meta = []
+    for group in tdms.groups():
+        for ch in group.channels():
+            time_start, time_end = grid_extent(time_grid(ch), len(ch))
+            meta.append({
+                "group": group.name,
+                "channel": ch.name,
+                "rows": len(ch),
+                "parquet": str(channel_parquet_path(out, group.name, ch.name)),
+                "has_time": has_time_track(ch),
+                "unit": channel_unit(ch),
+                "value_type": metadata_value_type(ch),
+                "time_start": time_start,
+                "time_end": time_end,
+            })
+    return meta, collect_properties(tdms)
+
+def materialize_channel(source_path: str, group_name: str, channel_name: str, parquet_path: str,
+                        profile: str = "balanced", stats_block_rows: int = 4096):
+    """
+    Convertit un seul canal d'un TDMS en flux: ses données sont lues par
+    morceaux d'un row group (ch.read_data), jamais en entier.
+    Le Parquet est publié en dernier et de façon atomique: sa présence signifie
+    que le canal (et son sidecar d'agrégats) est prêt, y compris pour les autres workers.
+    Renvoie l'encodage écrit ("plain" | "transitions").
+    """
+    target = Path(parquet_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    print(f"[TDMS→Parquet] Matérialisation ({profile}): {target}")
+    fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        with nptdms.TdmsFile.open(source_path) as tdms:
+            ch = tdms[group_name][channel_name]
+            has_time = has_time_track(ch)
+            chunks = iter_channel_tables(ch, has_time, get_parquet_profile(profile)["row_group_size"])
+            encoding = write_channel_files(chunks, len(ch), tmp, str(target), profile, stats_block_rows,
+                                           time_grid(ch) if has_time else None)
+        os.replace(tmp, target)
+        return encoding or "plain"
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        stats_path(str(target)).unlink(missing_ok=True)
+        hist_path(str(target)).unlink(missing_ok=True)
+        raise
+
+_materialize_locks: dict[str, threading.Lock] = {}
+_materialize_guard = threading.Lock()
+
+def ensure_materialized(ch):
+    """
+    Écrit le Parquet d'un canal ingéré en mode paresseux s'il n'existe pas encore;
+    l'encodage écrit est reporté sur ch et enregistré en base.
+    """
+    if not getattr(ch, "source_path", None) or os.path.exists(ch.parquet_path):
+        return ch
+    with _materialize_guard:
+        lock = _materialize_locks.setdefault(ch.parquet_path, threading.Lock())
+    with lock:
+        # une autre requête (ou un autre worker) a pu le faire entre-temps
+        if not os.path.exists(ch.parquet_path):
+            encoding = materialize_channel(
+                ch.source_path, ch.group_name, ch.channel_name, ch.parquet_path,
+                settings.parquet_profile, settings.stats_block_rows,
+            )
+            ch.encoding = encoding
+            if ch.id is not None:
+                with Session(engine) as s:
+                    row = s.get(Channel, ch.id)
+                    if row is not None:
+                        row.encoding = encoding
+                        s.add(row)
+                        s.commit()
+    return ch
@@ -0,0 +1,31 @@
+"""
+Imports paresseux des dépendances lourdes (pandas, pyarrow, nptdms, lttb...).
+
+`pd = lazy_import("pandas")` ne charge rien: le module est importé au premier
+accès à un attribut (pd.DataFrame, ...). Importer l'application reste donc
+rapide, ce qui accélère le démarrage des workers.
+"""
+import importlib
+
+class LazyModule:
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        # appelé seulement pour les attributs absents: _name/_module sont toujours trouvés
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "chargé" if self._module is not None else "non chargé"
+        return f"<LazyModule {self._name} ({state})>"
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+def load(*modules: LazyModule):
+    """Force le chargement (phase de warmup)."""
+    for m in modules:
+        getattr(m, "__name__")
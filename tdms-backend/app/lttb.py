@@ -1,8 +1,10 @@
 # Installation requise: pip install lttb
+from __future__ import annotations
 
-import lttb
-import numpy as np
-import pandas as pd
+from .lazy import lazy_import
+lttb = lazy_import("lttb")
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
 def downsample_with_lttb(df: pd.DataFrame, target_points: int) -> pd.DataFrame:
     """
@@ -19,7 +21,7 @@ def downsample_with_lttb(df: pd.DataFrame, target_points: int) -> pd.DataFrame:
         time_values = df['time'].values
         if pd.api.types.is_datetime64_any_dtype(df['time']):
             # Convertir en timestamps Unix (secondes)
-            time_values = pd.to_datetime(df['time']).astype('int64') / 1e9
+            time_values = pd.to_datetime(df['time']).astype('datetime64[ns]').astype('int64') / 1e9
         else:
             time_values = time_values.astype(float)
         
@@ -67,7 +69,7 @@ def downsample_with_lttbc(df: pd.DataFrame, target_points: int) -> pd.DataFrame:
     # Même logique mais avec lttbc
     time_values = df['time'].values
     if pd.api.types.is_datetime64_any_dtype(df['time']):
-        time_values = pd.to_datetime(df['time']).astype('int64') / 1e9
+        time_values = pd.to_datetime(df['time']).astype('datetime64[ns]').astype('int64') / 1e9
     else:
         time_values = time_values.astype(float)
     
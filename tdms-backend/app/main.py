@@ -1,27 +1,67 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import SQLModel, create_engine, Session, select
-from datetime import datetime
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from anyio import to_thread
+from sqlmodel import Session, select
+from datetime import datetime, timezone
 from pathlib import Path
-import pandas as pd
-import numpy as np
-import pyarrow.parquet as pq
 from .lttb import smart_downsample_production
-import pyarrow as pa
-import pyarrow.compute as pc
 from datetime import datetime as dt
+import functools
+import os
 import json
+import threading
+import time
 
-from .models import Dataset, Channel
-from .io_tdms import tdms_to_parquet
+from .models import Dataset, Channel, DerivedChannelCreate, Property, SegmentIndex, SegmentIndexCreate
+from .db import engine, init_db
+from .io_tdms import tdms_to_parquet, tdms_metadata, ensure_materialized, get_parquet_profile
+from .derived import parse_expression, resolve_refs
+from .store import read_channel_table, time_source_path, iter_channel_arrays
+from .store import channel_version, derived_cache, shared_cache
+from .spectral import compute_spectrum, estimate_rows
+from .cache import LRUCache
+from .resample import AGGREGATIONS, compare_on_grid, nan_to_none
+from .scan import is_transitions, raw_bound, read_transitions, sample_range, time_bounds, transition_meta
+from .transitions import step_series, transition_runs, transition_stats
+from .aggregates import RangeAccumulator, load_block_stats, range_stats
+from .distribution import Histogram, grid_edges, load_histograms, range_histogram
+from .export import EXPORT_FORMATS, stream_export
+from .events import CONDITIONS, search_channel
+from .fleet import NUMERIC_TYPES, FleetAccumulator, footer_fields, is_numeric, partition_path, scan_fleet
+from .segments import TRIGGERS, detect_triggers, ensemble, relative_grid, stack_segments
+from .properties import channel_filter, decode_value, properties_meta, property_names, property_rows
+from .admission import (AdmissionController, AdmissionRejected, estimate_materialize_bytes, estimate_read_bytes,
+                        estimate_stream_bytes, needs_materialization)
+from .prefetch import Prefetcher, neighbour_windows
 from .config import settings, get_api_constraints  # Import de la configuration
+from .lazy import lazy_import, load
+from . import lttb as lttb_module
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+pq = lazy_import("pyarrow.parquet")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
 
-# Utilisation de la configuration centralisée
-DB_URL = settings.db_url
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
-SQLModel.metadata.create_all(engine)
+DATA_DIR = Path("data")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialisation au démarrage du worker (et non à l'import du module)."""
+    DATA_DIR.mkdir(exist_ok=True)
+    init_db()
+    # une requête en attente d'admission bloque un thread du pool des routes sync:
+    # la file reste sous la taille du pool pour ne pas affamer les autres routes
+    threads = to_thread.current_default_thread_limiter().total_tokens
+    admission.max_queue = max(1, min(settings.admission_max_queue, int(threads) - settings.admission_reserved_threads))
+    if settings.warmup_channels > 0:
+        # en tâche de fond: le worker accepte les requêtes pendant le préchargement
+        threading.Thread(target=warmup, args=(settings.warmup_channels,), daemon=True).start()
+    yield
 
-app = FastAPI(title="TDMS → Parquet API")
+app = FastAPI(title="TDMS → Parquet API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,8 +69,328 @@ app.add_middleware(
     allow_methods=["*"], allow_headers=["*"],
 )
 
-DATA_DIR = Path("data")
-DATA_DIR.mkdir(exist_ok=True)
+# Préchargement des fenêtres voisines / parentes (thread de fond, par worker)
+prefetcher = Prefetcher(
+    settings.prefetch_rate,
+    settings.prefetch_idle_ms / 1000,
+    settings.prefetch_max_channels,
+    settings.prefetch_enabled,
+)
+
+@app.middleware("http")
+async def track_foreground(request, call_next):
+    """Requêtes utilisateur en cours: le préchargement attend qu'il n'y en ait plus."""
+    prefetcher.begin_foreground()
+    try:
+        return await call_next(request)
+    finally:
+        prefetcher.end_foreground()
+
+# Résultats spectraux par (canal, plage, nfft, ...)
+spectrum_cache = LRUCache(settings.spectrum_cache_mb * 1024 * 1024)
+
+def shared_response(namespace: str):
+    """
+    Met en cache (disque partagé entre workers) la réponse JSON d'une route par canal.
+    Clé = paramètres de la requête + version du canal: un calcul fait par un
+    worker profite à tous les autres.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(**kwargs):
+            with Session(engine) as s:
+                ch = s.get(Channel, kwargs["channel_id"])
+            if ch is None:
+                return fn(**kwargs)  # la route lève le 404
+            shared_cache.touch_marker("usage", str(ch.id))
+            # canal (ou source d'un dérivé) pas encore matérialisé: rien en cache,
+            # la route le convertit elle-même, sous contrôle d'admission
+            key = None
+            if not _materialization_targets([ch]):
+                key = json.dumps([namespace, channel_version(ch), kwargs], sort_keys=True, default=str)
+                cached = shared_cache.get_json(namespace, key)
+                if cached is not None:
+                    return cached
+            result = fn(**kwargs)
+            if key is None:
+                key = json.dumps([namespace, channel_version(ch), kwargs], sort_keys=True, default=str)
+            shared_cache.put_json(namespace, key, result)
+            return result
+        return wrapper
+    return decorator
+
+# Budget mémoire des lectures lourdes (par worker)
+admission = AdmissionController(
+    settings.admission_budget_mb * 1024 * 1024,
+    settings.admission_timeout_s,
+    settings.admission_max_queue,
+    settings.admission_enabled,
+)
+
+def admitted(route: str, estimate):
+    """
+    Soumet une route au contrôle d'admission: estimate(**kwargs) -> octets estimés.
+    Placé sous shared_response: une réponse déjà en cache ne consomme pas de budget.
+    Refus (file pleine / délai dépassé) -> 503 avec Retry-After. Une réponse
+    streamée garde son budget jusqu'à la fin du flux.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(**kwargs):
+            if not admission.enabled:
+                return fn(**kwargs)
+            try:
+                ticket = admission.acquire(route, estimate(**kwargs))
+            except AdmissionRejected as e:
+                raise HTTPException(503, str(e), headers={"Retry-After": str(e.retry_after)})
+            try:
+                result = fn(**kwargs)
+            except BaseException as e:
+                admission.release(ticket, type(e).__name__)
+                raise
+            if isinstance(result, StreamingResponse):
+                result.body_iterator = _released(result.body_iterator, ticket)
+            else:
+                admission.release(ticket)
+            return result
+        return wrapper
+    return decorator
+
+async def _released(chunks, ticket: dict):
+    """Flux d'une réponse admise: budget rendu à la fin (ou à l'interruption) du flux."""
+    error = None
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        admission.release(ticket, error)
+
+def prefetched(route: str, predict):
+    """
+    Après chaque réponse, programme le préchargement des fenêtres que
+    predict(**kwargs) juge probables (liste de kwargs). La prédiction est
+    faite par le thread de préchargement: ni latence ni erreur ajoutée à la
+    requête. Placé au-dessus de shared_response: les fenêtres préchargées
+    arrivent dans le cache partagé.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(**kwargs):
+            if not prefetcher.enabled or prefetcher.in_prefetch():
+                return fn(**kwargs)
+            prefetcher.record(route, kwargs)
+            result = fn(**kwargs)
+            prefetcher.schedule(kwargs["channel_id"], route, fn, functools.partial(predict, **kwargs))
+            return result
+        return wrapper
+    return decorator
+
+def _channel_span(channel_id: int) -> tuple[float, float] | None:
+    """Plage complète d'un canal (secondes Unix ou index), comme la renvoie /time_range au frontend; None si vide."""
+    tr = get_channel_time_range(channel_id=channel_id)
+    lo, hi = (tr.get("min_timestamp"), tr.get("max_timestamp")) if tr["has_time"] else (tr.get("min_index"), tr.get("max_index"))
+    return None if lo is None or hi is None else (lo, hi)
+
+def window_neighbours(**kwargs) -> list[dict]:
+    """/window: fenêtres voisines d'une vue relative (secondes depuis le début)."""
+    if not kwargs["relative"] or kwargs["start_sec"] is None or kwargs["end_sec"] is None:
+        return []
+    span = _channel_span(kwargs["channel_id"])
+    if span is None:
+        return []
+    lo, hi = span
+    return [{**kwargs, "start_sec": a, "end_sec": b}
+            for a, b in neighbour_windows(kwargs["start_sec"], kwargs["end_sec"], 0.0, hi - lo)]
+
+def window_filtered_neighbours(**kwargs) -> list[dict]:
+    """/get_window_filtered: tuiles voisines et parente d'une vue zoomée (hors pagination)."""
+    if kwargs["cursor"] is not None or kwargs["start_timestamp"] is None or kwargs["end_timestamp"] is None:
+        return []
+    span = _channel_span(kwargs["channel_id"])
+    if span is None:
+        return []
+    lo, hi = span
+    return [{**kwargs, "start_timestamp": a, "end_timestamp": b}
+            for a, b in neighbour_windows(kwargs["start_timestamp"], kwargs["end_timestamp"], lo, hi)]
+
+def _segment_selection(segment_id: int, offset: int = 0, limit: int | None = None) -> int:
+    with Session(engine) as s:
+        idx = s.get(SegmentIndex, segment_id)
+    if idx is None:
+        return 0
+    n = max(idx.n_segments - offset, 0)
+    return n if limit is None else min(n, limit)
+
+def segment_data_cost(segment_id: int, channel_ids: str, points: int, offset: int = 0, limit: int | None = None, **_) -> int:
+    """/segments/{id}/data: tableau 2-D (segments x points) + grille aplatie et son ordre de tri, par canal."""
+    channels = _channels(parse_ids(channel_ids, "channel_ids"))
+    return max(_segment_selection(segment_id, offset, limit) * points * 8 * 4 * len(channels),
+               materialize_cost(channels))
+
+def parse_ids(value: str, name: str) -> list[int]:
+    """Liste d'IDs séparés par des virgules; 400 si l'un d'eux n'est pas un entier."""
+    try:
+        return [int(x) for x in value.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(400, f"{name}: IDs entiers séparés par des virgules attendus ({value!r})")
+
+def _channels(ids) -> list[Channel]:
+    with Session(engine) as s:
+        return [ch for ch in (s.get(Channel, cid) for cid in ids) if ch]
+
+def _materialization_targets(channels) -> list[Channel]:
+    """Canaux paresseux pas encore convertis que la lecture de channels va matérialiser (sources des dérivés comprises)."""
+    targets = []
+    for ch in channels:
+        if ch.expression:
+            targets += [b for b in _channels(parse_expression(ch.expression)[1]) if needs_materialization(b)]
+        elif needs_materialization(ch):
+            targets.append(ch)
+    return targets
+
+def materialize_cost(channels, parallel: int = 1) -> int:
+    """
+    Matérialisation préalable à la lecture (un row group par conversion,
+    `parallel` conversions à la fois). Elle se termine avant la lecture: une
+    route coûte le maximum des deux phases.
+    """
+    group_rows = get_parquet_profile(settings.parquet_profile)["row_group_size"]
+    costs = sorted((estimate_materialize_bytes(ch, group_rows, settings.admission_overhead)
+                    for ch in _materialization_targets(channels)), reverse=True)
+    return sum(costs[:parallel])
+
+def relative_origin(ch: Channel) -> int | None:
+    """Premier instant d'un canal horodaté (us), origine du mode relatif de /window."""
+    bounds = time_bounds(time_source_path(ch))
+    return None if bounds is None else bounds[0]
+
+def _iso_seconds(value: str) -> float:
+    """Datetime ISO -> secondes Unix (sans fuseau: UTC, comme la colonne time)."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.value / 1e9
+
+def window_bounds(ch: Channel, start=None, end=None, start_sec=None, end_sec=None, relative=False,
+                  origin: int | None = None) -> tuple[float | None, float | None]:
+    """/window: bornes de lecture (secondes Unix ou index) déduites des paramètres de la route."""
+    if ch.has_time and relative:
+        if start_sec is None and end_sec is None:
+            return None, None
+        origin = relative_origin(ch) if origin is None else origin
+        if origin is None:
+            return None, None
+        t0 = origin / 1_000_000
+        return (None if start_sec is None else t0 + float(start_sec),
+                None if end_sec is None else t0 + float(end_sec))
+    if ch.has_time:
+        return (_iso_seconds(start) if start else None, _iso_seconds(end) if end else None)
+    return (int(start) if start else None, int(end) if end else None)
+
+def window_cost(channel_id: int, start=None, end=None, start_sec=None, end_sec=None, relative=False, **_) -> int:
+    """/window: lignes de la fenêtre converties en DataFrame."""
+    channels = _channels([channel_id])
+    total = 0
+    for ch in channels:
+        if _stored_transitions(ch):
+            continue  # fenêtre calculée sur les paliers, sans reconstituer les échantillons
+        lo, hi = window_bounds(ch, start, end, start_sec, end_sec, relative)
+        total += estimate_read_bytes(ch, lo, hi, settings.admission_overhead)
+    return max(total, materialize_cost(channels))
+
+def multi_window_cost(channel_ids: str, start_timestamp=None, end_timestamp=None, **_) -> int:
+    """/multi_window: canaux lus l'un après l'autre, seul le plus gros compte."""
+    channels = _channels(parse_ids(channel_ids, "channel_ids"))
+    reads = max((estimate_read_bytes(ch, start_timestamp, end_timestamp, settings.admission_overhead)
+                 for ch in channels if not _stored_transitions(ch)), default=0)
+    return max(reads, materialize_cost(channels))
+
+def _stored_transitions(ch: Channel) -> bool:
+    return not ch.expression and os.path.exists(ch.parquet_path) and is_transitions(ch.parquet_path)
+
+def window_filtered_cost(channel_id: int, start_timestamp=None, end_timestamp=None, cursor=None, **_) -> int:
+    """/get_window_filtered: lignes de la fenêtre (estimées depuis le footer Parquet)."""
+    start = start_timestamp if cursor is None else max(cursor, start_timestamp if start_timestamp is not None else cursor)
+    channels = _channels([channel_id])
+    total = 0
+    for ch in channels:
+        if cursor is None and _stored_transitions(ch):
+            continue  # fenêtre calculée sur les paliers, sans reconstituer les échantillons
+        total += estimate_read_bytes(ch, start, end_timestamp, settings.admission_overhead)
+    return max(total, materialize_cost(channels))
+
+def _stream_bytes(ch: Channel, start=None, end=None) -> int:
+    return estimate_stream_bytes(ch, start, end, get_parquet_profile(settings.parquet_profile)["row_group_size"],
+                                 settings.admission_overhead)
+
+def export_cost(channel_ids: str, start_timestamp=None, end_timestamp=None, **_) -> int:
+    """/export: un row group de chaque canal en mémoire à la fois (lecture alignée en flux)."""
+    channels = _channels(parse_ids(channel_ids, "channel_ids"))
+    return max(sum(_stream_bytes(ch, start_timestamp, end_timestamp) for ch in channels), materialize_cost(channels))
+
+def compare_cost(channel_ids: str, points: int, mode: str = "absolute", start_timestamp=None, end_timestamp=None,
+                 **_) -> int:
+    """/compare: canaux lus en flux l'un après l'autre + une grille d'agrégation par canal."""
+    channels = _channels(parse_ids(channel_ids, "channel_ids"))
+    lo, hi = (start_timestamp, end_timestamp) if mode == "absolute" else (None, None)
+    reads = max((_stream_bytes(ch, lo, hi) for ch in channels), default=0) + len(channels) * points * 8 * 4
+    return max(reads, materialize_cost(channels))
+
+def spectrum_cost(channel_id: int, kind: str = "welch", start_timestamp=None, end_timestamp=None, nfft: int = 1024,
+                  max_frames: int = 200, **_) -> int:
+    """/channels/{id}/spectrum: un row group + un lot de segments FFT (+ colonnes du spectrogramme)."""
+    frames = max_frames if kind == "spectrogram" else 1
+    channels = _channels([channel_id])
+    reads = sum(_stream_bytes(ch, start_timestamp, end_timestamp) for ch in channels) + (64 + frames) * nfft * 16
+    return max(reads, materialize_cost(channels))
+
+def fleet_cost(channel: str, group=None, dataset_ids=None, points: int = 500, **_) -> int:
+    """
+    /fleet/query: `fleet_readahead` row groups décodés en parallèle + agrégats
+    par canal et par case (canaux paresseux convertis avant, autant à la fois).
+    """
+    with Session(engine) as s:
+        query = select(Channel).where(Channel.channel_name == channel)
+        if group:
+            query = query.where(Channel.group_name == group)
+        if dataset_ids:
+            query = query.where(Channel.dataset_id.in_(parse_ids(dataset_ids, "dataset_ids")))
+        channels = s.exec(query).all()
+    n = len(channels)
+    group_rows = get_parquet_profile(settings.parquet_profile)["row_group_size"]
+    reads = int(min(n, settings.fleet_readahead) * group_rows * 16 * settings.admission_overhead) + n * points * 8 * 5
+    return max(reads, materialize_cost(channels, max(1, settings.fleet_readahead)))
+
+def warmup(n_channels: int):
+    """
+    Préchauffe un worker: modules lourds, puis métadonnées et données décodées
+    des canaux les plus récemment consultés (tous workers confondus).
+    """
+    t0 = time.perf_counter()
+    load(pd, np, pa, pq, pc, lttb_module.lttb)
+
+    ids = [int(x) for x in shared_cache.recent_markers("usage", n_channels)]
+    with Session(engine) as s:
+        if not ids:
+            # aucun historique: les derniers canaux ingérés
+            ids = [c.id for c in s.exec(select(Channel).order_by(Channel.id.desc()).limit(n_channels))]
+        channels = [ch for ch in (s.get(Channel, cid) for cid in ids) if ch]
+
+    warmed = 0
+    for ch in channels:
+        try:
+            ensure_materialized(ch)
+            get_channel_time_range(channel_id=ch.id)
+            read_channel_table(ch)
+            if not ch.expression:
+                load_block_stats(ch.parquet_path)
+            warmed += 1
+        except Exception as e:
+            print(f"[warmup] canal {ch.id} ignoré: {e}")
+    print(f"[warmup] {warmed} canal(aux) préchargé(s) en {time.perf_counter() - t0:.2f}s")
 
 # Route pour exposer les contraintes au frontend
 @app.get("/api/constraints")
@@ -38,18 +398,51 @@ def get_constraints():
     """Expose les contraintes backend au frontend."""
     return get_api_constraints()
 
+# État des caches (partagé entre workers + caches locaux au processus)
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "shared": shared_cache.stats(),
+        "derived": derived_cache.stats(),
+        "spectrum": spectrum_cache.stats(),
+        "prefetch": prefetcher.stats(),
+    }
+
+# État du contrôle d'admission (budget, file d'attente, pics mémoire des dernières requêtes)
+@app.get("/admission/stats")
+def admission_stats():
+    return admission.stats()
+
 @app.post("/ingest")
-async def ingest(file: UploadFile = File(...)):
+async def ingest(
+    file: UploadFile = File(...),
+    index: UploadFile | None = File(None, description="Fichier .tdms_index associé (optionnel, accélère la lecture des métadonnées)"),
+    lazy: bool | None = Query(None, description="Métadonnées seules, canaux convertis à la première lecture (défaut: LAZY_INGEST)"),
+):
+    lazy = settings.lazy_ingest if lazy is None else lazy
+
     # Sauvegarde temporaire
     tmp_path = Path("tmp") / f"{datetime.utcnow().timestamp()}_{file.filename}"
     tmp_path.parent.mkdir(exist_ok=True)
     content = await file.read()
     tmp_path.write_bytes(content)
 
-    # Convertit en Parquet + métadonnées
     out_dir = DATA_DIR / tmp_path.stem
-    meta = tdms_to_parquet(str(tmp_path), str(out_dir))
-    tmp_path.unlink()
+    if lazy:
+        # Le TDMS est conservé (source des canaux), avec son index s'il est fourni:
+        # nptdms lit alors les métadonnées dans <fichier>.tdms_index sans parcourir les données
+        out_dir.mkdir(parents=True, exist_ok=True)
+        source = out_dir / "source.tdms"
+        tmp_path.replace(source)
+        if index is not None:
+            Path(str(source) + "_index").write_bytes(await index.read())
+        meta, props = tdms_metadata(str(source), str(out_dir))
+        for m in meta:
+            m["source"] = str(source)
+    else:
+        # Convertit en Parquet + métadonnées
+        meta, props = tdms_to_parquet(str(tmp_path), str(out_dir), settings.parquet_profile, settings.stats_block_rows)
+        tmp_path.unlink()
 
     # Enregistre en DB
     # ⬇️ IMPORTANT: expire_on_commit=False pour éviter le DetachedInstanceError
@@ -60,6 +453,7 @@ async def ingest(file: UploadFile = File(...)):
         s.refresh(ds)
         ds_id = ds.id  # on le capture tout de suite
 
+        channels = []
         for m in meta:
             ch = Channel(
                 dataset_id=ds_id,
@@ -69,11 +463,58 @@ async def ingest(file: UploadFile = File(...)):
                 parquet_path=m["parquet"],
                 has_time=m["has_time"],
                 unit=m["unit"],
+                source_path=m.get("source"),
+                time_start=m.get("time_start"),
+                time_end=m.get("time_end"),
+                value_type=m.get("value_type"),
+                # ingestion paresseuse: encodage connu à la matérialisation
+                encoding=None if lazy else (m.get("encoding") or "plain"),
             )
             s.add(ch)
+            channels.append(ch)
+        s.flush()  # ids des canaux pour rattacher leurs propriétés
+        s.add_all(property_rows(ds_id, props, {(c.group_name, c.channel_name): c.id for c in channels}))
         s.commit()
 
-    return {"dataset_id": ds_id, "channels": meta}
+    return {"dataset_id": ds_id, "lazy": lazy, "channels": meta}
+
+@app.post("/derived_channels")
+def create_derived_channel(body: DerivedChannelCreate):
+    """
+    Déclare un canal dérivé (virtuel), évalué à la demande sur la fenêtre lue.
+    Ex: {"name": "Y - X", "expression": "ch3 - ch2"} ou "rolling_rms(ch5, 100)".
+    Le canal obtenu s'utilise comme les autres (/window, /get_window_filtered, /multi_window...).
+    """
+    try:
+        _, refs, _ = parse_expression(body.expression)
+        bases = resolve_refs(refs)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except KeyError as e:
+        raise HTTPException(404, f"Channel {e.args[0]} not found")
+
+    ref = bases[refs[0]]
+    if len({b.has_time for b in bases.values()}) > 1:
+        raise HTTPException(400, "Impossible de combiner des canaux horodatés et indexés")
+
+    with Session(engine, expire_on_commit=False) as s:
+        ch = Channel(
+            dataset_id=body.dataset_id or ref.dataset_id,
+            group_name="Derived",
+            channel_name=body.name,
+            n_rows=ref.n_rows,
+            parquet_path="",
+            has_time=ref.has_time,
+            unit=body.unit,
+            expression=body.expression,
+            time_start=ref.time_start,
+            time_end=ref.time_end,
+            value_type="double",
+        )
+        s.add(ch)
+        s.commit()
+        s.refresh(ch)
+    return ch
 
 @app.get("/datasets")
 def list_datasets():
@@ -86,6 +527,9 @@ def list_channels(dataset_id: int):
         return s.exec(select(Channel).where(Channel.dataset_id == dataset_id)).all()
 
 @app.get("/window")
+@prefetched("window", window_neighbours)
+@shared_response("tiles")
+@admitted("window", window_cost)
 def get_window(
     channel_id: int = Query(...),
     start: str | None = Query(None, description="ISO datetimes si has_time"),
@@ -100,14 +544,31 @@ def get_window(
         ch = s.get(Channel, channel_id)
         if not ch:
             raise HTTPException(404, "Channel not found")
+    ensure_materialized(ch)
 
-    df = pq.read_table(ch.parquet_path).to_pandas()
+    # lecture limitée à la fenêtre: un canal dérivé n'est évalué que sur ces bornes
+    origin = relative_origin(ch) if ch.has_time and relative else None
+    lo, hi = window_bounds(ch, start, end, start_sec, end_sec, relative, origin)
+
+    # Canal stocké en transitions: fronts exacts calculés sur les paliers
+    tr = None if ch.expression else read_transitions(ch.parquet_path)
+    if tr is not None:
+        res = transition_window(ch, tr, lo, hi, points, method)
+        x = np.asarray(res["x"])
+        out = {"unit": ch.unit, "has_time": ch.has_time, "method": res["method"],
+               "original_points": res["original_points"], "returned_points": res["sampled_points"]}
+        if ch.has_time and relative:
+            return {"x": np.round(x - origin / 1_000_000, 6).tolist(), "y": res["y"], **out, "x_unit": "s"}
+        return {"x": iso_times(x) if ch.has_time else res["x"], "y": res["y"], **out}
+
+    df = read_channel_table(ch, lo, hi).to_pandas()
 
     if ch.has_time:
         df["time"] = pd.to_datetime(df["time"])
 
         if relative:
-            df["sec"] = (df["time"] - df["time"].iloc[0]).dt.total_seconds()
+            t0 = df["time"].min() if origin is None else pd.Timestamp(origin, unit="us")
+            df["sec"] = (df["time"] - t0).dt.total_seconds()
 
             # Filtrage temporel
             if start_sec is not None:
@@ -190,24 +651,60 @@ def get_window(
 
 @app.get("/dataset_meta")
 def dataset_meta(dataset_id: int):
-    # On récupère UN canal pour retrouver le dossier "data/<stem>"
+    """Propriétés fichier / groupes / canaux d'un dataset, extraites à l'ingestion (sans relire le TDMS)."""
     with Session(engine) as s:
-        ch = s.exec(select(Channel).where(Channel.dataset_id == dataset_id)).first()
-        if not ch:
+        if not s.get(Dataset, dataset_id):
             raise HTTPException(404, "Dataset not found")
-    meta_path = Path(ch.parquet_path).parent / "_meta.json"
-    if not meta_path.exists():
-        # pas de meta.json -> renvoyer quelque chose de minimal
-        return {"file_properties": {}, "group_properties": {}, "channels": []}
-    return json.loads(meta_path.read_text(encoding="utf-8"))
+        props = s.exec(select(Property).where(Property.dataset_id == dataset_id).order_by(Property.id)).all()
+    # dataset ingéré avant l'extraction des propriétés: description vide
+    return properties_meta(props)
+
+@app.get("/search/properties")
+def search_properties(
+    filter: list[str] = Query([], description="Filtres 'nom op valeur' (op: = != < <= > >= ~), préfixes file. / group. possibles"),
+    dataset_ids: str | None = Query(None, description="Restreint aux datasets (IDs séparés par des virgules)"),
+    limit: int = Query(1000, ge=1, le=100_000),
+):
+    """
+    Canaux dont les propriétés vérifient tous les filtres, ex.
+    ?filter=NI_UnitDescription=V&filter=wf_increment<1e-3. Sans filtre: liste
+    des noms de propriétés connus (pour construire les filtres).
+    """
+    with Session(engine) as s:
+        if not filter:
+            return {"properties": property_names(s)}
+        try:
+            conditions = [channel_filter(f) for f in filter]
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        q = select(Channel).where(*conditions)
+        if dataset_ids:
+            q = q.where(Channel.dataset_id.in_(parse_ids(dataset_ids, "dataset_ids")))
+        channels = s.exec(q.order_by(Channel.id).limit(limit + 1)).all()
+        truncated = len(channels) > limit
+        channels = channels[:limit]
+        props = s.exec(select(Property).where(Property.channel_id.in_([c.id for c in channels]))).all()
+
+    by_channel: dict[int, dict] = {}
+    for p in props:
+        by_channel.setdefault(p.channel_id, {})[p.name] = decode_value(p)
+    return {
+        "filters": filter,
+        "count": len(channels),
+        "truncated": truncated,
+        "channels": [{**c.model_dump(), "properties": by_channel.get(c.id, {})} for c in channels],
+    }
 
 @app.get("/multi_window")
+@admitted("multi_window", multi_window_cost)
 def multi_window(
     channel_ids: str,
     points: int = Query(settings.default_points, ge=settings.points_min, le=settings.points_max),
-    agg: str = Query("mean", description="mean|max|min")
+    agg: str = Query("mean", description="mean|max|min"),
+    start_timestamp: float | None = Query(None, description="Timestamp Unix de début (secondes) ou index"),
+    end_timestamp: float | None = Query(None, description="Timestamp Unix de fin (secondes) ou index"),
 ):
-    ids = [int(x) for x in channel_ids.split(",") if x.strip()]
+    ids = parse_ids(channel_ids, "channel_ids")
     series = []
 
     with Session(engine) as s:
@@ -215,7 +712,20 @@ def multi_window(
             ch = s.get(Channel, cid)
             if not ch:
                 continue
-            df = pq.read_table(ch.parquet_path).to_pandas()
+            ensure_materialized(ch)
+            tr = None if ch.expression else read_transitions(ch.parquet_path)
+            if tr is not None:
+                # paliers: fronts exacts plutôt qu'une agrégation par tranches d'échantillons
+                res = transition_window(ch, tr, start_timestamp, end_timestamp, points, "lttb")
+                series.append({
+                    "name": f"{ch.group_name} / {ch.channel_name} (ds{ch.dataset_id})",
+                    "x": iso_times(np.asarray(res["x"])) if ch.has_time else res["x"],
+                    "y": res["y"],
+                })
+                continue
+
+            # canal dérivé évalué seulement sur la fenêtre demandée
+            df = read_channel_table(ch, start_timestamp, end_timestamp).to_pandas()
 
             if len(df) > points:
                 bins = np.linspace(0, len(df)-1, points+1, dtype=int)
@@ -246,7 +756,96 @@ def multi_window(
 
     return {"series": series}
 
+@app.get("/compare")
+@admitted("compare", compare_cost)
+def compare_channels(
+    channel_ids: str = Query(..., description="IDs séparés par des virgules (tous datasets confondus)"),
+    points: int = Query(settings.default_points, ge=settings.points_min, le=settings.points_max),
+    mode: str = Query("absolute", description="absolute|relative (recalage sur le début de chaque canal)"),
+    agg: str = Query("mean", description="mean|max|min|interp"),
+    start_timestamp: float | None = Query(None, description="mode absolute: début (timestamp Unix s ou index)"),
+    end_timestamp: float | None = Query(None, description="mode absolute: fin (timestamp Unix s ou index)"),
+    start_sec: float | None = Query(None, description="mode relative: début en secondes depuis le départ"),
+    end_sec: float | None = Query(None, description="mode relative: fin en secondes depuis le départ"),
+):
+    """
+    Comparaison multi-canaux sur une grille de temps commune.
+
+    Contrairement à /multi_window (découpage par index de ligne), chaque canal
+    est agrégé ou interpolé sur les mêmes instants: les séries de fréquences
+    d'échantillonnage ou de départs différents sont réellement alignées.
+    Réponse: un seul tableau x (secondes) et un tableau y par canal (null = pas de donnée).
+    """
+    if mode not in ("absolute", "relative"):
+        raise HTTPException(400, f"mode inconnu: {mode} (absolute|relative)")
+    if agg not in AGGREGATIONS:
+        raise HTTPException(400, f"agg inconnu: {agg} ({'|'.join(AGGREGATIONS)})")
+
+    ids = parse_ids(channel_ids, "channel_ids")
+    with Session(engine) as s:
+        channels = [ensure_materialized(ch) for ch in (s.get(Channel, cid) for cid in ids) if ch]
+    if not channels:
+        raise HTTPException(404, "Aucun channel trouvé")
+    if len({ch.has_time for ch in channels}) > 1:
+        raise HTTPException(400, "Impossible d'aligner des canaux horodatés et indexés")
+
+    pairs = [(ch, time_bounds(time_source_path(ch))) for ch in channels]
+    pairs = [(ch, b) for ch, b in pairs if b is not None]
+    if not pairs:
+        return {"x": [], "series": [], "mode": mode, "agg": agg}
+
+    scale = 1_000_000 if channels[0].has_time else 1
+    lo, hi = (start_timestamp, end_timestamp) if mode == "absolute" else (start_sec, end_sec)
+    return compare_on_grid(
+        [ch for ch, _ in pairs], [b for _, b in pairs], iter_channel_arrays, points, mode, agg,
+        None if lo is None else int(round(lo * scale)),
+        None if hi is None else int(round(hi * scale)),
+    )
+
+@app.get("/export")
+@admitted("export", export_cost)
+def export_channels(
+    channel_ids: str = Query(..., description="IDs séparés par des virgules"),
+    start_timestamp: float | None = Query(None, description="Timestamp Unix de début (secondes) ou index"),
+    end_timestamp: float | None = Query(None, description="Timestamp Unix de fin (secondes) ou index"),
+    format: str = Query("csv", description="csv|parquet|arrow"),
+):
+    """
+    Export brut (sans downsampling) de plusieurs canaux alignés sur le temps.
+
+    - Lecture row group par row group: mémoire constante quelle que soit la taille
+    - Jointure externe sur le temps (valeurs manquantes = null)
+    - Réponse streamée en CSV, Parquet ou Arrow IPC (stream)
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(400, f"Format inconnu: {format} (csv|parquet|arrow)")
+
+    ids = parse_ids(channel_ids, "channel_ids")
+    if not ids:
+        raise HTTPException(400, "Aucun channel_id fourni")
+
+    with Session(engine) as s:
+        channels = []
+        for cid in ids:
+            ch = s.get(Channel, cid)
+            if not ch:
+                raise HTTPException(404, f"Channel {cid} not found")
+            channels.append(ensure_materialized(ch))
+
+    if len({ch.has_time for ch in channels}) > 1:
+        raise HTTPException(400, "Impossible d'aligner des canaux horodatés et indexés dans un même export")
+
+    media_type, ext = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        stream_export(channels, start_timestamp, end_timestamp, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="export.{ext}"'},
+    )
+
 @app.get("/get_window_filtered")
+@prefetched("get_window_filtered", window_filtered_neighbours)
+@shared_response("tiles")
+@admitted("get_window_filtered", window_filtered_cost)
 def get_window_filtered(
     channel_id: int = Query(...),
     # Fenêtrage temporel avec timestamps Unix (plus efficace)
@@ -278,6 +877,12 @@ def get_window_filtered(
         ch = s.get(Channel, channel_id)
         if not ch:
             raise HTTPException(404, "Channel not found")
+    ensure_materialized(ch)
+
+    # Canal stocké en transitions: fronts exacts calculés sur les paliers
+    tr = None if ch.expression else read_transitions(ch.parquet_path)
+    if tr is not None and cursor is None:
+        return transition_window(ch, tr, start_timestamp, end_timestamp, points, method)
     
     # 2. Construction des filtres PyArrow (TRÈS EFFICACE)
     filters = []
@@ -308,7 +913,14 @@ def get_window_filtered(
     
     # 3. Lecture optimisée avec PyArrow (FILTRAGE PUSH-DOWN)
     try:
-        if filters:
+        if ch.expression or tr is not None:
+            # Canal dérivé ou en transitions: lecture limitée à la fenêtre demandée (mêmes filtres ensuite)
+            lo = start_timestamp if cursor is None else max(cursor, start_timestamp or cursor)
+            table = read_channel_table(ch, lo, end_timestamp)
+            for _, op, bound in filters:
+                cmp = {'>=': pc.greater_equal, '<=': pc.less_equal, '>': pc.greater}[op]
+                table = table.filter(cmp(table['time'], bound))
+        elif filters:
             # Lecture avec filtres (très efficace, ne lit que les données nécessaires)
             table = pq.read_table(
                 ch.parquet_path,
@@ -401,6 +1013,42 @@ def get_window_filtered(
         }
     }
 
+def iso_times(seconds: np.ndarray) -> list[str]:
+    """Secondes Unix -> datetimes ISO (ms), format des réponses /window et /multi_window."""
+    times = pd.Series(pd.to_datetime(np.round(seconds * 1_000_000).astype(np.int64), unit="us"))
+    return times.astype("datetime64[ms]").dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ").tolist()
+
+def transition_window(ch: Channel, tr: dict, start: float | None, end: float | None, points: int, method: str) -> dict:
+    """
+    Fenêtre d'un canal à paliers: premier et dernier échantillon de chaque
+    palier, soit des fronts exacts quel que soit le zoom. Réduit par LTTB
+    seulement si la fenêtre contient plus de paliers que de points demandés.
+    """
+    bound_type = pa.timestamp("us") if ch.has_time else pa.int64()
+    lo, hi = raw_bound(bound_type, start), raw_bound(bound_type, end)
+    i0, i1 = sample_range(tr, lo, hi)
+    x, y = step_series(tr, lo, hi)
+    df = pd.DataFrame({"time": x / 1_000_000 if ch.has_time else x, "value": y.astype(float)})
+    if len(df) > points:
+        df = smart_downsample_production(df, points) if method == "lttb" \
+            else df.iloc[np.linspace(0, len(df) - 1, points, dtype=int)]
+    return {
+        "x": df["time"].astype(float if ch.has_time else int).tolist(),
+        "y": df["value"].astype(float).tolist(),
+        "unit": ch.unit,
+        "has_time": ch.has_time,
+        "original_points": i1 - i0,
+        "sampled_points": len(df),
+        "has_more": False,
+        "next_cursor": None,
+        "method": "transitions",
+        "performance": {
+            "filtered_points": i1 - i0,
+            "limited_points": len(x),
+            "optimization": "transition_encoding"
+        }
+    }
+
 # Route utilitaire pour conversion timestamp
 @app.get("/timestamp_helpers")
 def timestamp_helpers(
@@ -443,6 +1091,7 @@ def timestamp_helpers(
 
 # Route de métadonnées temporelles pour un channel
 @app.get("/channels/{channel_id}/time_range")
+@shared_response("meta")
 def get_channel_time_range(channel_id: int):
     """
     Récupère la plage temporelle d'un channel (min/max timestamps).
@@ -453,10 +1102,14 @@ def get_channel_time_range(channel_id: int):
         ch = s.get(Channel, channel_id)
         if not ch:
             raise HTTPException(404, "Channel not found")
+    ensure_materialized(ch)
     
     try:
-        # Lecture optimisée : seulement la colonne time
-        table = pq.read_table(ch.parquet_path, columns=['time'])
+        # Lecture optimisée : seulement la colonne time (canal de référence si dérivé)
+        table = pq.read_table(time_source_path(ch), columns=['time'])
+        # canal en transitions: le fichier ne contient pas tous les échantillons
+        encoded = transition_meta(table.schema)
+        total_points = encoded["n_rows"] if encoded else len(table)
         
         if len(table) == 0:
             return {
@@ -482,7 +1135,7 @@ def get_channel_time_range(channel_id: int):
                 "max_timestamp": max_unix,
                 "min_iso": min_time.isoformat() + "Z" if min_time else None,
                 "max_iso": max_time.isoformat() + "Z" if max_time else None,
-                "total_points": len(table),
+                "total_points": total_points,
                 "usage": f"Utilisez start_timestamp entre {min_unix} et {max_unix}"
             }
         else:
@@ -496,9 +1149,518 @@ def get_channel_time_range(channel_id: int):
                 "has_time": False,
                 "min_index": min_idx,
                 "max_index": max_idx,
-                "total_points": len(table),
+                "total_points": total_points,
                 "usage": f"Utilisez start_timestamp entre {min_idx} et {max_idx}"
             }
     
     except Exception as e:
-        raise HTTPException(500, f"Erreur lecture métadonnées: {str(e)}")
\ No newline at end of file
+        raise HTTPException(500, f"Erreur lecture métadonnées: {str(e)}")
+
+# Route d'analyse spectrale d'un channel
+@app.get("/channels/{channel_id}/spectrum")
+@admitted("spectrum", spectrum_cost)
+def get_channel_spectrum(
+    channel_id: int,
+    kind: str = Query("welch", description="welch|spectrogram"),
+    start_timestamp: float | None = Query(None, description="Timestamp Unix de début (secondes) ou index"),
+    end_timestamp: float | None = Query(None, description="Timestamp Unix de fin (secondes) ou index"),
+    nfft: int = Query(1024, ge=16, le=65536, description="Taille des segments FFT"),
+    overlap: float = Query(0.5, ge=0.0, lt=1.0, description="Recouvrement des segments (0-1)"),
+    max_frames: int = Query(200, ge=1, le=2000, description="Colonnes de temps max (spectrogramme)"),
+    max_bins: int = Query(1024, ge=16, le=8192, description="Nombre max de bins de fréquence renvoyés"),
+):
+    """
+    PSD de Welch ou spectrogramme sous-échantillonné d'un channel.
+
+    - Lecture row group par row group, FFT par lots de segments: mémoire bornée
+    - Fréquences décrites par f0/df (pas de tableau x), PSD linéaire, spectrogramme en dB
+    - Résultats mis en cache par (channel, plage, nfft, paramètres)
+    """
+    if kind not in ("welch", "spectrogram"):
+        raise HTTPException(400, f"kind inconnu: {kind} (welch|spectrogram)")
+
+    with Session(engine) as s:
+        ch = s.get(Channel, channel_id)
+        if not ch:
+            raise HTTPException(404, "Channel not found")
+    ensure_materialized(ch)
+
+    key = (channel_id, ch.expression, kind, start_timestamp, end_timestamp, nfft, overlap, max_frames, max_bins)
+    cached = spectrum_cache.get(key)
+    if cached is not None:
+        return cached
+
+    expected_rows = estimate_rows(time_source_path(ch), start_timestamp, end_timestamp)
+    try:
+        result = compute_spectrum(
+            iter_channel_arrays(ch, start_timestamp, end_timestamp), ch.has_time,
+            kind, nfft, overlap, expected_rows, max_frames, max_bins,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    result.update({"channel_id": channel_id, "unit": ch.unit})
+    n_values = len(result.get("psd", [])) + sum(len(row) for row in result.get("z_db", []))
+    spectrum_cache.put(key, result, size=8 * n_values + 1024)
+    return result
+
+# Route de statistiques de plage d'un channel
+@app.get("/channels/{channel_id}/stats")
+def get_channel_stats(
+    channel_id: int,
+    start: float | None = Query(None, description="Début: timestamp Unix (s) ou index"),
+    end: float | None = Query(None, description="Fin: timestamp Unix (s) ou index"),
+):
+    """
+    min/max/mean/RMS/std d'un channel sur [start, end].
+
+    Utilise les agrégats par blocs calculés à l'ingestion (sommes préfixes +
+    sparse table): coût constant quelle que soit la longueur de la plage.
+    Repli sur un parcours row group par row group si le sidecar est absent
+    (canal dérivé ou ingéré avant l'ajout des agrégats).
+    """
+    with Session(engine) as s:
+        ch = s.get(Channel, channel_id)
+        if not ch:
+            raise HTTPException(404, "Channel not found")
+    ensure_materialized(ch)
+
+    t0 = time.perf_counter()
+    stats = None if ch.expression else load_block_stats(ch.parquet_path)
+    tr = None if ch.expression or stats is not None else read_transitions(ch.parquet_path)
+    if tr is not None:
+        bound_type = pa.timestamp("us") if ch.has_time else pa.int64()
+        acc = transition_stats(tr, raw_bound(bound_type, start), raw_bound(bound_type, end))
+        result = {**acc.result(), "method": "transitions"}
+    elif stats is not None:
+        time_type = pq.read_schema(ch.parquet_path).field("time").type
+        result = {**range_stats(ch.parquet_path, stats, start, end, time_type), "method": "blocks"}
+    else:
+        acc = RangeAccumulator()
+        for _, v in iter_channel_arrays(ch, start, end):
+            acc.add_values(v)
+        result = {**acc.result(), "method": "scan"}
+
+    return {
+        "channel_id": channel_id,
+        "unit": ch.unit,
+        "start": start,
+        "end": end,
+        **result,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+    }
+
+# Route de distribution des valeurs d'un channel (histogramme + quantiles)
+@app.get("/channels/{channel_id}/distribution")
+def get_channel_distribution(
+    channel_id: int,
+    start: float | None = Query(None, description="Début: timestamp Unix (s) ou index"),
+    end: float | None = Query(None, description="Fin: timestamp Unix (s) ou index"),
+    bins: int = Query(64, ge=1, le=4096, description="Nombre max de classes de l'histogramme renvoyé"),
+    quantiles: str = Query("0.01,0.05,0.25,0.5,0.75,0.95,0.99", description="Quantiles (0-1) séparés par des virgules"),
+):
+    """
+    Histogramme et quantiles approchés d'un channel sur [start, end].
+
+    Fusionne les histogrammes par row group calculés à l'ingestion (seuls les
+    deux row groups de bord sont lus): coût quasi constant quelle que soit la
+    longueur de la plage. Erreur d'un quantile <= quantile_error (largeur d'une
+    classe de la grille d'ingestion). Canal à paliers: calcul exact sur les
+    paliers. Repli sur deux parcours row group par row group si le sidecar est
+    absent (canal dérivé ou ingéré avant l'ajout des histogrammes).
+    """
+    try:
+        qs = [float(q) for q in quantiles.split(",") if q.strip()]
+    except ValueError:
+        raise HTTPException(400, f"Quantiles invalides: {quantiles!r}")
+    if any(not 0 <= q <= 1 for q in qs):
+        raise HTTPException(400, "Les quantiles doivent être compris entre 0 et 1")
+
+    with Session(engine) as s:
+        ch = s.get(Channel, channel_id)
+        if not ch:
+            raise HTTPException(404, "Channel not found")
+    ensure_materialized(ch)
+
+    t0 = time.perf_counter()
+    hist = None if ch.expression else load_histograms(ch.parquet_path)
+    tr = None if ch.expression or hist is not None else read_transitions(ch.parquet_path)
+    extra = {}
+    if tr is not None:
+        bound_type = pa.timestamp("us") if ch.has_time else pa.int64()
+        _, _, values, counts = transition_runs(tr, raw_bound(bound_type, start), raw_bound(bound_type, end))
+        v = values.astype(np.float64)
+        ok = ~np.isnan(v)
+        lo, hi = (v[ok].min(), v[ok].max()) if ok.any() else (0.0, 1.0)
+        acc = Histogram(grid_edges(float(lo), float(hi), settings.hist_bins))
+        acc.add_values(v, counts)
+        # quelques niveaux distincts: quantiles exacts
+        result = {**acc.result(bins, qs, (v[ok], counts[ok])), "method": "transitions"}
+    elif hist is not None:
+        time_type = pq.read_schema(ch.parquet_path).field("time").type
+        acc, merged, scanned = range_histogram(ch.parquet_path, hist, start, end, time_type)
+        result = {**acc.result(bins, qs), "method": "sketch"}
+        extra = {"row_groups": merged, "edge_row_groups": scanned}
+    else:
+        # 1er parcours: étendue, 2e: effectifs sur la grille
+        rng = RangeAccumulator()
+        for _, v in iter_channel_arrays(ch, start, end):
+            rng.add_values(v)
+        lo, hi = (rng.min, rng.max) if rng.count else (0.0, 1.0)
+        acc = Histogram(grid_edges(float(lo), float(hi), settings.hist_bins))
+        for _, v in iter_channel_arrays(ch, start, end):
+            acc.add_values(v)
+        result = {**acc.result(bins, qs), "method": "scan"}
+
+    return {
+        "channel_id": channel_id,
+        "unit": ch.unit,
+        "start": start,
+        "end": end,
+        **result,
+        **extra,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+    }
+
+# Recherche d'évènements (seuil / fronts) sur plusieurs canaux et datasets
+@app.get("/search/events")
+def search_events(
+    condition: str = Query(..., description="above|below (intervalles) ou rising|falling|cross (fronts)"),
+    threshold: float = Query(..., description="Seuil, dans l'unité du canal"),
+    channel_ids: str | None = Query(None, description="IDs séparés par des virgules"),
+    dataset_ids: str | None = Query(None, description="Tous les canaux de ces datasets (IDs séparés par des virgules)"),
+    name: str | None = Query(None, description="Filtre sur le nom de canal (sous-chaîne, insensible à la casse)"),
+    start: float | None = Query(None, description="Début: timestamp Unix (s) ou index"),
+    end: float | None = Query(None, description="Fin: timestamp Unix (s) ou index"),
+    max_events: int = Query(1000, ge=1, le=100000, description="Nombre max d'évènements par canal"),
+):
+    """
+    Intervalles où un canal dépasse (ou passe sous) un seuil, ou instants de
+    franchissement, sur un ensemble de canaux en un seul appel.
+
+    Les blocs dont le min/max (agrégats d'ingestion ou footer Parquet) ne
+    contiennent pas le seuil sont traités sans lecture: seuls les blocs où un
+    évènement est possible sont décodés.
+    """
+    if condition not in CONDITIONS:
+        raise HTTPException(400, f"condition inconnue: {condition} ({'|'.join(CONDITIONS)})")
+    if not (channel_ids or dataset_ids or name):
+        raise HTTPException(400, "Préciser channel_ids, dataset_ids ou name")
+
+    with Session(engine) as s:
+        query = select(Channel)
+        if channel_ids:
+            query = query.where(Channel.id.in_(parse_ids(channel_ids, "channel_ids")))
+        if dataset_ids:
+            query = query.where(Channel.dataset_id.in_(parse_ids(dataset_ids, "dataset_ids")))
+        if name:
+            query = query.where(Channel.channel_name.ilike(f"%{name}%"))
+        channels = s.exec(query.order_by(Channel.id)).all()
+    if not channels:
+        raise HTTPException(404, "Aucun channel trouvé")
+
+    t0 = time.perf_counter()
+    results = []
+    for ch in channels:
+        try:
+            found = search_channel(ensure_materialized(ch), condition, threshold, start, end, max_events)
+        except (ValueError, TypeError) as e:
+            # canal non numérique (chaînes...): signalé sans interrompre la recherche
+            found = {"events": [], "count": 0, "error": str(e)}
+        results.append({
+            "channel_id": ch.id,
+            "dataset_id": ch.dataset_id,
+            "name": f"{ch.group_name} / {ch.channel_name}",
+            "unit": ch.unit,
+            "has_time": ch.has_time,
+            **found,
+        })
+
+    return {
+        "condition": condition,
+        "threshold": threshold,
+        "channels": results,
+        "total_events": sum(r["count"] for r in results),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+    }
+
+# Index de segments (impulsions, balayages) détectés sur un canal de référence
+def _segment_summary(idx: SegmentIndex) -> dict:
+    return idx.model_dump(exclude={"triggers"})
+
+@app.post("/segments")
+def create_segment_index(body: SegmentIndexCreate):
+    """
+    Détecte une fois les déclenchements d'un canal de référence (front ou
+    dépassement de seuil) et enregistre l'index de segments de son dataset.
+    Ex: {"reference_channel_id": 3, "condition": "rising", "threshold": 0.5,
+    "pre": 0.01, "post": 0.2, "holdoff": 0.1}. pre/post/holdoff en secondes
+    (échantillons si le canal est indexé).
+    """
+    if body.condition not in TRIGGERS:
+        raise HTTPException(400, f"condition inconnue: {body.condition} ({'|'.join(TRIGGERS)})")
+    if body.pre < 0 or body.post < 0 or body.pre + body.post <= 0 or body.holdoff < 0:
+        raise HTTPException(400, "pre/post/holdoff doivent être positifs, avec pre + post > 0")
+    if not 1 <= body.max_segments <= 100_000:
+        raise HTTPException(400, "max_segments doit être compris entre 1 et 100000")
+
+    with Session(engine) as s:
+        ref = s.get(Channel, body.reference_channel_id)
+        if not ref:
+            raise HTTPException(404, "Channel not found")
+    ensure_materialized(ref)
+
+    scale = 1_000_000 if ref.has_time else 1
+    t0 = time.perf_counter()
+    try:
+        triggers, truncated = detect_triggers(ref, body.condition, body.threshold, body.start, body.end,
+                                              int(round(body.holdoff * scale)), body.max_segments)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(400, f"Canal de référence non numérique: {e}")
+
+    with Session(engine, expire_on_commit=False) as s:
+        idx = SegmentIndex(
+            dataset_id=ref.dataset_id,
+            reference_channel_id=ref.id,
+            name=body.name,
+            condition=body.condition,
+            threshold=body.threshold,
+            pre=body.pre,
+            post=body.post,
+            holdoff=body.holdoff,
+            has_time=ref.has_time,
+            n_segments=len(triggers),
+            triggers=json.dumps(triggers.tolist()),
+        )
+        s.add(idx)
+        s.commit()
+        s.refresh(idx)
+    return {**_segment_summary(idx), "truncated": truncated,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3)}
+
+@app.get("/datasets/{dataset_id}/segments")
+def list_segment_indexes(dataset_id: int):
+    with Session(engine) as s:
+        found = s.exec(select(SegmentIndex).where(SegmentIndex.dataset_id == dataset_id).order_by(SegmentIndex.id)).all()
+    return [_segment_summary(idx) for idx in found]
+
+@app.get("/segments/{segment_id}")
+def get_segment_index(segment_id: int):
+    """Index de segments avec ses instants de déclenchement (secondes Unix ou index)."""
+    with Session(engine) as s:
+        idx = s.get(SegmentIndex, segment_id)
+        if not idx:
+            raise HTTPException(404, "Segment index not found")
+    scale = 1_000_000 if idx.has_time else 1
+    return {**_segment_summary(idx), "triggers": [t / scale if idx.has_time else t for t in json.loads(idx.triggers)]}
+
+@app.get("/segments/{segment_id}/data")
+@admitted("segments", segment_data_cost)
+def get_segment_data(
+    segment_id: int,
+    channel_ids: str = Query(..., description="IDs séparés par des virgules"),
+    points: int = Query(1000, ge=settings.points_min, le=settings.points_max, description="Instants de la grille relative"),
+    offset: int = Query(0, ge=0, description="Premier segment retenu"),
+    limit: int | None = Query(None, ge=1, description="Nombre max de segments retenus"),
+    include_segments: int = Query(0, ge=0, le=1000, description="Renvoie aussi les N premiers segments alignés"),
+):
+    """
+    Segments alignés sur leur déclenchement pour plusieurs canaux, résumés par
+    une moyenne d'ensemble (mean/std/min/max, count = segments couvrant chaque
+    instant): une réponse compacte au lieu de milliers de fenêtres.
+    x: temps relatif au déclenchement (s, ou échantillons si canal indexé).
+    """
+    with Session(engine) as s:
+        idx = s.get(SegmentIndex, segment_id)
+        if not idx:
+            raise HTTPException(404, "Segment index not found")
+    ids = parse_ids(channel_ids, "channel_ids")
+    channels = [ensure_materialized(ch) for ch in _channels(ids)]
+    if not channels:
+        raise HTTPException(404, "Aucun channel trouvé")
+    if any(ch.has_time != idx.has_time for ch in channels):
+        raise HTTPException(400, "Impossible d'aligner des canaux horodatés et indexés")
+
+    scale = 1_000_000 if idx.has_time else 1
+    triggers = np.array(json.loads(idx.triggers), dtype=np.int64)
+    triggers = triggers[offset:None if limit is None else offset + limit]
+    rel = relative_grid(int(round(idx.pre * scale)), int(round(idx.post * scale)), points)
+
+    t0 = time.perf_counter()
+    series = []
+    for ch in channels:
+        bounds = time_bounds(time_source_path(ch))
+        period = (bounds[1] - bounds[0]) / max(ch.n_rows - 1, 1) if bounds else 1
+        # canaux dérivés / en transitions: reconstitués par blocs de taille comparable
+        pf = None if ch.expression else pq.ParquetFile(ch.parquet_path)
+        group_rows = pf.metadata.row_group(0).num_rows if pf and pf.metadata.num_row_groups \
+            and not transition_meta(pf.schema_arrow) else 262_144
+        try:
+            stack = stack_segments(ch, triggers, rel, period, group_rows)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(400, f"Channel {ch.id} non numérique: {e}")
+        summary = ensemble(stack)
+        entry = {
+            "channel_id": ch.id,
+            "name": f"{ch.group_name} / {ch.channel_name}",
+            "unit": ch.unit,
+            **{k: nan_to_none(summary[k]) for k in ("mean", "std", "min", "max")},
+            "count": summary["count"].tolist(),
+        }
+        if include_segments:
+            entry["segments"] = [nan_to_none(row) for row in stack[:include_segments]]
+        series.append(entry)
+
+    return {
+        "segment_id": segment_id,
+        "x": (rel / scale).tolist(),
+        "x_unit": "s" if idx.has_time else "index",
+        "n_segments": len(triggers),
+        "trigger_times": (triggers / scale).tolist() if idx.has_time else triggers.tolist(),
+        "series": series,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+    }
+
+# Requête d'un même canal sur plusieurs datasets (scan Arrow parallèle)
+@app.get("/fleet/query")
+@admitted("fleet_query", fleet_cost)
+def fleet_query(
+    channel: str = Query(..., description="Nom exact du canal, ex. Sine50Hz"),
+    group: str | None = Query(None, description="Nom de groupe (sinon tous)"),
+    dataset_ids: str | None = Query(None, description="IDs séparés par des virgules (sinon tous)"),
+    since: str | None = Query(None, description="Date de début (AAAA-MM-JJ, UTC) des partitions"),
+    until: str | None = Query(None, description="Date de fin incluse (AAAA-MM-JJ, UTC) des partitions"),
+    start: float | None = Query(None, description="Début: timestamp Unix (s) ou index"),
+    end: float | None = Query(None, description="Fin: timestamp Unix (s) ou index"),
+    agg: str = Query("series", description="series (courbes sous-échantillonnées) | stats (une ligne par canal)"),
+    align: str = Query("relative", description="relative (depuis le début de chaque canal) | absolute"),
+    points: int = Query(500, ge=settings.points_min, le=settings.points_max, description="Cases de temps (agg=series)"),
+):
+    """
+    Un canal sur tous les datasets qui le contiennent, en un seul appel.
+
+    Élagage des partitions (dataset / groupe / canal / date) en SQL, puis un
+    seul pyarrow.dataset scanné en parallèle avec filtre de temps poussé
+    jusqu'aux row groups. agg=series: min/mean/max par case de temps et par
+    canal (x en secondes depuis le début de chaque canal si align=relative);
+    agg=stats: count/min/max/mean/rms/std par canal.
+    """
+    if agg not in ("series", "stats"):
+        raise HTTPException(400, f"agg inconnu: {agg} (series|stats)")
+    if align not in ("relative", "absolute"):
+        raise HTTPException(400, f"align inconnu: {align} (relative|absolute)")
+    try:
+        since_ts = None if since is None else datetime.fromisoformat(since).replace(tzinfo=timezone.utc).timestamp()
+        until_ts = None if until is None else datetime.fromisoformat(until).replace(tzinfo=timezone.utc).timestamp() + 86400
+    except ValueError:
+        raise HTTPException(400, "since/until: dates attendues au format AAAA-MM-JJ")
+
+    with Session(engine) as s:
+        query = select(Channel).where(Channel.channel_name == channel)
+        if group:
+            query = query.where(Channel.group_name == group)
+        if dataset_ids:
+            query = query.where(Channel.dataset_id.in_(parse_ids(dataset_ids, "dataset_ids")))
+        # étendue inconnue (base antérieure): le canal est gardé, l'étendue complétée plus bas
+        if since_ts is not None:
+            query = query.where(Channel.has_time, (Channel.time_end == None) | (Channel.time_end >= since_ts))  # noqa: E711
+        if until_ts is not None:
+            query = query.where(Channel.has_time, (Channel.time_start == None) | (Channel.time_start < until_ts))  # noqa: E711
+        if start is not None:
+            query = query.where((Channel.time_end == None) | (Channel.time_end >= start))  # noqa: E711
+        if end is not None:
+            query = query.where((Channel.time_start == None) | (Channel.time_start <= end))  # noqa: E711
+        # valeurs agrégeables (type inconnu: vérifié plus bas)
+        query = query.where((Channel.expression != None) | (Channel.value_type == None)  # noqa: E711
+                            | Channel.value_type.in_(NUMERIC_TYPES))
+        channels = s.exec(query.order_by(Channel.dataset_id, Channel.id)).all()
+        filenames = {d.id: d.filename for d in s.exec(select(Dataset).where(
+            Dataset.id.in_({ch.dataset_id for ch in channels})))}
+    if not channels:
+        raise HTTPException(404, "Aucun channel trouvé")
+    if len({ch.has_time for ch in channels}) > 1:
+        raise HTTPException(400, "Canaux horodatés et indexés mélangés: préciser group ou dataset_ids")
+
+    t0 = time.perf_counter()
+    # canaux paresseux pas encore convertis: matérialisés en parallèle (encodage gardé en base)
+    pending = [ch for ch in channels if ch.source_path and not os.path.exists(ch.parquet_path)]
+    if pending:
+        with ThreadPoolExecutor(max(1, settings.fleet_readahead)) as pool:
+            list(pool.map(ensure_materialized, pending))
+
+    # champs encore inconnus (base antérieure, autre worker): lus une fois dans le footer puis gardés
+    updates = {}
+    for ch in channels:
+        fields = footer_fields(ch)
+        if fields:
+            updates.setdefault(ch.id, {}).update(fields)
+    if updates:
+        with Session(engine) as s:
+            for ch in channels:
+                if ch.id in updates:
+                    row = s.get(Channel, ch.id)
+                    for name, value in updates[ch.id].items():
+                        setattr(row, name, value)
+                        setattr(ch, name, value)
+                    s.add(row)
+            s.commit()
+
+    skipped = [ch.id for ch in channels if not is_numeric(ch)]
+    channels = [ch for ch in channels if ch.id not in skipped]
+    # étendues complétées ci-dessus: mêmes conditions que l'élagage SQL (canal vide écarté)
+    channels = [ch for ch in channels if ch.time_start is not None
+                and (start is None or ch.time_end >= start) and (end is None or ch.time_start <= end)
+                and (since_ts is None or ch.time_end >= since_ts) and (until_ts is None or ch.time_start < until_ts)]
+
+    has_time = channels[0].has_time if channels else True
+    scale = 1_000_000 if has_time else 1
+    los = [max(ch.time_start, start) if start is not None else ch.time_start for ch in channels]
+    his = [min(ch.time_end, end) if end is not None else ch.time_end for ch in channels]
+    if agg == "stats" or not channels:
+        width, origins, x = None, [0] * len(channels), None
+        n_bins = 1
+    elif align == "absolute":
+        lo, hi = min(los), max(his)
+        width = max((hi - lo) * scale, 1) / points
+        origins, n_bins = [lo * scale] * len(channels), points
+        x = ((lo * scale + (np.arange(points) + 0.5) * width) / scale).tolist()
+    else:
+        span = max(h - l for l, h in zip(los, his))
+        width = max(span * scale, 1) / points
+        origins, n_bins = [l * scale for l in los], points
+        x = ((np.arange(points) + 0.5) * width / scale).tolist()
+
+    acc = FleetAccumulator([ch.id for ch in channels], origins, width, n_bins)
+    info = scan_fleet(channels, has_time, start, end, acc, settings.fleet_readahead) if channels else {}
+    res = acc.result()
+
+    series = []
+    for i, ch in enumerate(channels):
+        entry = {
+            "channel_id": ch.id,
+            "dataset_id": ch.dataset_id,
+            "filename": filenames.get(ch.dataset_id),
+            "group": ch.group_name,
+            "partition": partition_path(ch),
+            "unit": ch.unit,
+        }
+        if agg == "stats":
+            count = int(res["count"][i, 0])
+            entry.update({"count": count, **{k: float(res[k][i, 0]) if count else None
+                                             for k in ("min", "max", "mean", "rms", "std")}})
+        else:
+            entry.update({"count": int(res["count"][i].sum()),
+                          **{k: nan_to_none(res[k][i]) for k in ("min", "mean", "max")}})
+        series.append(entry)
+
+    return {
+        "channel": channel,
+        "agg": agg,
+        "align": align if agg == "series" else None,
+        "has_time": has_time,
+        **({"x": x, "x_unit": "s" if has_time else "index"} if agg == "series" else {}),
+        "series": series,
+        "skipped_non_numeric": skipped,
+        **info,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+    }
@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from typing import Optional
 from datetime import datetime
@@ -16,3 +17,68 @@ class Channel(SQLModel, table=True):
     parquet_path: str
     has_time: bool
     unit: Optional[str] = None
+    # Canal dérivé (virtuel): expression sur d'autres canaux, ex. "ch3 - ch2"
+    expression: Optional[str] = None
+    # Ingestion paresseuse: TDMS source, le Parquet n'est écrit qu'à la première lecture
+    source_path: Optional[str] = None
+    # Premier / dernier temps (secondes Unix, ou index sans piste de temps): élagage des requêtes multi-datasets
+    time_start: Optional[float] = None
+    time_end: Optional[float] = None
+    # Type Arrow de la colonne value (ex. "double", "int16", "string") et stockage Parquet
+    # ("plain" | "transitions", NULL tant qu'un canal paresseux n'est pas matérialisé)
+    value_type: Optional[str] = None
+    encoding: Optional[str] = None
+
+class Property(SQLModel, table=True):
+    """Propriété TDMS (fichier, groupe ou canal) extraite à l'ingestion, interrogeable sans relire le TDMS."""
+    __table_args__ = (
+        Index("ix_property_name_value_num", "name", "value_num"),
+        Index("ix_property_name_value", "name", "value"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    dataset_id: int = Field(foreign_key="dataset.id", index=True)
+    level: str  # file | group | channel
+    group_name: Optional[str] = None
+    channel_name: Optional[str] = None
+    channel_id: Optional[int] = Field(default=None, foreign_key="channel.id", index=True)
+    name: str
+    # valeur affichable (ISO 8601 pour les dates) + valeur numérique pour les comparaisons
+    value: str
+    value_num: Optional[float] = None
+    value_type: str  # str | int | float | bool | datetime
+
+class SegmentIndex(SQLModel, table=True):
+    """Index de segments d'un dataset: déclenchements détectés une fois sur un canal de référence."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    dataset_id: int = Field(foreign_key="dataset.id", index=True)
+    reference_channel_id: int = Field(foreign_key="channel.id")
+    name: Optional[str] = None
+    condition: str  # rising | falling | cross | above | below
+    threshold: float
+    # fenêtre autour du déclenchement et écart minimal: secondes, ou échantillons si canal indexé
+    pre: float
+    post: float
+    holdoff: float = 0.0
+    has_time: bool
+    n_segments: int
+    # instants de déclenchement (us ou index), liste JSON
+    triggers: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SegmentIndexCreate(SQLModel):
+    reference_channel_id: int
+    threshold: float
+    post: float
+    pre: float = 0.0
+    condition: str = "rising"
+    holdoff: float = 0.0
+    start: Optional[float] = None
+    end: Optional[float] = None
+    max_segments: int = 10000
+    name: Optional[str] = None
+
+class DerivedChannelCreate(SQLModel):
+    name: str
+    expression: str
+    dataset_id: Optional[int] = None
+    unit: Optional[str] = None
@@ -0,0 +1,214 @@
+"""
+Préchargement prédictif, côté serveur, des fenêtres voisines d'une vue.
+
+Après une fenêtre zoomée, l'action suivante est presque toujours un
+déplacement vers la plage voisine ou un dézoom. Après chaque fenêtre servie,
+on programme donc le calcul des fenêtres gauche/droite de même largeur et de
+la fenêtre parente (niveau de zoom plus grossier); les résultats arrivent
+dans le cache partagé et profitent à tous les workers.
+
+Le préchargement ne concurrence jamais les requêtes utilisateur:
+- un seul thread de fond, qui attend que le worker soit inactif depuis
+  `idle_s` avant chaque calcul; la prédiction elle-même (plage du canal,
+  fenêtres voisines) y est faite aussi, jamais dans la requête
+- débit limité (`rate` calculs par seconde au plus)
+- une nouvelle vue d'un canal remplace les prédictions en attente pour ce
+  canal; seuls les `max_channels` canaux consultés en dernier sont gardés
+
+Quand la vue suit la grille de tuiles du frontend (2^niveau tuiles alignées
+sur la plage du canal), les fenêtres prédites sont les tuiles voisines et la
+tuile parente, calculées avec la même arithmétique que le frontend: les clés
+de cache coïncident exactement avec ses requêtes suivantes.
+"""
+from __future__ import annotations
+from collections import OrderedDict, deque
+import json
+import math
+import threading
+import time
+
+def neighbour_windows(start: float, end: float, lo: float, hi: float) -> list[tuple[float, float]]:
+    """
+    Fenêtres probables après [start, end] dans la plage [lo, hi]: voisines
+    gauche/droite puis parente. Tuiles du frontend si la vue en est une,
+    sinon décalages d'une largeur et fenêtre deux fois plus large centrée.
+    """
+    span, width = hi - lo, end - start
+    if not (span > 0 and width > 0) or width >= span:
+        return []
+
+    # vue alignée sur la grille de tuiles (viewportCache.ts: tileAt); largeur à l'arrondi près
+    level = min(40, round(math.log2(span / width)))
+    tile = span / 2 ** level
+    index = round((start - lo) / tile)
+
+    def tile_at(lv: int, i: int) -> tuple[float, float]:
+        w = span / 2 ** lv
+        return lo + i * w, lo + (i + 1) * w
+
+    if 0 <= index < 2 ** level and tile_at(level, index) == (start, end):
+        windows = [tile_at(level, i) for i in (index - 1, index + 1) if 0 <= i < 2 ** level]
+        if level > 0:
+            windows.append(tile_at(level - 1, index // 2))
+        return windows
+
+    windows = []
+    if start > lo:
+        windows.append((max(start - width, lo), start))
+    if end < hi:
+        windows.append((end, min(end + width, hi)))
+    center = (start + end) / 2
+    parent = (max(center - width, lo), min(center + width, hi))
+    if parent != (start, end):
+        windows.append(parent)
+    return windows
+
+class Prefetcher:
+    """File de prédictions par canal, exécutée par un thread de fond à basse priorité."""
+
+    def __init__(self, rate: float, idle_s: float, max_channels: int, enabled: bool = True, history: int = 1024):
+        self.rate = rate
+        self.idle_s = idle_s
+        self.max_channels = max_channels
+        self.enabled = enabled
+        self._cond = threading.Condition()
+        # canal -> tâches ("plan", route, fn, predict) ou ("fetch", route, fn, kwargs), du canal consulté le plus ancien au plus récent
+        self._pending: OrderedDict[int, deque] = OrderedDict()
+        self._foreground = 0
+        self._last_foreground = 0.0
+        self._done: OrderedDict[str, None] = OrderedDict()  # clés déjà préchargées (mesure des succès)
+        self._history = history
+        self._local = threading.local()
+        self._worker: threading.Thread | None = None
+        self.scheduled = 0
+        self.executed = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.hits = 0
+
+    @staticmethod
+    def key(route: str, kwargs: dict) -> str:
+        return json.dumps([route, kwargs], sort_keys=True, default=str)
+
+    def in_prefetch(self) -> bool:
+        """Vrai dans le thread de préchargement (ses appels ne programment rien)."""
+        return getattr(self._local, "active", False)
+
+    # ---- Requêtes utilisateur ----
+
+    def begin_foreground(self):
+        with self._cond:
+            self._foreground += 1
+
+    def end_foreground(self):
+        with self._cond:
+            self._foreground -= 1
+            self._last_foreground = time.monotonic()
+            self._cond.notify_all()
+
+    def record(self, route: str, kwargs: dict):
+        """Compte une requête utilisateur déjà préchargée."""
+        with self._cond:
+            if self.key(route, kwargs) in self._done:
+                self.hits += 1
+
+    def schedule(self, channel_id: int, route: str, fn, predict):
+        """
+        Remplace les prédictions en attente d'un canal. predict() -> liste de
+        kwargs de fn à précharger; appelé par le thread de fond (jamais dans la requête).
+        """
+        if not self.enabled or self.in_prefetch():
+            return
+        with self._cond:
+            self._cancel(self._pending.pop(channel_id, None))
+            self._pending[channel_id] = deque([("plan", route, fn, predict)])
+            self._trim()
+            self._cond.notify_all()
+        self._ensure_worker()
+
+    def _expand(self, channel_id: int, route: str, fn, calls: list[dict]):
+        """Tâches de préchargement d'une prédiction, sauf si une vue plus récente du canal l'a remplacée."""
+        with self._cond:
+            if channel_id in self._pending:
+                return
+            tasks = deque(("fetch", route, fn, kwargs) for kwargs in calls if self.key(route, kwargs) not in self._done)
+            if tasks:
+                self._pending[channel_id] = tasks
+                self.scheduled += len(tasks)
+                self._trim()
+
+    def _cancel(self, tasks):
+        if tasks:
+            self.cancelled += sum(1 for task in tasks if task[0] == "fetch")
+
+    def _trim(self):
+        while len(self._pending) > self.max_channels:
+            self._cancel(self._pending.popitem(last=False)[1])
+
+    # ---- Thread de fond ----
+
+    def _ensure_worker(self):
+        with self._cond:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _next_task(self):
+        """Attend une tâche et un worker inactif; tâche du canal consulté le plus récemment d'abord."""
+        with self._cond:
+            while True:
+                idle = time.monotonic() - self._last_foreground
+                if self._pending and self._foreground == 0 and idle >= self.idle_s:
+                    channel_id = next(reversed(self._pending))
+                    tasks = self._pending[channel_id]
+                    task = tasks.popleft()
+                    if not tasks:
+                        del self._pending[channel_id]
+                    return channel_id, task
+                # requête en cours: end_foreground réveille le thread
+                busy = not self._pending or self._foreground
+                self._cond.wait(None if busy else max(self.idle_s - idle, 0.005))
+
+    def _run(self):
+        self._local.active = True
+        while True:
+            channel_id, (kind, route, fn, arg) = self._next_task()
+            if kind == "plan":
+                try:
+                    calls = arg()
+                except Exception as e:
+                    with self._cond:
+                        self.errors += 1
+                    print(f"[prefetch] prédiction {route} canal {channel_id} ignorée: {e}")
+                    continue
+                self._expand(channel_id, route, fn, calls)
+                continue
+            kwargs = arg
+            t0 = time.monotonic()
+            try:
+                fn(**kwargs)
+                with self._cond:
+                    self.executed += 1
+                    self._done[self.key(route, kwargs)] = None
+                    while len(self._done) > self._history:
+                        self._done.popitem(last=False)
+            except Exception as e:
+                with self._cond:
+                    self.errors += 1
+                print(f"[prefetch] {route} {kwargs} ignoré: {e}")
+            # débit limité
+            if self.rate > 0:
+                time.sleep(max(1.0 / self.rate - (time.monotonic() - t0), 0.0))
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "pending": sum(1 for t in self._pending.values() for task in t if task[0] == "fetch"),
+                "channels": list(self._pending),
+                "scheduled": self.scheduled,
+                "executed": self.executed,
+                "cancelled": self.cancelled,
+                "errors": self.errors,
+                "hits": self.hits,
+            }
@@ -0,0 +1,165 @@
+"""
+Propriétés TDMS (fichier, groupe, canal) persistées dans la table Property.
+
+Elles sont extraites pendant l'ingestion, dans la même lecture que les
+données (ou les seules métadonnées en mode paresseux), puis servies par
+/dataset_meta et /search/properties sans rouvrir le TDMS. Chaque valeur est
+gardée sous forme affichable (texte, ISO 8601 pour les dates) et, si elle est
+numérique ou datée, sous forme de nombre (secondes Unix pour les dates) pour
+les comparaisons indexées.
+
+Filtres de recherche: "nom op valeur", op parmi = != < <= > >= ~ (contient).
+Préfixes "file." et "group." pour filtrer un canal sur les propriétés de son
+fichier ou de son groupe, ex. "NI_UnitDescription = V", "wf_increment < 1e-3",
+"group.Rig = Bench A", "file.Author ~ QA".
+"""
+from __future__ import annotations
+from datetime import datetime, timezone
+import re
+
+from sqlalchemy import and_, func, tuple_
+from sqlmodel import select
+
+from .models import Channel, Property
+from .lazy import lazy_import
+np = lazy_import("numpy")
+
+OPERATORS = ("<=", ">=", "!=", "=", "<", ">", "~")
+_FILTER = re.compile(r"^\s*(?:(file|group|channel)\.)?(.+?)\s*(<=|>=|!=|=|<|>|~)\s*(.*?)\s*$")
+
+def encode_value(value) -> tuple[str, float | None, str]:
+    """Valeur de propriété -> (texte, nombre ou None, type)."""
+    if hasattr(value, "as_datetime64"):  # nptdms.TdmsTimestamp
+        value = value.as_datetime64("us")
+    if isinstance(value, (np.datetime64, datetime)):
+        ts = np.datetime64(value, "us")
+        us = int(ts.astype(np.int64))
+        return str(ts) + "Z", us / 1_000_000, "datetime"
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value)).lower(), float(bool(value)), "bool"
+    if isinstance(value, (int, np.integer)):
+        return str(int(value)), float(value), "int"
+    if isinstance(value, (float, np.floating)):
+        return repr(float(value)), float(value), "float"
+    return str(value), None, "str"
+
+def decode_value(p: Property):
+    """Valeur JSON d'une propriété persistée."""
+    if p.value_type == "int":
+        return int(p.value)
+    if p.value_type == "float":
+        return float(p.value)
+    if p.value_type == "bool":
+        return p.value == "true"
+    return p.value
+
+def collect_properties(tdms) -> list[dict]:
+    """Propriétés d'un TdmsFile (déjà ouvert), à tous les niveaux, sous forme de lignes prêtes à insérer."""
+    rows = []
+
+    def add(level, props, group=None, channel=None):
+        for name, value in props.items():
+            text, num, vtype = encode_value(value)
+            rows.append({"level": level, "group": group, "channel": channel, "name": name,
+                         "value": text, "value_num": num, "value_type": vtype})
+
+    add("file", tdms.properties)
+    for group in tdms.groups():
+        add("group", group.properties, group.name)
+        for ch in group.channels():
+            add("channel", ch.properties, group.name, ch.name)
+    return rows
+
+def property_rows(dataset_id: int, props: list[dict], channel_ids: dict[tuple[str, str], int]) -> list[Property]:
+    """Lignes Property d'un dataset; channel_ids associe (groupe, canal) à l'id du Channel."""
+    return [
+        Property(
+            dataset_id=dataset_id,
+            level=p["level"],
+            group_name=p["group"],
+            channel_name=p["channel"],
+            channel_id=channel_ids.get((p["group"], p["channel"])) if p["level"] == "channel" else None,
+            name=p["name"],
+            value=p["value"],
+            value_num=p["value_num"],
+            value_type=p["value_type"],
+        )
+        for p in props
+    ]
+
+def properties_meta(props: list[Property]) -> dict:
+    """Description d'un dataset au format de /dataset_meta."""
+    meta = {"file_properties": {}, "group_properties": {}, "channels": []}
+    channels: dict[tuple[str, str], dict] = {}
+    for p in props:
+        if p.level == "file":
+            meta["file_properties"][p.name] = decode_value(p)
+        elif p.level == "group":
+            meta["group_properties"].setdefault(p.group_name, {})[p.name] = decode_value(p)
+        else:
+            key = (p.group_name, p.channel_name)
+            if key not in channels:
+                channels[key] = {"group": p.group_name, "channel": p.channel_name,
+                                 "channel_id": p.channel_id, "properties": {}}
+                meta["channels"].append(channels[key])
+                # un groupe sans propriétés reste listé
+                meta["group_properties"].setdefault(p.group_name, {})
+            channels[key]["properties"][p.name] = decode_value(p)
+    return meta
+
+def parse_filter(expr: str) -> tuple[str, str, str, str]:
+    """'group.Rig = Bench A' -> (niveau, nom, opérateur, valeur). ValueError si invalide."""
+    m = _FILTER.match(expr)
+    if not m or not m.group(2):
+        raise ValueError(f"Filtre invalide: {expr!r} (attendu: nom op valeur, op parmi {' '.join(OPERATORS)})")
+    level, name, op, value = m.groups()
+    return level or "channel", name, op, value
+
+def _as_number(value: str) -> float | None:
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+def _value_condition(op: str, value: str):
+    """Condition SQL sur la valeur d'une propriété."""
+    if op == "~":
+        return Property.value.ilike(f"%{value}%")
+    num = _as_number(value)
+    if op == "=":
+        # égalité numérique si la valeur s'y prête (1e-3 == 0.001), textuelle sinon
+        cond = Property.value == value
+        return cond | (Property.value_num == num) if num is not None else cond
+    if op == "!=":
+        # négation sûre vis-à-vis de NULL: une propriété texte (value_num NULL) diffère d'un nombre
+        cond = Property.value != value
+        return cond & (Property.value_num.is_(None) | (Property.value_num != num)) if num is not None else cond
+    if num is None:
+        raise ValueError(f"Comparaison {op} avec une valeur non numérique: {value!r}")
+    col = Property.value_num
+    return {"<": col < num, "<=": col <= num, ">": col > num, ">=": col >= num}[op]
+
+def channel_filter(expr: str):
+    """Condition SQL sur Channel: le canal (ou son groupe / son fichier) a une propriété qui vérifie expr."""
+    level, name, op, value = parse_filter(expr)
+    match = and_(Property.level == level, Property.name == name, _value_condition(op, value))
+    if level == "channel":
+        return Channel.id.in_(select(Property.channel_id).where(match))
+    if level == "group":
+        return tuple_(Channel.dataset_id, Channel.group_name).in_(
+            select(Property.dataset_id, Property.group_name).where(match))
+    return Channel.dataset_id.in_(select(Property.dataset_id).where(match))
+
+def property_names(session, level: str | None = None) -> list[dict]:
+    """Noms de propriétés connus (avec nombre d'occurrences), pour construire des filtres."""
+    q = select(Property.level, Property.name, func.count()).group_by(Property.level, Property.name)
+    if level:
+        q = q.where(Property.level == level)
+    return [{"level": lv, "name": n, "count": c} for lv, n, c in session.exec(q.order_by(Property.level, Property.name))]
@@ -0,0 +1,118 @@
+"""
+Rééchantillonnage de plusieurs canaux sur une grille de temps commune.
+
+La grille est définie en temps (et non en index de ligne): `points` cases de
+même largeur entre origin et origin + span. En mode "absolute" l'origine est
+un instant commun à tous les canaux; en mode "relative" chaque canal est
+recalé sur son propre premier échantillon. Les canaux sont lus row group par
+row group et agrégés de façon vectorisée (bincount / reduceat / interp).
+"""
+from __future__ import annotations
+from .lazy import lazy_import
+np = lazy_import("numpy")
+
+AGGREGATIONS = ("mean", "min", "max", "interp")
+
+class GridAccumulator:
+    """Agrégation en flux d'un canal sur une grille régulière."""
+
+    def __init__(self, origin: int, width: float, points: int, agg: str):
+        self.origin = origin
+        self.width = width
+        self.points = points
+        self.agg = agg
+        self.sum = np.zeros(points)
+        self.count = np.zeros(points, dtype=np.int64)
+        self.extreme = np.full(points, np.nan)
+        self.centers = origin + (np.arange(points) + 0.5) * width
+        self.last = None  # dernier échantillon vu (pour interpoler entre deux row groups)
+
+    def feed(self, t: np.ndarray, v: np.ndarray):
+        v = v.astype(np.float64)
+        if self.agg == "interp":
+            self._interp(t, v)
+            return
+        idx = np.floor((t - self.origin) / self.width).astype(np.int64)
+        keep = (idx >= 0) & (idx < self.points)
+        idx, v = idx[keep], v[keep]
+        if not len(idx):
+            return
+        if self.agg == "mean":
+            self.sum += np.bincount(idx, weights=v, minlength=self.points)
+            self.count += np.bincount(idx, minlength=self.points)
+            return
+        # min/max: idx est trié (temps croissant) -> réduction par segments contigus
+        starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+        bins = idx[starts]
+        ufunc = np.maximum if self.agg == "max" else np.minimum
+        reduced = ufunc.reduceat(v, starts)
+        current = self.extreme[bins]
+        self.extreme[bins] = np.where(np.isnan(current), reduced, ufunc(current, reduced))
+
+    def _interp(self, t: np.ndarray, v: np.ndarray):
+        if self.last is not None:
+            t = np.r_[self.last[0], t]
+            v = np.r_[self.last[1], v]
+        lo = np.searchsorted(self.centers, t[0], side="left")
+        hi = np.searchsorted(self.centers, t[-1], side="right")
+        if hi > lo:
+            self.extreme[lo:hi] = np.interp(self.centers[lo:hi], t, v)
+        self.last = (t[-1], v[-1])
+
+    def result(self) -> np.ndarray:
+        if self.agg == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(self.count > 0, self.sum / np.maximum(self.count, 1), np.nan)
+        return self.extreme
+
+def nan_to_none(values: np.ndarray) -> list:
+    """NaN -> null JSON."""
+    out = values.astype(object)
+    out[np.isnan(values)] = None
+    return out.tolist()
+
+def compare_on_grid(channels, bounds, iter_arrays, points: int, mode: str, agg: str,
+                    start: int | None = None, end: int | None = None) -> dict:
+    """
+    channels: liste de Channel; bounds: (min, max) int de chaque canal
+    iter_arrays: fonction (ch, start_s, end_s) -> itérateur (time int64, value)
+    start/end: bornes optionnelles, en us/index absolus (mode absolute) ou relatifs au début (mode relative)
+    """
+    has_time = channels[0].has_time
+    scale = 1_000_000 if has_time else 1
+
+    if mode == "absolute":
+        lo = min(b[0] for b in bounds) if start is None else start
+        hi = max(b[1] for b in bounds) if end is None else end
+        origins = [lo] * len(channels)
+        span = hi - lo
+    else:
+        lo = 0 if start is None else start
+        hi = max(b[1] - b[0] for b in bounds) if end is None else end
+        origins = [b[0] + lo for b in bounds]
+        span = hi - lo
+
+    width = max(span, 1) / points
+    series = []
+    for ch, origin in zip(channels, origins):
+        acc = GridAccumulator(origin, width, points, agg)
+        # les échantillons juste à l'extérieur servent à interpoler les bords
+        margin = width if agg == "interp" else 0
+        for t, v in iter_arrays(ch, (origin - margin) / scale, (origin + span + margin) / scale):
+            acc.feed(t, v)
+        series.append({
+            "channel_id": ch.id,
+            "name": f"{ch.group_name} / {ch.channel_name} (ds{ch.dataset_id})",
+            "unit": ch.unit,
+            "y": nan_to_none(acc.result()),
+        })
+
+    centers = lo + (np.arange(points) + 0.5) * width
+    return {
+        "x": (centers / scale).tolist(),
+        "x_unit": "s" if has_time else "index",
+        "mode": mode,
+        "agg": agg,
+        "has_time": has_time,
+        "series": series,
+    }
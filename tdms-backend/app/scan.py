@@ -0,0 +1,250 @@
+"""
+Lecture incrémentale des fichiers Parquet d'un canal, row group par row group.
+
+Les bornes (start/end) suivent la convention de /get_window_filtered:
+timestamps Unix en secondes si le canal a une piste de temps, index
+d'échantillon sinon. Les row groups hors plage sont écartés grâce aux
+statistiques min/max du footer, sans être décodés.
+"""
+from __future__ import annotations
+import json
+from .lazy import lazy_import
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+pq = lazy_import("pyarrow.parquet")
+
+# Facteur de conversion secondes -> unité native d'une colonne timestamp
+_UNIT_PER_SECOND = {"s": 1, "ms": 1_000, "us": 1_000_000, "ns": 1_000_000_000}
+
+def raw_bound(time_type: pa.DataType, value: float | None) -> int | None:
+    """Convertit une borne (secondes Unix ou index) en entier dans l'unité de la colonne time."""
+    if value is None:
+        return None
+    if pa.types.is_timestamp(time_type):
+        return int(round(value * _UNIT_PER_SECOND[time_type.unit]))
+    return int(value)
+
+def time_to_int(column, time_type: pa.DataType) -> np.ndarray:
+    """Colonne time -> int64 numpy (microsecondes pour les timestamps, index sinon)."""
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    if pa.types.is_timestamp(time_type):
+        raw = column.cast(pa.int64()).to_numpy(zero_copy_only=False)
+        factor = _UNIT_PER_SECOND[time_type.unit]
+        if factor > 1_000_000:
+            return raw // (factor // 1_000_000)
+        return raw * (1_000_000 // factor)
+    return column.cast(pa.int64()).to_numpy(zero_copy_only=False)
+
+def column_to_numpy(column) -> np.ndarray:
+    """ChunkedArray/Array Arrow -> numpy (copie seulement si nécessaire)."""
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    return column.to_numpy(zero_copy_only=False)
+
+def iter_row_groups(path: str, columns=("time", "value"), start: float | None = None, end: float | None = None):
+    """
+    Itère sur les row groups qui recoupent [start, end] et renvoie pour chacun
+    une table Arrow déjà filtrée. La mémoire reste bornée à un row group.
+    """
+    pf = pq.ParquetFile(path)
+    schema = pf.schema_arrow
+    time_type = schema.field("time").type
+    lo = raw_bound(time_type, start)
+    hi = raw_bound(time_type, end)
+    time_idx = schema.get_field_index("time")
+
+    columns = list(columns)
+    read_cols = columns if "time" in columns or (lo is None and hi is None) else ["time"] + columns
+
+    for i in range(pf.metadata.num_row_groups):
+        # 1) élagage par statistiques (sans décodage)
+        stats = pf.metadata.row_group(i).column(time_idx).statistics
+        if stats is not None and stats.has_min_max:
+            if lo is not None and stats.max_raw < lo:
+                continue
+            if hi is not None and stats.min_raw > hi:
+                # données triées par temps: plus rien à lire ensuite
+                break
+
+        # 2) lecture + filtrage exact
+        table = pf.read_row_group(i, columns=read_cols)
+        if lo is not None or hi is not None:
+            raw = table.column("time").cast(pa.int64()) if pa.types.is_timestamp(time_type) else table.column("time")
+            mask = None
+            if lo is not None:
+                mask = pc.greater_equal(raw, lo)
+            if hi is not None:
+                m = pc.less_equal(raw, hi)
+                mask = m if mask is None else pc.and_(mask, m)
+            table = table.filter(mask)
+        if read_cols != columns:
+            table = table.select(columns)
+        if len(table):
+            yield table
+
+def iter_arrays(path: str, start: float | None = None, end: float | None = None):
+    """Comme iter_row_groups, mais renvoie des tuples numpy (time int64, value)."""
+    schema = pq.read_schema(path)
+    time_type = schema.field("time").type
+    if transition_meta(schema) is not None:
+        # canal stocké en transitions: échantillons reconstitués à la volée
+        bound_type = pa.timestamp("us") if pa.types.is_timestamp(time_type) else time_type
+        yield from iter_transition_arrays(read_transitions(path), raw_bound(bound_type, start), raw_bound(bound_type, end))
+        return
+    for table in iter_row_groups(path, ("time", "value"), start, end):
+        yield time_to_int(table.column("time"), time_type), column_to_numpy(table.column("value"))
+
+def read_before(path: str, start: float, n_rows: int, columns=("time", "value")) -> pa.Table:
+    """
+    Renvoie les n_rows dernières lignes strictement antérieures à start
+    (utile pour amorcer un calcul glissant au bord gauche d'une fenêtre).
+    """
+    pf = pq.ParquetFile(path)
+    schema = pf.schema_arrow
+    time_type = schema.field("time").type
+    lo = raw_bound(time_type, start)
+    time_idx = schema.get_field_index("time")
+
+    if transition_meta(schema) is not None:
+        tr = read_transitions(path)
+        i1, _ = sample_range(tr, lo, None)
+        i0 = max(i1 - n_rows, 0)
+        idx = np.arange(i0, i1, dtype=np.int64)
+        t = sample_times(tr, idx)
+        v = tr["value"][np.searchsorted(tr["idx"], idx, side="right") - 1]
+        time = pa.array(t.astype("datetime64[us]")) if pa.types.is_timestamp(time_type) else pa.array(t)
+        return pa.table({"time": time, "value": pa.array(v, type=schema.field("value").type)}).select(list(columns))
+
+    # row groups qui contiennent des lignes < start, parcourus à rebours
+    candidates = []
+    for i in range(pf.metadata.num_row_groups):
+        stats = pf.metadata.row_group(i).column(time_idx).statistics
+        if stats is not None and stats.has_min_max and stats.min_raw >= lo:
+            break
+        candidates.append(i)
+
+    pieces, remaining = [], n_rows
+    for i in reversed(candidates):
+        if remaining <= 0:
+            break
+        table = pf.read_row_group(i, columns=list(columns))
+        raw = table.column("time").cast(pa.int64()) if pa.types.is_timestamp(time_type) else table.column("time")
+        table = table.filter(pc.less(raw, lo))
+        table = table.slice(max(len(table) - remaining, 0))
+        pieces.append(table)
+        remaining -= len(table)
+
+    if not pieces:
+        return schema.empty_table().select(list(columns))
+    return pa.concat_tables(reversed(pieces))
+
+def time_bounds(path: str) -> tuple[int, int] | None:
+    """(min, max) de la colonne time lus dans le footer, en us (timestamps) ou index."""
+    pf = pq.ParquetFile(path)
+    time_type = pf.schema_arrow.field("time").type
+    idx = pf.schema_arrow.get_field_index("time")
+    lo = hi = None
+    for i in range(pf.metadata.num_row_groups):
+        stats = pf.metadata.row_group(i).column(idx).statistics
+        if stats is None or not stats.has_min_max:
+            # pas de statistiques: lecture de la seule colonne time
+            t = time_to_int(pf.read_row_group(i, columns=["time"]).column("time"), time_type)
+            if not len(t):
+                continue
+            a, b = int(t.min()), int(t.max())
+        else:
+            a, b = (time_to_int(pa.array([stats.min_raw, stats.max_raw]).cast(time_type), time_type)
+                    if pa.types.is_timestamp(time_type) else (stats.min_raw, stats.max_raw))
+        lo = a if lo is None else min(lo, int(a))
+        hi = b if hi is None else max(hi, int(b))
+    return None if lo is None else (int(lo), int(hi))
+
+def read_rows(path: str, row_start: int, row_end: int, columns=("time", "value")) -> pa.Table:
+    """Lignes [row_start, row_end) d'un fichier, en ne décodant que les row groups concernés."""
+    pf = pq.ParquetFile(path)
+    pieces, offset = [], 0
+    for i in range(pf.metadata.num_row_groups):
+        n = pf.metadata.row_group(i).num_rows
+        if offset + n > row_start and offset < row_end:
+            table = pf.read_row_group(i, columns=list(columns))
+            lo = max(row_start - offset, 0)
+            pieces.append(table.slice(lo, min(row_end - offset, n) - lo))
+        offset += n
+        if offset >= row_end:
+            break
+    if not pieces:
+        return pf.schema_arrow.empty_table().select(list(columns))
+    return pa.concat_tables(pieces)
+
+# ---- Canaux stockés en transitions (voir transitions.py) ----
+# Le fichier ne contient que le premier échantillon, chaque changement de valeur
+# et le dernier échantillon, avec leur numéro d'échantillon (colonne row).
+# n_rows et la grille de temps sont dans les métadonnées du schéma: pas entier
+# (increment, en us ou en index) ou grille TDMS (wf_start_time, wf_start_offset,
+# wf_increment), recalculée exactement comme nptdms.TdmsChannel.time_track.
+
+def transition_meta(schema: pa.Schema) -> dict | None:
+    md = schema.metadata or {}
+    if md.get(b"encoding") != b"transitions":
+        return None
+    grid = json.loads(md[b"time_grid"]) if b"time_grid" in md else None
+    return {"n_rows": int(md[b"n_rows"]), "increment": float(md[b"increment"]), "grid": grid}
+
+def is_transitions(path: str) -> bool:
+    return transition_meta(pq.read_schema(path)) is not None
+
+def read_transitions(path: str) -> dict | None:
+    """Transitions d'un canal: numéros d'échantillon (idx) et valeurs; None si stockage classique."""
+    schema = pq.read_schema(path)
+    meta = transition_meta(schema)
+    if meta is None:
+        return None
+    table = pq.read_table(path, columns=["time", "value", "row"])
+    t = time_to_int(table.column("time"), schema.field("time").type)
+    return {
+        **meta,
+        "t0": int(t[0]),
+        "idx": column_to_numpy(table.column("row")).astype(np.int64),
+        "value": column_to_numpy(table.column("value")),
+    }
+
+def sample_times(tr: dict, idx: np.ndarray) -> np.ndarray:
+    """Temps (us ou index) des échantillons idx d'un canal en transitions."""
+    idx = np.asarray(idx, dtype=np.int64)
+    grid = tr["grid"]
+    if grid is None:
+        return tr["t0"] + idx * int(tr["increment"])
+    # même calcul que np.linspace(offset, offset + (n-1)*increment, n) puis troncature en us
+    n, offset = tr["n_rows"], grid["offset"]
+    stop = offset + (n - 1) * grid["increment"]
+    rel = idx * ((stop - offset) / max(n - 1, 1)) + offset
+    rel = np.where(idx == n - 1, stop, rel)
+    return grid["start"] + (rel * 1e6).astype(np.int64)
+
+def _samples_before(tr: dict, t: int, inclusive: bool) -> int:
+    """Nombre d'échantillons de temps < t (<= t si inclusive)."""
+    n, side = tr["n_rows"], "right" if inclusive else "left"
+    guess = int(np.clip(np.floor((t - tr["t0"]) / tr["increment"]), 0, n - 1))
+    # la grille n'est régulière qu'à l'arrondi près: recherche exacte autour de l'estimation
+    a, b = max(guess - 4, 0), min(guess + 6, n)
+    times = sample_times(tr, np.arange(a, b))
+    k = int(np.searchsorted(times, t, side=side))
+    if (k == 0 and a > 0) or (k == len(times) and b < n):
+        # estimation hors de la fenêtre (ne devrait pas arriver): recherche sur toute la grille
+        return int(np.searchsorted(sample_times(tr, np.arange(n)), t, side=side))
+    return a + k
+
+def sample_range(tr: dict, lo: int | None, hi: int | None) -> tuple[int, int]:
+    """Numéros d'échantillon [i0, i1) dont le temps est dans [lo, hi] (us ou index)."""
+    i0 = 0 if lo is None else _samples_before(tr, lo, False)
+    i1 = tr["n_rows"] if hi is None else _samples_before(tr, hi, True)
+    return i0, max(i0, i1)
+
+def iter_transition_arrays(tr: dict, lo: int | None, hi: int | None, chunk_rows: int = 262_144):
+    """Échantillons (time int64, value) reconstitués par morceaux à partir des transitions."""
+    i0, i1 = sample_range(tr, lo, hi)
+    for a in range(i0, i1, chunk_rows):
+        idx = np.arange(a, min(a + chunk_rows, i1), dtype=np.int64)
+        yield sample_times(tr, idx), tr["value"][np.searchsorted(tr["idx"], idx, side="right") - 1]
@@ -0,0 +1,113 @@
+"""
+Segmentation d'essais répétés (impulsions, balayages) et moyenne d'ensemble.
+
+Les déclenchements sont détectés une seule fois sur un canal de référence,
+avec la recherche d'évènements (events.py: fronts ou dépassements de seuil,
+blocs purs traités sans lecture), puis gardés dans un index de segments du
+dataset. Un segment est la fenêtre [déclenchement - pre, déclenchement + post].
+
+Pour un canal quelconque du dataset, tous les segments sont rééchantillonnés
+sur la même grille relative (`points` instants entre -pre et +post) en un
+seul passage: la grille de tous les segments est aplatie et triée une fois,
+puis chaque row group lu interpole d'un coup les instants qu'il couvre. Le
+résultat est un tableau 2-D (segments x points) dont on tire la moyenne,
+l'écart-type, le min et le max d'ensemble, colonne par colonne.
+"""
+from __future__ import annotations
+import warnings
+
+from .events import search_channel
+from .store import iter_channel_arrays
+from .lazy import lazy_import
+np = lazy_import("numpy")
+
+TRIGGERS = ("rising", "falling", "cross", "above", "below")
+
+# Segments lus dans un même parcours s'ils sont séparés de moins de MERGE_GAP largeurs de segment
+# (ou d'un row group: relire le même row group pour chaque segment coûterait plus cher)
+MERGE_GAP = 8
+
+def detect_triggers(ch, condition: str, threshold: float, start: float | None, end: float | None,
+                    holdoff: int, max_segments: int) -> tuple[np.ndarray, bool]:
+    """
+    Instants de déclenchement (us ou index) d'un canal de référence:
+    franchissements (rising/falling/cross) ou débuts d'intervalles (above/below).
+    holdoff: écart minimal entre deux déclenchements gardés (rebonds, bruit).
+    La recherche reprend après le dernier évènement tant que moins de
+    max_segments déclenchements ont passé le holdoff.
+    Renvoie (déclenchements, d'autres déclenchements existent au-delà).
+    """
+    scale = 1_000_000 if ch.has_time else 1
+    key = "start" if condition in ("above", "below") else "time"
+    # reprise juste après le dernier évènement (fin d'intervalle pour above/below)
+    resume = "end" if key == "start" else "time"
+    kept, last, cursor = [], None, start
+    while True:
+        found = search_channel(ch, condition, threshold, cursor, end, max_segments)
+        for e in found["events"]:
+            t = int(round(e[key] * scale))
+            if last is not None and t - last < holdoff:
+                continue
+            if len(kept) == max_segments:
+                return np.array(kept, dtype=np.int64), True
+            kept.append(t)
+            last = t
+        if not found["truncated"] or not found["events"]:
+            return np.array(kept, dtype=np.int64), False
+        following = (int(round(found["events"][-1][resume] * scale)) + 1) / scale
+        if cursor is not None and following <= cursor:
+            return np.array(kept, dtype=np.int64), True  # pas de progression (garde-fou)
+        cursor = following
+
+def relative_grid(pre: int, post: int, points: int) -> np.ndarray:
+    """Instants relatifs au déclenchement (us ou index), de -pre à +post."""
+    return np.linspace(-pre, post, points)
+
+def stack_segments(ch, triggers: np.ndarray, rel: np.ndarray, period: float, group_rows: int) -> np.ndarray:
+    """
+    Segments d'un canal interpolés sur la grille relative: tableau
+    (len(triggers), len(rel)), NaN là où le canal n'a pas de donnée.
+    period: période d'échantillonnage du canal (us ou index), group_rows: lignes par row group.
+    """
+    out = np.full(len(triggers) * len(rel), np.nan)
+    if not len(triggers):
+        return out.reshape(0, len(rel))
+    flat = (triggers[:, None] + rel[None, :]).ravel()
+    order = np.argsort(flat, kind="stable")
+    grid = flat[order]
+    scale = 1_000_000 if ch.has_time else 1
+
+    # segments proches regroupés: un parcours (row groups élagués) par groupe
+    width = max(rel[-1] - rel[0], 1)
+    gap = max(MERGE_GAP * width, group_rows * period)
+    # une période de marge de chaque côté: les bords sont interpolés
+    margin = max(period, width / len(rel))
+    first, last = triggers + rel[0], triggers + rel[-1]
+    cut = np.flatnonzero(first[1:] - np.maximum.accumulate(last)[:-1] > gap) + 1
+    for a, b in zip(np.r_[0, cut].tolist(), np.r_[cut, len(triggers)].tolist()):
+        lo, hi = first[a:b].min() - margin, last[a:b].max() + margin
+        prev = None
+        for t, v in iter_channel_arrays(ch, lo / scale, hi / scale):
+            v = v.astype(np.float64)
+            if prev is not None:
+                # raccord entre deux row groups
+                t, v = np.r_[prev[0], t], np.r_[prev[1], v]
+            i = int(np.searchsorted(grid, t[0], side="left"))
+            j = int(np.searchsorted(grid, t[-1], side="right"))
+            if j > i:
+                out[order[i:j]] = np.interp(grid[i:j], t, v)
+            prev = (t[-1], v[-1])
+    return out.reshape(len(triggers), len(rel))
+
+def ensemble(stack: np.ndarray) -> dict:
+    """Statistiques d'ensemble colonne par colonne (NaN ignorés)."""
+    count = (~np.isnan(stack)).sum(axis=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # colonnes sans aucune donnée
+        return {
+            "mean": np.nanmean(stack, axis=0),
+            "std": np.nanstd(stack, axis=0),
+            "min": np.nanmin(stack, axis=0),
+            "max": np.nanmax(stack, axis=0),
+            "count": count,
+        }
@@ -0,0 +1,164 @@
+"""
+Cache disque partagé entre les workers uvicorn d'un même hôte.
+
+Chaque entrée est un fichier (.npy pour les tableaux, .json pour les réponses)
+publié de façon atomique: écriture dans un fichier temporaire du même dossier
+puis os.replace, de sorte qu'un lecteur ne voit jamais d'entrée partielle.
+Les tableaux sont relus avec np.load(mmap_mode="r"): les pages sont partagées
+par le cache du système de fichiers, donc la mémoire ne croît pas avec le
+nombre de workers et un worker profite du décodage fait par un autre.
+
+L'éviction (LRU approximatif sur la date de dernier accès) est faite de temps
+en temps par le worker qui écrit.
+"""
+from __future__ import annotations
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from .lazy import lazy_import
+np = lazy_import("numpy")
+
+# Une passe d'éviction toutes les N écritures (par processus)
+EVICT_EVERY = 64
+
+class SharedCache:
+    def __init__(self, root: str, max_bytes: int, enabled: bool = True):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, namespace: str, key: str, ext: str) -> Path:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.root / namespace / digest[:2] / f"{digest}{ext}"
+
+    def _publish(self, path: Path, write):
+        """Écrit via `write(fileobj)` dans un temporaire puis publie atomiquement."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self._after_write()
+
+    @staticmethod
+    def _touch(path: Path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    # ---- tableaux numpy ----
+
+    def get_array(self, namespace: str, key: str) -> np.ndarray | None:
+        if not self.enabled:
+            return None
+        path = self._path(namespace, key, ".npy")
+        try:
+            arr = np.load(path, mmap_mode="r", allow_pickle=False)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        self._touch(path)
+        return arr
+
+    def put_array(self, namespace: str, key: str, arr: np.ndarray) -> bool:
+        """Publie un tableau; False si le type n'est pas sérialisable sans pickle."""
+        if not self.enabled or arr.dtype == object:
+            return False
+        self._publish(self._path(namespace, key, ".npy"), lambda f: np.save(f, arr, allow_pickle=False))
+        return True
+
+    # ---- documents JSON ----
+
+    def get_json(self, namespace: str, key: str):
+        if not self.enabled:
+            return None
+        path = self._path(namespace, key, ".json")
+        try:
+            data = json.loads(path.read_bytes())
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        self._touch(path)
+        return data
+
+    def put_json(self, namespace: str, key: str, value):
+        if not self.enabled:
+            return
+        payload = json.dumps(value, default=str).encode("utf-8")
+        self._publish(self._path(namespace, key, ".json"), lambda f: f.write(payload))
+
+    # ---- marqueurs d'usage (fichiers vides, date = dernier accès) ----
+
+    def touch_marker(self, namespace: str, name: str):
+        if not self.enabled:
+            return
+        path = self.root / namespace / name
+        try:
+            path.touch()
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.touch()
+
+    def recent_markers(self, namespace: str, n: int) -> list[str]:
+        """Les n marqueurs les plus récemment touchés (tous workers confondus)."""
+        folder = self.root / namespace
+        if not folder.exists():
+            return []
+        marks = sorted(folder.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [p.name for p in marks[:n]]
+
+    # ---- éviction ----
+
+    def _after_write(self):
+        with self._lock:
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self, target_ratio: float = 0.8):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes."""
+        entries = []
+        total = 0
+        for path in self.root.rglob("*"):
+            if not path.is_file() or path.suffix == ".tmp":
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes * target_ratio:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                # fichier encore ouvert ailleurs (Windows) ou déjà supprimé
+                pass
+
+    def stats(self) -> dict:
+        files = [p for p in self.root.rglob("*") if p.is_file()] if self.root.exists() else []
+        return {
+            "enabled": self.enabled,
+            "root": str(self.root),
+            "entries": len(files),
+            "bytes": sum(p.stat().st_size for p in files),
+            "max_bytes": self.max_bytes,
+        }
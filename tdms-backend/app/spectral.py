@@ -0,0 +1,178 @@
+"""
+Analyse spectrale en flux (Welch PSD / spectrogramme) sur un canal.
+
+Les échantillons arrivent row group par row group; un tampon conserve les
+(nfft - pas) derniers échantillons pour que les segments qui chevauchent deux
+row groups soient calculés exactement comme sur le signal complet. Les FFT
+sont faites par lots de segments (fenêtre de Hann, tendance constante retirée),
+ce qui borne la mémoire quelle que soit la longueur du canal.
+"""
+from __future__ import annotations
+import math
+
+from .scan import raw_bound, read_transitions, sample_range, transition_meta
+from .lazy import lazy_import
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+
+# Nombre maximal de segments transformés en une seule rfft (borne mémoire)
+FRAMES_PER_BATCH = 256
+
+def sample_rate(t: np.ndarray, has_time: bool) -> float:
+    """Fréquence d'échantillonnage (Hz) estimée à partir des temps (us), 1.0 pour un index."""
+    if not has_time or len(t) < 2:
+        return 1.0
+    dt_us = float(np.median(np.diff(t[:10_000])))
+    return 1e6 / dt_us if dt_us > 0 else 1.0
+
+def estimate_rows(path: str, start: float | None, end: float | None) -> int:
+    """Nombre de lignes de [start, end] estimé depuis le footer Parquet (sans décodage)."""
+    pf = pq.ParquetFile(path)
+    time_type = pf.schema_arrow.field("time").type
+    lo, hi = raw_bound(time_type, start), raw_bound(time_type, end)
+    if transition_meta(pf.schema_arrow) is not None:
+        # transitions: nombre exact d'échantillons (pas constant)
+        bound_type = pa.timestamp("us") if pa.types.is_timestamp(time_type) else time_type
+        i0, i1 = sample_range(read_transitions(path), raw_bound(bound_type, start), raw_bound(bound_type, end))
+        return i1 - i0
+    idx = pf.schema_arrow.get_field_index("time")
+    total = 0.0
+    for i in range(pf.metadata.num_row_groups):
+        rg = pf.metadata.row_group(i)
+        stats = rg.column(idx).statistics
+        if stats is None or not stats.has_min_max:
+            total += rg.num_rows
+            continue
+        a, b = stats.min_raw, stats.max_raw
+        if (lo is not None and b < lo) or (hi is not None and a > hi):
+            continue
+        span = max(b - a, 1)
+        covered = min(b, hi if hi is not None else b) - max(a, lo if lo is not None else a)
+        total += rg.num_rows * max(min(covered / span, 1.0), 0.0)
+    return int(total)
+
+class StreamingSpectrum:
+    """Accumule les périodogrammes de segments successifs (Welch / spectrogramme)."""
+
+    def __init__(self, nfft: int, overlap: float, frames_per_bin: int | None = None):
+        self.nfft = nfft
+        self.step = max(1, int(round(nfft * (1.0 - overlap))))
+        # fenêtre de Hann périodique (même convention que scipy.signal.welch)
+        self.window = 0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(nfft) / nfft)
+        self.win_power = float(np.sum(self.window ** 2))
+        self.rest = np.empty(0, np.float64)
+        self.rest_t = np.empty(0, np.int64)
+        self.psd_sum = np.zeros(nfft // 2 + 1)
+        self.n_frames = 0
+        # spectrogramme: moyenne de `frames_per_bin` segments par colonne de temps
+        self.frames_per_bin = frames_per_bin
+        self.bins: list[np.ndarray] = []
+        self.bin_times: list[int] = []
+        self._bin_sum = np.zeros(nfft // 2 + 1)
+        self._bin_count = 0
+        self._bin_t0 = None
+
+    def feed(self, t: np.ndarray, v: np.ndarray):
+        buf = np.concatenate([self.rest, v.astype(np.float64)])
+        buf_t = np.concatenate([self.rest_t, t])
+        if len(buf) < self.nfft:
+            self.rest, self.rest_t = buf, buf_t
+            return
+        n_seg = (len(buf) - self.nfft) // self.step + 1
+        frames = np.lib.stride_tricks.sliding_window_view(buf, self.nfft)[::self.step][:n_seg]
+        starts = buf_t[::self.step][:n_seg]
+        for i in range(0, n_seg, FRAMES_PER_BATCH):
+            batch = frames[i:i + FRAMES_PER_BATCH]
+            batch = (batch - batch.mean(axis=1, keepdims=True)) * self.window
+            power = np.abs(np.fft.rfft(batch, axis=1)) ** 2
+            self.psd_sum += power.sum(axis=0)
+            self.n_frames += len(power)
+            if self.frames_per_bin:
+                self._bin(power, starts[i:i + FRAMES_PER_BATCH])
+        consumed = n_seg * self.step
+        self.rest, self.rest_t = buf[consumed:], buf_t[consumed:]
+
+    def _bin(self, power: np.ndarray, starts: np.ndarray):
+        j = 0
+        while j < len(power):
+            if self._bin_t0 is None:
+                self._bin_t0 = int(starts[j])
+            take = min(self.frames_per_bin - self._bin_count, len(power) - j)
+            self._bin_sum += power[j:j + take].sum(axis=0)
+            self._bin_count += take
+            j += take
+            if self._bin_count == self.frames_per_bin:
+                self.flush_bin()
+
+    def flush_bin(self):
+        if self._bin_count:
+            self.bins.append(self._bin_sum / self._bin_count)
+            self.bin_times.append(self._bin_t0)
+        self._bin_sum = np.zeros(self.nfft // 2 + 1)
+        self._bin_count = 0
+        self._bin_t0 = None
+
+    def density(self, power: np.ndarray, fs: float) -> np.ndarray:
+        """Périodogramme moyen -> densité spectrale unilatérale (unité²/Hz)."""
+        psd = power / (fs * self.win_power)
+        psd[..., 1:] *= 2.0
+        if self.nfft % 2 == 0:
+            psd[..., -1] /= 2.0
+        return psd
+
+def reduce_bins(values: np.ndarray, max_bins: int) -> tuple[np.ndarray, int]:
+    """Moyenne des fréquences voisines pour ne renvoyer que max_bins colonnes."""
+    factor = max(1, math.ceil(values.shape[-1] / max_bins))
+    if factor == 1:
+        return values, 1
+    n = values.shape[-1] // factor * factor
+    reduced = values[..., :n].reshape(*values.shape[:-1], n // factor, factor).mean(axis=-1)
+    return reduced, factor
+
+def significant(values: np.ndarray, digits: int = 7) -> list[float]:
+    """Valeurs arrondies à `digits` chiffres significatifs: précision relative, quelle que soit l'échelle."""
+    return [float(f"{x:.{digits}g}") for x in values.tolist()]
+
+def to_db(values: np.ndarray) -> np.ndarray:
+    return 10.0 * np.log10(np.maximum(values, 1e-30))
+
+def compute_spectrum(chunks, has_time: bool, kind: str, nfft: int, overlap: float,
+                     expected_rows: int, max_frames: int, max_bins: int) -> dict:
+    """Calcule une PSD de Welch ou un spectrogramme à partir d'un flux (time, value)."""
+    frames_per_bin = None
+    if kind == "spectrogram":
+        step = max(1, int(round(nfft * (1.0 - overlap))))
+        total_frames = max(1, (expected_rows - nfft) // step + 1)
+        frames_per_bin = max(1, math.ceil(total_frames / max_frames))
+
+    acc = StreamingSpectrum(nfft, overlap, frames_per_bin)
+    fs = None
+    t_first = None
+    for t, v in chunks:
+        if fs is None:
+            fs = sample_rate(t, has_time)
+            t_first = int(t[0])
+        acc.feed(t, v)
+
+    if not acc.n_frames:
+        raise ValueError(f"Pas assez d'échantillons pour nfft={nfft}")
+
+    df = fs / nfft
+    result = {"kind": kind, "fs": fs, "nfft": nfft, "overlap": overlap, "segments": acc.n_frames,
+              "x_unit": "Hz" if has_time else "cycles/sample"}
+
+    if kind == "welch":
+        psd, factor = reduce_bins(acc.density(acc.psd_sum / acc.n_frames, fs), max_bins)
+        result.update({"f0": (factor - 1) * df / 2, "df": df * factor,
+                       "psd": significant(psd)})
+        return result
+
+    acc.flush_bin()
+    z, factor = reduce_bins(acc.density(np.vstack(acc.bins), fs), max_bins)
+    scale = 1e6 if has_time else 1.0
+    times = (np.asarray(acc.bin_times) - t_first) / scale
+    result.update({"f0": (factor - 1) * df / 2, "df": df * factor,
+                   "t0": t_first / scale, "times": np.round(times, 6).tolist(),
+                   "z_db": np.round(to_db(z), 2).tolist()})
+    return result
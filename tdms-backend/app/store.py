@@ -0,0 +1,102 @@
+"""
+Point d'accès unique aux données d'un canal, qu'il soit stocké en Parquet
+ou dérivé (virtuel). Les routes passent par ici plutôt que par pq.read_table
+pour que tous les types de canaux soient acceptés partout.
+"""
+from __future__ import annotations
+import os
+
+from .cache import LRUCache
+from .config import settings
+from .models import Channel
+from .scan import column_to_numpy, is_transitions, iter_arrays, iter_row_groups, time_to_int
+from .derived import iter_derived_arrays, parse_expression, resolve_refs
+from .shared_cache import SharedCache
+from .lazy import lazy_import
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+
+# Résultats des canaux dérivés, par (canal, expression, fenêtre)
+derived_cache = LRUCache(settings.derived_cache_mb * 1024 * 1024)
+
+# Cache partagé entre workers: canaux décodés, tuiles sous-échantillonnées, métadonnées
+shared_cache = SharedCache(
+    settings.shared_cache_dir,
+    settings.shared_cache_max_mb * 1024 * 1024,
+    settings.shared_cache_enabled,
+)
+
+def channel_version(ch: Channel) -> str:
+    """Identifiant du contenu d'un canal: change si le fichier (ou une source d'un dérivé) change."""
+    if ch.expression:
+        _, refs, _ = parse_expression(ch.expression)
+        bases = resolve_refs(refs)
+        return f"derived:{ch.id}:{ch.expression}:" + "|".join(channel_version(b) for b in bases.values())
+    st = os.stat(ch.parquet_path)
+    return f"{ch.parquet_path}:{st.st_mtime_ns}:{st.st_size}"
+
+def value_type(ch: Channel) -> pa.DataType:
+    """Type Arrow de la colonne value d'un canal."""
+    if ch.expression:
+        return pa.float64()
+    return pq.read_schema(ch.parquet_path).field("value").type
+
+def time_source_path(ch: Channel) -> str:
+    """Fichier Parquet qui porte l'axe de temps du canal (canal de référence si dérivé)."""
+    if ch.expression:
+        _, refs, _ = parse_expression(ch.expression)
+        return resolve_refs(refs[:1])[refs[0]].parquet_path
+    return ch.parquet_path
+
+def iter_channel_arrays(ch: Channel, start: float | None = None, end: float | None = None):
+    """Itère (time int64, value) sur [start, end], row group par row group."""
+    if ch.expression:
+        return iter_derived_arrays(ch, start, end)
+    return iter_arrays(ch.parquet_path, start, end)
+
+def arrays_to_table(parts, has_time: bool, vtype: pa.DataType) -> pa.Table:
+    """Assemble des morceaux (time int64, value) en table Arrow (time, value)."""
+    if parts:
+        t = np.concatenate([p[0] for p in parts])
+        v = np.concatenate([p[1] for p in parts])
+    else:
+        t, v = np.empty(0, np.int64), np.empty(0, vtype.to_pandas_dtype())
+    time = pa.array(t.astype("datetime64[us]")) if has_time else pa.array(t, type=pa.int64())
+    return pa.table({"time": time, "value": pa.array(v, type=vtype)})
+
+def read_channel_table(ch: Channel, start: float | None = None, end: float | None = None) -> pa.Table:
+    """Table (time, value) d'un canal sur [start, end] (canal entier si aucune borne)."""
+    if ch.expression:
+        key = (ch.id, ch.expression, start, end)
+        table = derived_cache.get(key)
+        if table is None:
+            table = arrays_to_table(list(iter_derived_arrays(ch, start, end)), ch.has_time, pa.float64())
+            derived_cache.put(key, table)
+        return table
+
+    if is_transitions(ch.parquet_path):
+        # canal stocké en transitions: échantillons reconstitués sur la fenêtre
+        return arrays_to_table(list(iter_arrays(ch.parquet_path, start, end)), ch.has_time, value_type(ch))
+    if start is None and end is None:
+        return _full_table(ch)
+    tables = list(iter_row_groups(ch.parquet_path, ("time", "value"), start, end))
+    if not tables:
+        return pq.read_schema(ch.parquet_path).empty_table().select(["time", "value"])
+    return pa.concat_tables(tables)
+
+def _full_table(ch: Channel) -> pa.Table:
+    """Canal complet décodé, servi depuis le cache partagé (mmap) quand un worker l'a déjà décodé."""
+    key = channel_version(ch)
+    t = shared_cache.get_array("channels", key + ":time")
+    v = shared_cache.get_array("channels", key + ":value") if t is not None else None
+    if t is not None and v is not None:
+        time = pa.array(t.view("datetime64[us]")) if ch.has_time else pa.array(t)
+        return pa.table({"time": time, "value": pa.array(v)})
+
+    table = pq.read_table(ch.parquet_path, columns=["time", "value"])
+    # la valeur est publiée avant le temps: un lecteur qui voit le temps trouve la valeur
+    if shared_cache.put_array("channels", key + ":value", column_to_numpy(table.column("value"))):
+        t = time_to_int(table.column("time"), table.schema.field("time").type)
+        shared_cache.put_array("channels", key + ":time", t)
+    return table
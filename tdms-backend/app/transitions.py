@@ -0,0 +1,164 @@
+"""
+Stockage en transitions des canaux numériques / à paliers (entrées TOR,
+signaux carrés, consignes...).
+
+À l'ingestion, un canal échantillonné à pas constant dont la valeur change
+rarement et ne prend que quelques niveaux (ou booléen) est écrit sous forme
+de liste de transitions: premier échantillon, chaque échantillon où la
+valeur change, dernier échantillon. Le stockage et la lecture suivent alors
+le nombre de changements d'état et non le nombre d'échantillons.
+
+Les lectures « échantillon par échantillon » (scan.iter_arrays) restent
+possibles: les échantillons sont reconstitués à la volée. Les fenêtres
+d'affichage et les statistiques sont calculées directement sur les paliers.
+"""
+from __future__ import annotations
+
+import json
+
+from .aggregates import RangeAccumulator
+from .scan import column_to_numpy, sample_range, sample_times, time_to_int
+from .lazy import lazy_import
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+
+def encode_transitions(table: pa.Table, max_ratio: float, max_levels: int, grid: dict | None = None) -> pa.Table | None:
+    """
+    Table (time, value, row) réduite aux transitions, ou None si le canal ne s'y prête pas:
+    temps non reconstructible (grille TDMS `grid` ou pas entier constant),
+    valeurs non numériques, trop de changements (> max_ratio des échantillons)
+    ou trop de niveaux distincts (sauf booléens).
+    """
+    encoder = TransitionEncoder(len(table), table.schema, max_ratio, max_levels, grid)
+    encoder.add(table)
+    return encoder.result()
+
+class TransitionEncoder:
+    """
+    Même encodage qu'encode_transitions, calculé morceau par morceau pendant
+    l'écriture d'un canal de n_rows lignes: seules les transitions sont gardées
+    et le suivi s'arrête dès que le canal sort des critères d'éligibilité.
+    """
+
+    def __init__(self, n_rows: int, schema: pa.Schema, max_ratio: float, max_levels: int, grid: dict | None = None):
+        vtype = schema.field("value").type
+        self.n = n_rows
+        self.schema = schema
+        self.max_changes = n_rows * max_ratio - 2
+        self.max_levels = None if pa.types.is_boolean(vtype) else max_levels
+        self.grid = grid
+        self.eligible = n_rows >= 2 and (pa.types.is_boolean(vtype) or pa.types.is_integer(vtype)
+                                         or pa.types.is_floating(vtype))
+        self.offset = 0
+        self.changes = 0
+        self.t0 = self.step = None
+        self.last = None
+        self.pieces = []
+        self.levels = np.empty(0)
+
+    def _times_ok(self, t: np.ndarray, idx: np.ndarray) -> bool:
+        # la grille de temps doit redonner exactement la colonne time
+        if self.grid is not None:
+            return np.array_equal(sample_times({"grid": self.grid, "n_rows": self.n}, idx), t)
+        if self.t0 is None:
+            self.t0 = int(t[0])
+        if self.step is None and idx[-1] >= 1:
+            self.step = int(t[1 - idx[0]]) - self.t0
+        return self.step is None or (self.step > 0 and np.array_equal(self.t0 + idx * self.step, t))
+
+    def add(self, table: pa.Table):
+        if not self.eligible or not len(table):
+            self.offset += len(table)
+            return
+        v = column_to_numpy(table.column("value"))
+        t = time_to_int(table.column("time"), self.schema.field("time").type)
+        idx = np.arange(self.offset, self.offset + len(v), dtype=np.int64)
+        changed = np.r_[v[:1] if self.last is None else self.last, v[:-1]] != v
+        if self.offset == 0:
+            changed[0] = False
+        rows = np.flatnonzero(changed)
+        self.changes += len(rows)
+        if self.offset == 0:
+            rows = np.r_[0, rows]
+        if idx[-1] == self.n - 1 and (not len(rows) or rows[-1] != len(v) - 1):
+            rows = np.r_[rows, len(v) - 1]
+        self.offset += len(v)
+        self.last = v[-1:]
+
+        if self.changes > self.max_changes or not self._times_ok(t, idx):
+            self.eligible, self.pieces = False, []
+            return
+        if self.max_levels is not None:
+            self.levels = np.unique(np.r_[self.levels, v[rows]])
+            if len(self.levels) > self.max_levels:
+                self.eligible, self.pieces = False, []
+                return
+        if len(rows):
+            piece = table.take(pa.array(rows))
+            self.pieces.append(piece.append_column("row", pa.array(idx[rows], type=pa.int64())))
+
+    def result(self) -> pa.Table | None:
+        if not self.eligible or self.offset != self.n:
+            return None
+        encoded = pa.concat_tables(self.pieces)
+        t = time_to_int(encoded.column("time"), self.schema.field("time").type)
+        inc = (t[-1] - t[0]) / (self.n - 1)
+        if self.grid is not None and inc <= 0:
+            return None
+        metadata = {
+            **(self.schema.metadata or {}),
+            b"encoding": b"transitions",
+            b"n_rows": str(self.n).encode(),
+            b"increment": repr(inc).encode(),
+        }
+        if self.grid is not None:
+            metadata[b"time_grid"] = json.dumps(self.grid).encode()
+        return encoded.replace_schema_metadata(metadata)
+
+def transition_runs(tr: dict, lo: int | None, hi: int | None):
+    """
+    Paliers qui recoupent [lo, hi] (us ou index), bornés à la fenêtre:
+    (temps du premier échantillon, temps du dernier, valeur, nombre d'échantillons).
+    """
+    i0, i1 = sample_range(tr, lo, hi)
+    if i0 >= i1:
+        empty = np.empty(0, np.int64)
+        return empty, empty, tr["value"][:0], empty
+    idx = tr["idx"]
+    k0 = int(np.searchsorted(idx, i0, side="right")) - 1
+    k1 = int(np.searchsorted(idx, i1 - 1, side="right"))
+    # le palier k couvre [idx[k], idx[k+1]); le dernier palier de la fenêtre s'arrête à i1
+    starts = np.maximum(idx[k0:k1], i0)
+    ends = np.r_[idx[k0 + 1:k1], i1]
+    values = tr["value"][k0:k1]
+    if len(values) > 1:
+        # fusion des paliers consécutifs de même valeur (dernier échantillon répété)
+        same = values[1:] == values[:-1]
+        starts, values = starts[np.r_[True, ~same]], values[np.r_[True, ~same]]
+        ends = ends[np.r_[~same, True]]
+    return sample_times(tr, starts), sample_times(tr, ends - 1), values, ends - starts
+
+def step_series(tr: dict, lo: int | None, hi: int | None):
+    """
+    Série exacte d'un canal à paliers: premier et dernier échantillon de chaque
+    palier. Chaque front est tracé entre les deux échantillons qui l'encadrent.
+    """
+    t_first, t_last, values, _ = transition_runs(tr, lo, hi)
+    x = np.empty(2 * len(values), np.int64)
+    y = np.empty(2 * len(values), values.dtype)
+    x[0::2], x[1::2] = t_first, t_last
+    y[0::2], y[1::2] = values, values
+    # palier d'un seul échantillon: un seul point
+    keep = np.r_[True, x[1:] != x[:-1]] if len(x) else np.empty(0, bool)
+    return x[keep], y[keep]
+
+def transition_stats(tr: dict, lo: int | None, hi: int | None) -> RangeAccumulator:
+    """Statistiques de plage pondérées par la durée des paliers (sans reconstituer les échantillons)."""
+    _, _, values, counts = transition_runs(tr, lo, hi)
+    v = values.astype(np.float64)
+    ok = ~np.isnan(v)
+    v, c = v[ok], counts[ok]
+    acc = RangeAccumulator()
+    if len(v):
+        acc.add(int(c.sum()), float((v * c).sum()), float((v * v * c).sum()), float(v.min()), float(v.max()))
+    return acc
@@ -0,0 +1,319 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse, json, os, random, shutil, socket, subprocess, sys, tempfile, threading, time, uuid
+import urllib.error
+import urllib.request
+
+APP_DIR = Path(__file__).resolve().parent
+
+# Mélange de trafic par défaut: poids relatifs des scénarios d'un analyste
+DEFAULT_MIX = "browse=2,time_range=2,zoom=6,multi=2,ingest=0.2"
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def tree_rss(pid: int) -> int | None:
+    """RSS (octets) d'un processus et de ses descendants (workers uvicorn), Linux uniquement."""
+    total, stack, seen = 0, [pid], set()
+    while stack:
+        p = stack.pop()
+        if p in seen:
+            continue
+        seen.add(p)
+        try:
+            with open(f"/proc/{p}/statm", "rb") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            for task in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{task}/children") as f:
+                    stack.extend(int(c) for c in f.read().split())
+        except (OSError, ValueError):
+            if p == pid:
+                return None
+    return total
+
+def multipart(field: str, filename: str, data: bytes) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+class Client:
+    """Requêtes HTTP chronométrées, résultats agrégés par endpoint (thread-safe)."""
+
+    def __init__(self, base: str, timeout: float):
+        self.base = base
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.samples: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.rejected: dict[str, int] = {}
+
+    def _record(self, endpoint: str, dt: float, status: int | None):
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append(dt)
+            if status == 503:
+                self.rejected[endpoint] = self.rejected.get(endpoint, 0) + 1
+            elif status is None or status >= 400:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def request(self, endpoint: str, path: str, data: bytes | None = None, content_type: str | None = None):
+        req = urllib.request.Request(self.base + path, data=data, method="POST" if data is not None else "GET")
+        if content_type:
+            req.add_header("Content-Type", content_type)
+        t0 = time.perf_counter()
+        status, payload = None, None
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as r:
+                payload = r.read()
+                status = r.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            pass
+        self._record(endpoint, time.perf_counter() - t0, status)
+        if status == 200 and payload:
+            return json.loads(payload)
+        return None
+
+    def get(self, endpoint: str, path: str):
+        return self.request(endpoint, path)
+
+# ---- Scénarios (une « action » d'un utilisateur virtuel) ----
+
+def scenario_browse(c: Client, ctx: dict, rng: random.Random):
+    datasets = c.get("datasets", "/datasets") or []
+    if datasets:
+        c.get("channels", f"/datasets/{rng.choice(datasets)['id']}/channels")
+
+def scenario_time_range(c: Client, ctx: dict, rng: random.Random):
+    ch = rng.choice(ctx["channels"])
+    c.get("time_range", f"/channels/{ch['id']}/time_range")
+
+def scenario_zoom(c: Client, ctx: dict, rng: random.Random):
+    """Vue globale, zooms successifs (x2 à x8) puis quelques déplacements latéraux."""
+    ch = rng.choice(ctx["channels"])
+    lo, hi = ctx["ranges"][ch["id"]]
+    c.get("get_window_filtered", f"/get_window_filtered?channel_id={ch['id']}&points=2000")
+    start, end = lo, hi
+    for _ in range(rng.randint(2, 5)):
+        width = (end - start) / rng.choice((2, 4, 8))
+        start = rng.uniform(start, end - width)
+        end = start + width
+        c.get("get_window_filtered",
+              f"/get_window_filtered?channel_id={ch['id']}&start_timestamp={start}&end_timestamp={end}&points=2000")
+    for _ in range(rng.randint(0, 3)):
+        shift = (end - start) * rng.choice((-0.5, 0.5))
+        start, end = max(lo, start + shift), min(hi, end + shift)
+        c.get("get_window_filtered",
+              f"/get_window_filtered?channel_id={ch['id']}&start_timestamp={start}&end_timestamp={end}&points=2000")
+
+def scenario_multi(c: Client, ctx: dict, rng: random.Random):
+    ids = [ch["id"] for ch in rng.sample(ctx["channels"], min(len(ctx["channels"]), rng.randint(2, 4)))]
+    c.get("multi_window", f"/multi_window?channel_ids={','.join(map(str, ids))}&points=1000")
+
+def scenario_ingest(c: Client, ctx: dict, rng: random.Random):
+    path = rng.choice(ctx["seed_files"])
+    body, ctype = multipart("file", path.name, path.read_bytes())
+    c.request("ingest", "/ingest", body, ctype)
+
+SCENARIOS = {
+    "browse": scenario_browse,
+    "time_range": scenario_time_range,
+    "zoom": scenario_zoom,
+    "multi": scenario_multi,
+    "ingest": scenario_ingest,
+}
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Scénario inconnu: {name!r} (attendu: {', '.join(SCENARIOS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+# ---- Serveur ----
+
+def start_server(workdir: Path, workers: int, env_overrides: dict, timeout: float = 60.0):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {**os.environ, **env_overrides, "PYTHONPATH": str(APP_DIR)}
+    # traces du serveur (ingestion...) dans un fichier, pour garder le rapport lisible
+    log = open(workdir / "server.log", "ab")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    log.close()
+    t0 = time.perf_counter()
+    while True:
+        try:
+            urllib.request.urlopen(f"{base}/api/constraints", timeout=2).read()
+            return proc, base
+        except OSError:
+            if proc.poll() is not None or time.perf_counter() - t0 > timeout:
+                proc.kill()
+                raise RuntimeError("uvicorn n'a pas démarré")
+            time.sleep(0.05)
+
+def seed(c: Client, seed_files: list[Path]):
+    """Ingère les fichiers de départ si la base est vide."""
+    if c.get("datasets", "/datasets"):
+        return
+    for path in seed_files:
+        body, ctype = multipart("file", path.name, path.read_bytes())
+        if c.request("ingest", "/ingest", body, ctype) is None:
+            raise RuntimeError(f"Échec de l'ingestion de {path}")
+        print(f"  ingéré: {path.name}")
+
+def load_context(c: Client, seed_files: list[Path]) -> dict:
+    channels = []
+    for ds in c.get("datasets", "/datasets") or []:
+        channels += [ch for ch in c.get("channels", f"/datasets/{ds['id']}/channels") or [] if not ch.get("expression")]
+    if not channels:
+        raise RuntimeError("Aucun canal disponible pour le test")
+    ranges = {}
+    for ch in channels:
+        tr = c.get("time_range", f"/channels/{ch['id']}/time_range") or {}
+        lo = tr.get("min_timestamp", tr.get("min_index"))
+        hi = tr.get("max_timestamp", tr.get("max_index"))
+        if lo is not None and hi is not None and hi > lo:
+            ranges[ch["id"]] = (lo, hi)
+    return {"channels": [ch for ch in channels if ch["id"] in ranges], "ranges": ranges, "seed_files": seed_files}
+
+# ---- Mesure ----
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    k = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+def run_level(base: str, ctx: dict, mix: dict, users: int, duration: float, pid: int, timeout: float, seed_value: int) -> dict:
+    """users utilisateurs virtuels enchaînent des scénarios tirés selon mix pendant duration secondes."""
+    c = Client(base, timeout)
+    names, weights = list(mix), list(mix.values())
+    stop = time.perf_counter() + duration
+    rss = []
+
+    def user(i: int):
+        rng = random.Random(seed_value * 10_007 + i)
+        time.sleep(rng.uniform(0, 0.2))  # départs étalés
+        while time.perf_counter() < stop:
+            SCENARIOS[rng.choices(names, weights)[0]](c, ctx, rng)
+
+    def sample_rss():
+        while time.perf_counter() < stop:
+            value = tree_rss(pid)
+            if value is not None:
+                rss.append(value)
+            time.sleep(0.1)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(user, range(users)))
+    elapsed = time.perf_counter() - t0
+    sampler.join()
+
+    endpoints = {}
+    for name, values in sorted(c.samples.items()):
+        values = sorted(values)
+        endpoints[name] = {
+            "requests": len(values),
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1e3,
+            "p95_ms": percentile(values, 95) * 1e3,
+            "p99_ms": percentile(values, 99) * 1e3,
+            "error_rate": c.errors.get(name, 0) / len(values),
+            "rejected_rate": c.rejected.get(name, 0) / len(values),
+        }
+    # pic mémoire par route vu par le contrôle d'admission du worker interrogé
+    admission = urllib.request.urlopen(f"{base}/admission/stats", timeout=timeout)
+    for rec in json.loads(admission.read()).get("recent", []):
+        ep = endpoints.get(rec["route"])
+        if ep is not None and rec.get("peak_delta_bytes") is not None:
+            ep["rss_peak_delta_mb"] = max(ep.get("rss_peak_delta_mb", 0.0), rec["peak_delta_bytes"] / 1e6)
+    total = sum(len(v) for v in c.samples.values())
+    return {
+        "users": users,
+        "elapsed_s": elapsed,
+        "requests": total,
+        "rps": total / elapsed,
+        "error_rate": sum(c.errors.values()) / total if total else 0.0,
+        "rss_max_mb": max(rss) / 1e6 if rss else None,
+        "rss_mean_mb": sum(rss) / len(rss) / 1e6 if rss else None,
+        "endpoints": endpoints,
+    }
+
+def print_level(level: dict):
+    rss = f"RSS max={level['rss_max_mb']:.0f} Mo moy={level['rss_mean_mb']:.0f} Mo" if level["rss_max_mb"] else "RSS indisponible"
+    print(f"\n== {level['users']} utilisateur(s): {level['requests']} requêtes, {level['rps']:.1f} req/s, "
+          f"erreurs {level['error_rate']:.1%}, {rss}")
+    print(f"  {'endpoint':<22}{'n':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err':>7}{'503':>7}{'ΔRSS Mo':>9}")
+    for name, ep in level["endpoints"].items():
+        delta = ep.get("rss_peak_delta_mb")
+        print(f"  {name:<22}{ep['requests']:>7}{ep['rps']:>8.1f}{ep['p50_ms']:>9.1f}{ep['p95_ms']:>9.1f}{ep['p99_ms']:>9.1f}"
+              f"{ep['error_rate']:>7.1%}{ep['rejected_rate']:>7.1%}{'' if delta is None else f'{delta:.1f}':>9}")
+
+def main():
+    p = argparse.ArgumentParser(description="Test de charge de l'API: trafic d'analystes simultanés sur une instance locale")
+    p.add_argument("seed", nargs="+", help="Fichiers TDMS ingérés au départ (et réutilisés par le scénario ingest)")
+    p.add_argument("--users", default="1,10,50", help="Niveaux de concurrence (utilisateurs virtuels), ex. 1,10,50")
+    p.add_argument("--duration", type=float, default=20.0, help="Durée de chaque niveau (s)")
+    p.add_argument("--mix", default=DEFAULT_MIX, help=f"Poids des scénarios (défaut: {DEFAULT_MIX})")
+    p.add_argument("--workers", type=int, default=1, help="Workers uvicorn")
+    p.add_argument("--workdir", help="Dossier de travail (data/, db.sqlite); temporaire et effacé sinon")
+    p.add_argument("--timeout", type=float, default=60.0, help="Délai max d'une requête (s)")
+    p.add_argument("--seed-random", type=int, default=0, help="Graine des tirages (rejouable)")
+    p.add_argument("--json", help="Écrit les résultats détaillés dans ce fichier")
+    args = p.parse_args()
+
+    seed_files = [Path(f).resolve() for f in args.seed]
+    for f in seed_files:
+        if not f.is_file():
+            raise SystemExit(f"Fichier introuvable: {f}")
+    mix = parse_mix(args.mix)
+    levels = [int(x) for x in args.users.split(",") if x.strip()]
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="tdms_load_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    # cache partagé propre au test, pour ne pas mesurer un cache chaud d'une autre instance
+    proc, base = start_server(workdir, args.workers, {"SHARED_CACHE_DIR": str(workdir / "cache")})
+    try:
+        c = Client(base, args.timeout)
+        print(f"Serveur: {base} ({args.workers} worker(s)), dossier {workdir}")
+        seed(c, seed_files)
+        ctx = load_context(c, seed_files)
+        print(f"{len(ctx['channels'])} canaux, mélange: {mix}")
+
+        results = []
+        for users in levels:
+            level = run_level(base, ctx, mix, users, args.duration, proc.pid, args.timeout, args.seed_random)
+            print_level(level)
+            results.append(level)
+
+        # saturation: premier niveau où le débit n'augmente plus (ou les erreurs apparaissent)
+        for prev, cur in zip(results, results[1:]):
+            if cur["rps"] < prev["rps"] * 1.1 or cur["error_rate"] > 0.01:
+                print(f"\nSaturation entre {prev['users']} et {cur['users']} utilisateurs "
+                      f"({prev['rps']:.1f} -> {cur['rps']:.1f} req/s, erreurs {cur['error_rate']:.1%})")
+                break
+        if args.json:
+            Path(args.json).write_text(json.dumps({"mix": mix, "workers": args.workers, "levels": results}, indent=2))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from __future__ import annotations
+from nptdms import TdmsFile
+import pyarrow.parquet as pq
+from pathlib import Path
+import argparse, tempfile, time
+
+from app.io_tdms import PARQUET_PROFILES, channel_table, write_channel_parquet
+
+def bench_channel(table, profile: str, tmp: Path, repeat: int = 3):
+    """Écrit une table avec un profil et mesure taille / temps d'écriture / temps de décodage."""
+    path = tmp / f"{profile}.parquet"
+    t0 = time.perf_counter()
+    write_channel_parquet(table, str(path), profile)
+    write_s = time.perf_counter() - t0
+
+    # meilleur temps de lecture sur `repeat` essais (cache disque chaud)
+    read_s = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        pq.read_table(str(path))
+        read_s = min(read_s, time.perf_counter() - t0)
+
+    return path.stat().st_size, write_s, read_s
+
+def report(path: str, repeat: int = 3):
+    tdms = TdmsFile.read(path)
+    totals = {p: [0, 0.0, 0.0] for p in PARQUET_PROFILES}
+    raw_bytes = 0
+
+    print(f"=== FICHIER: {path}")
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        for group in tdms.groups():
+            for ch in group.channels():
+                table, has_time = channel_table(ch)
+                raw_bytes += table.nbytes
+                print(f"- {group.name} / {ch.name}  rows={len(table)}  schema="
+                      f"{', '.join(f'{f.name}:{f.type}' for f in table.schema)}")
+                for profile in PARQUET_PROFILES:
+                    size, w, r = bench_channel(table, profile, tmp, repeat)
+                    tot = totals[profile]
+                    tot[0] += size; tot[1] += w; tot[2] += r
+                    print(f"    {profile:<10} size={size/1e6:9.2f} MB  write={w*1e3:8.1f} ms  read={r*1e3:8.1f} ms")
+
+    print("\n= TOTAL =")
+    print(f"{'profil':<10} {'taille (MB)':>12} {'ratio':>7} {'écriture (s)':>13} {'lecture (s)':>12} {'décodage (MB/s)':>16}")
+    for profile, (size, w, r) in totals.items():
+        ratio = raw_bytes / size if size else 0.0
+        speed = raw_bytes / 1e6 / r if r else 0.0
+        print(f"{profile:<10} {size/1e6:12.2f} {ratio:7.2f} {w:13.2f} {r:12.3f} {speed:16.1f}")
+
+def main():
+    p = argparse.ArgumentParser(description="Compare les profils d'écriture Parquet (taille / vitesse) sur un .tdms")
+    p.add_argument("file", help="Chemin du .tdms (ex: big_sample.tdms)")
+    p.add_argument("--repeat", type=int, default=3, help="Nombre de lectures par profil (meilleur temps retenu)")
+    args = p.parse_args()
+    report(args.file, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+import argparse, json, os, socket, statistics, subprocess, sys, time
+import urllib.request
+
+HEAVY = ("pandas", "pyarrow", "pyarrow.parquet", "pyarrow.compute", "nptdms", "lttb", "numpy")
+
+IMPORT_SNIPPET = f"""
+import sys, time, json
+t = time.perf_counter()
+import app.main
+dt = time.perf_counter() - t
+print(json.dumps({{"import_s": dt, "loaded": [m for m in {HEAVY!r} if m in sys.modules]}}))
+"""
+
+def measure_import(repeat: int) -> dict:
+    """Temps d'import de app.main dans un interpréteur neuf (médiane sur `repeat` essais)."""
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "median_s": statistics.median(r["import_s"] for r in runs),
+        "min_s": min(r["import_s"] for r in runs),
+        "heavy_loaded": runs[-1]["loaded"],
+    }
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def timed_get(url: str) -> float:
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(url) as r:
+        r.read()
+    return time.perf_counter() - t0
+
+def measure_first_requests(channel_id: int | None, warmup: int, timeout: float = 60.0) -> dict:
+    """Lance uvicorn, mesure le délai avant la première réponse puis la latence des premières requêtes."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "WARMUP_CHANNELS": str(warmup)}
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        # 1) disponibilité: première réponse de /api/constraints
+        while True:
+            try:
+                timed_get(f"{base}/api/constraints")
+                break
+            except OSError:
+                if time.perf_counter() - t0 > timeout:
+                    raise TimeoutError("uvicorn n'a pas répondu à temps")
+                time.sleep(0.02)
+        result = {"ready_s": time.perf_counter() - t0}
+
+        # 2) premières requêtes de données (cold puis warm)
+        if channel_id is not None:
+            if warmup:
+                time.sleep(1.0)  # laisse le préchargement en tâche de fond avancer
+            url = f"{base}/get_window_filtered?channel_id={channel_id}&points=2000"
+            result["first_window_s"] = timed_get(url)
+            result["second_window_s"] = timed_get(url + "&method=uniform")
+            result["time_range_s"] = timed_get(f"{base}/channels/{channel_id}/time_range")
+        return result
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+def main():
+    p = argparse.ArgumentParser(description="Mesure du démarrage à froid de l'API (import, disponibilité, premières requêtes)")
+    p.add_argument("--repeat", type=int, default=5, help="Nombre d'imports mesurés")
+    p.add_argument("--channel-id", type=int, help="Canal utilisé pour mesurer la première requête de données")
+    p.add_argument("--warmup", type=int, default=0, help="Valeur de WARMUP_CHANNELS pour le serveur lancé")
+    args = p.parse_args()
+
+    imp = measure_import(args.repeat)
+    print(f"import app.main : médiane={imp['median_s']*1e3:.0f} ms  min={imp['min_s']*1e3:.0f} ms")
+    print(f"  modules lourds chargés à l'import: {', '.join(imp['heavy_loaded']) or 'aucun'}")
+
+    req = measure_first_requests(args.channel_id, args.warmup)
+    print(f"uvicorn prêt en  : {req['ready_s']*1e3:.0f} ms (WARMUP_CHANNELS={args.warmup})")
+    for key, label in (("first_window_s", "1re /get_window_filtered"),
+                       ("second_window_s", "2e /get_window_filtered"),
+                       ("time_range_s", "/time_range")):
+        if key in req:
+            print(f"{label:<26}: {req[key]*1e3:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+from __future__ import annotations
+from nptdms import TdmsWriter, RootObject, GroupObject, ChannelObject
+import argparse, os, time
+import numpy as np
+
+# Générateur de gros fichiers TDMS de test (10–100 Go) en mémoire constante:
+# les signaux sont produits et écrits segment par segment, comme une acquisition.
+
+DTYPES = {"float32": np.float32, "float64": np.float64, "int16": np.int16, "int32": np.int32}
+WAVEFORMS = ("sine", "noisy_sine", "chirp", "random_walk", "sawtooth")
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Génère un TDMS multi-segments de taille arbitraire (écriture en flux)")
+    p.add_argument("--out", default="scale_test.tdms", help="Fichier de sortie")
+    p.add_argument("--channels", type=int, default=8, help="Canaux analogiques par groupe")
+    p.add_argument("--groups", type=int, default=1, help="Nombre de groupes")
+    p.add_argument("--digital", type=int, default=0, help="Canaux numériques (TOR, uint8 0/1) par groupe")
+    p.add_argument("--rate", type=float, default=10_000.0, help="Fréquence d'échantillonnage (Hz)")
+    p.add_argument("--duration", type=float, default=60.0, help="Durée acquise (s)")
+    p.add_argument("--size-gb", type=float, help="Taille visée (Go); remplace --duration")
+    p.add_argument("--dtype", choices=DTYPES, default="float32", help="Type des canaux analogiques")
+    p.add_argument("--time-track", choices=("waveform", "explicit", "none"), default="waveform",
+                   help="waveform: propriétés wf_*; explicit: canal Time (horodatage) par groupe; none: index seul")
+    p.add_argument("--segment-samples", type=int, default=100_000, help="Échantillons par canal et par segment")
+    p.add_argument("--interleaved", action="store_true",
+                   help="Segments alternés par groupe (un groupe par segment) au lieu d'un segment pour tous les groupes")
+    p.add_argument("--index", action="store_true", help="Écrit aussi le .tdms_index")
+    p.add_argument("--start", default="2024-01-01T00:00:00", help="Début de l'acquisition (ISO)")
+    p.add_argument("--seed", type=int, default=0, help="Graine (fichiers reproductibles)")
+    return p.parse_args()
+
+def row_bytes(args) -> int:
+    """Octets écrits par instant d'échantillonnage (tous groupes et canaux)."""
+    per_group = args.channels * np.dtype(DTYPES[args.dtype]).itemsize + args.digital
+    if args.time_track == "explicit":
+        per_group += 16  # horodatage TDMS
+    return per_group * args.groups
+
+class Signal:
+    """Un canal: forme d'onde déterministe en fonction de l'indice d'échantillon (continuité entre segments)."""
+
+    def __init__(self, kind: str, k: int, rate: float, dtype, rng: np.random.Generator):
+        self.kind, self.rate, self.dtype, self.rng = kind, rate, dtype, rng
+        self.freq = rate / 200.0 * (1 + k % 7) / 7          # sous Nyquist, différente par canal
+        self.amp = 1.0 + 0.25 * (k % 4)
+        self.state = 0.0                                     # marche aléatoire
+        self.scale = 1000.0 if np.issubdtype(dtype, np.integer) else 1.0
+        # plage représentable (avant mise à l'échelle) pour les types entiers
+        self.bound = np.iinfo(dtype).max / self.scale if np.issubdtype(dtype, np.integer) else None
+
+    def chunk(self, i0: int, n: int) -> np.ndarray:
+        t = np.arange(i0, i0 + n, dtype=np.float64) / self.rate
+        if self.kind == "sine":
+            y = self.amp * np.sin(2 * np.pi * self.freq * t)
+        elif self.kind == "noisy_sine":
+            y = self.amp * np.sin(2 * np.pi * self.freq * t) + 0.2 * self.rng.standard_normal(n)
+        elif self.kind == "chirp":
+            period = 10.0  # balayage de fréquence répété toutes les 10 s
+            tau = np.mod(t, period)
+            y = self.amp * np.sin(2 * np.pi * self.freq * (0.1 + tau / period) * tau)
+        elif self.kind == "random_walk":
+            y = self.state + np.cumsum(self.rng.standard_normal(n)) * 0.01
+            self.state = float(y[-1])
+            if self.bound is not None:
+                # marche réfléchie sur ±bound: continue, sans débordement du type entier
+                u = np.mod(y + self.bound, 4 * self.bound)
+                y = np.where(u < 2 * self.bound, u, 4 * self.bound - u) - self.bound
+        else:
+            y = self.amp * (2 * np.mod(self.freq * t, 1.0) - 1)
+        return (y * self.scale).astype(self.dtype)
+
+class Digital:
+    """Canal TOR: bascule à des instants aléatoires (durée moyenne d'un état: mean_s)."""
+
+    def __init__(self, rate: float, rng: np.random.Generator, mean_s: float = 0.5):
+        self.rng, self.p, self.state = rng, 1.0 / max(mean_s * rate, 1.0), 0
+
+    def chunk(self, i0: int, n: int) -> np.ndarray:
+        flips = self.rng.random(n) < self.p
+        y = (self.state + np.cumsum(flips)) % 2
+        self.state = int(y[-1])
+        return y.astype(np.uint8)
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    dtype = DTYPES[args.dtype]
+    start = np.datetime64(args.start, "us")
+
+    total = int(args.size_gb * 1e9 / row_bytes(args)) if args.size_gb else int(args.duration * args.rate)
+    seg = max(1, args.segment_samples)
+    increment_us = 1e6 / args.rate
+
+    groups = []
+    for g in range(args.groups):
+        name = f"Group{g + 1}"
+        signals = [(f"AI{k + 1:03d}", Signal(WAVEFORMS[k % len(WAVEFORMS)], g * args.channels + k, args.rate, dtype, rng))
+                   for k in range(args.channels)]
+        digital = [(f"DI{k + 1:03d}", Digital(args.rate, rng)) for k in range(args.digital)]
+        groups.append((name, signals, digital))
+
+    def channel_props(kind: str, unit: str) -> dict:
+        props = {"NI_UnitDescription": unit, "Waveform": kind}
+        if args.time_track == "waveform":
+            props.update({"wf_start_time": start, "wf_start_offset": 0.0, "wf_increment": 1.0 / args.rate})
+        return props
+
+    print(f"{total} échantillons/canal ({total / args.rate:.1f} s à {args.rate:g} Hz), "
+          f"{args.groups * (args.channels + args.digital)} canaux, ~{total * row_bytes(args) / 1e9:.2f} Go -> {args.out}")
+
+    if not args.index and os.path.exists(args.out + "_index"):
+        os.remove(args.out + "_index")  # index d'un fichier précédent: ne correspondrait plus
+
+    t0 = time.perf_counter()
+    written = 0
+    with TdmsWriter(args.out, index_file=args.index) as w:
+        for seg_no, i0 in enumerate(range(0, total, seg)):
+            n = min(seg, total - i0)
+            first = seg_no == 0
+            segments = []
+            for name, signals, digital in groups:
+                objects = []
+                if first:
+                    # propriétés écrites une seule fois (premier segment), comme une acquisition NI
+                    if not segments:
+                        objects.append(RootObject(properties={
+                            "Title": "Scale test", "Generator": "make_scale_tdms.py",
+                            "SampleRate": args.rate, "Seed": args.seed, "CreatedAt": np.datetime64("now", "us"),
+                        }))
+                    objects.append(GroupObject(name, properties={"Rig": "Synthetic", "Channels": len(signals) + len(digital)}))
+                if args.time_track == "explicit":
+                    times = start + (np.arange(i0, i0 + n) * increment_us).astype("timedelta64[us]")
+                    objects.append(ChannelObject(name, "Time", times, properties={"NI_UnitDescription": "s"} if first else {}))
+                for ch_name, sig in signals:
+                    objects.append(ChannelObject(name, ch_name, sig.chunk(i0, n),
+                                                 properties=channel_props(sig.kind, "V") if first else {}))
+                for ch_name, dig in digital:
+                    objects.append(ChannelObject(name, ch_name, dig.chunk(i0, n),
+                                                 properties=channel_props("digital", "") if first else {}))
+                segments.append(objects)
+
+            if args.interleaved:
+                for objects in segments:
+                    w.write_segment(objects)
+            else:
+                w.write_segment([o for objects in segments for o in objects])
+
+            written += n
+            if seg_no % 50 == 0 or written == total:
+                elapsed = time.perf_counter() - t0
+                done = written * row_bytes(args)
+                print(f"  {written / total:6.1%}  {done / 1e9:7.2f} Go  {done / 1e6 / max(elapsed, 1e-9):7.1f} Mo/s")
+
+    print(f"OK -> {args.out} en {time.perf_counter() - t0:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from pathlib import Path
+import argparse, hashlib, io, json, os, sys, time
+
+from sqlmodel import Session, delete
+
+from app.config import settings
+from app.db import engine, init_db
+from app.io_tdms import tdms_metadata, tdms_to_parquet
+from app.models import Channel, Dataset, Property, SegmentIndex
+from app.properties import property_rows
+
+DATA_DIR = Path("data")
+
+def file_key(path: Path) -> dict:
+    """Identité d'un fichier pour la reprise: chemin + taille + date de modification."""
+    st = path.stat()
+    return {"path": str(path.resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def load_manifest(manifest: Path) -> dict[str, dict]:
+    """Fichiers déjà ingérés (dernière entrée 'done' par chemin)."""
+    done = {}
+    if not manifest.exists():
+        return done
+    for line in manifest.read_text(encoding="utf-8").splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue  # ligne tronquée par une interruption
+        if entry.get("status") == "done":
+            done[entry["path"]] = entry
+    return done
+
+def out_dir_for(path: Path) -> Path:
+    """Dossier de sortie déterministe: une reprise réécrit au même endroit au lieu de dupliquer."""
+    digest = hashlib.sha1(str(path.resolve()).encode("utf-8")).hexdigest()[:10]
+    return DATA_DIR / "bulk" / f"{path.stem}_{digest}"
+
+def convert(path: str, out_dir: str, profile: str, stats_block_rows: int, quiet: bool, lazy: bool = False) -> dict:
+    """Exécuté dans un processus du pool: conversion TDMS -> Parquet d'un fichier."""
+    t0 = time.perf_counter()
+    if lazy:
+        # métadonnées seules: le TDMS reste la source, chaque canal est converti à sa première lecture
+        meta, props = tdms_metadata(path, out_dir)
+        for m in meta:
+            m["source"] = str(Path(path).resolve())
+            # un Parquet d'une ingestion précédente ne correspond plus au fichier modifié
+            Path(m["parquet"]).unlink(missing_ok=True)
+    elif quiet:
+        with redirect_stdout(io.StringIO()):
+            meta, props = tdms_to_parquet(path, out_dir, profile, stats_block_rows)
+    else:
+        meta, props = tdms_to_parquet(path, out_dir, profile, stats_block_rows)
+    return {"meta": meta, "properties": props, "elapsed_s": time.perf_counter() - t0}
+
+def register(batch: list[dict], lazy: bool = False) -> list[int]:
+    """
+    Enregistre un lot de fichiers convertis (Datasets + Channels) en une seule transaction.
+    Un fichier modifié depuis sa dernière ingestion remplace son ancien Dataset
+    (ses Parquet ont été réécrits au même endroit); ses index de segments,
+    détectés sur les anciennes données, sont supprimés avec lui.
+    """
+    with Session(engine, expire_on_commit=False) as s:
+        for item in batch:
+            if item["replaces"] is not None:
+                s.exec(delete(Property).where(Property.dataset_id == item["replaces"]))
+                s.exec(delete(SegmentIndex).where(SegmentIndex.dataset_id == item["replaces"]))
+                s.exec(delete(Channel).where(Channel.dataset_id == item["replaces"]))
+                s.exec(delete(Dataset).where(Dataset.id == item["replaces"]))
+        datasets = []
+        for item in batch:
+            ds = Dataset(filename=item["filename"])
+            s.add(ds)
+            datasets.append(ds)
+        s.flush()  # attribue les ids sans valider
+        for ds, item in zip(datasets, batch):
+            channels = []
+            for m in item["meta"]:
+                channels.append(Channel(
+                    dataset_id=ds.id,
+                    group_name=m["group"],
+                    channel_name=m["channel"],
+                    n_rows=m["rows"],
+                    parquet_path=m["parquet"],
+                    has_time=m["has_time"],
+                    unit=m["unit"],
+                    source_path=m.get("source"),
+                    time_start=m.get("time_start"),
+                    time_end=m.get("time_end"),
+                    value_type=m.get("value_type"),
+                    # ingestion paresseuse: encodage connu à la matérialisation
+                    encoding=None if lazy else (m.get("encoding") or "plain"),
+                ))
+            s.add_all(channels)
+            s.flush()
+            s.add_all(property_rows(ds.id, item["properties"], {(c.group_name, c.channel_name): c.id for c in channels}))
+        s.commit()
+        return [ds.id for ds in datasets]
+
+def append_manifest(manifest: Path, entries: list[dict]):
+    with manifest.open("a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def main():
+    p = argparse.ArgumentParser(description="Ingestion en masse d'un dossier de fichiers TDMS (parallèle, reprise possible)")
+    p.add_argument("root", help="Dossier parcouru récursivement")
+    p.add_argument("--pattern", default="*.tdms", help="Motif des fichiers (défaut: *.tdms)")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processus de conversion")
+    p.add_argument("--batch", type=int, default=20, help="Fichiers enregistrés en base par transaction")
+    p.add_argument("--manifest", default=str(DATA_DIR / "bulk_manifest.jsonl"), help="Journal de reprise (JSONL)")
+    p.add_argument("--profile", default=settings.parquet_profile, help="Profil Parquet (fast-read, balanced, compact)")
+    p.add_argument("--quiet", action="store_true", help="Masque les traces de conversion par canal")
+    p.add_argument("--lazy", action="store_true", help="Enregistre les métadonnées seules (Parquet écrit à la première lecture)")
+    args = p.parse_args()
+
+    root = Path(args.root)
+    if not root.is_dir():
+        print(f"⚠️  Dossier introuvable: {root}", file=sys.stderr)
+        sys.exit(2)
+
+    init_db()
+    manifest = Path(args.manifest)
+    manifest.parent.mkdir(parents=True, exist_ok=True)
+    done = load_manifest(manifest)
+
+    files, skipped = [], 0
+    for path in sorted(root.rglob(args.pattern)):
+        if not path.is_file():
+            continue
+        key = file_key(path)
+        prev = done.get(key["path"])
+        if prev and prev["size"] == key["size"] and prev["mtime_ns"] == key["mtime_ns"]:
+            skipped += 1
+            continue
+        files.append((path, key, prev["dataset_id"] if prev else None))
+
+    total_bytes = sum(k["size"] for _, k, _ in files)
+    print(f"{len(files)} fichier(s) à ingérer ({total_bytes / 1e6:.1f} Mo), {skipped} déjà ingéré(s), {args.workers} processus")
+    if not files:
+        return
+
+    t0 = time.perf_counter()
+    batch, n_done, n_failed, n_rows, bytes_done = [], 0, 0, 0, 0
+
+    def flush():
+        nonlocal batch
+        if not batch:
+            return
+        ids = register(batch, args.lazy)
+        append_manifest(manifest, [
+            {**item["key"], "status": "done", "dataset_id": ds_id, "channels": len(item["meta"]),
+             "rows": item["rows"], "elapsed_s": round(item["elapsed_s"], 3)}
+            for ds_id, item in zip(ids, batch)
+        ])
+        batch = []
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(convert, str(path), str(out_dir_for(path)), args.profile, settings.stats_block_rows, args.quiet, args.lazy): (path, key, replaces)
+            for path, key, replaces in files
+        }
+        for fut in as_completed(futures):
+            path, key, replaces = futures[fut]
+            try:
+                result = fut.result()
+            except Exception as e:
+                n_failed += 1
+                print(f"✗ {path}: {e}", file=sys.stderr)
+                append_manifest(manifest, [{**key, "status": "error", "error": str(e)}])
+                continue
+
+            rows = sum(m["rows"] for m in result["meta"])
+            n_done += 1
+            n_rows += rows
+            bytes_done += key["size"]
+            batch.append({
+                "key": key,
+                "replaces": replaces,
+                "filename": path.relative_to(root).as_posix(),
+                "meta": result["meta"],
+                "properties": result["properties"],
+                "rows": rows,
+                "elapsed_s": result["elapsed_s"],
+            })
+            if len(batch) >= args.batch:
+                flush()
+
+            elapsed = time.perf_counter() - t0
+            print(f"[{n_done + n_failed}/{len(files)}] {path.name}: {len(result['meta'])} canaux, {rows} lignes "
+                  f"en {result['elapsed_s']:.2f}s  |  {n_done / elapsed:.2f} fichiers/s, {bytes_done / 1e6 / elapsed:.1f} Mo/s")
+        flush()
+
+    elapsed = time.perf_counter() - t0
+    print(f"Terminé en {elapsed:.1f}s: {n_done} fichier(s) ingéré(s), {n_failed} échec(s)")
+    print(f"Débit: {n_done / elapsed:.2f} fichiers/s, {bytes_done / 1e6 / elapsed:.1f} Mo/s, {n_rows / elapsed / 1e6:.2f} M lignes/s")
+    if n_failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,29 @@ import type { Dataset, Channel } from "../types";
 const API = process.env.NEXT_PUBLIC_API_BASE ?? "http://localhost:8000";
 
 type DsWithChannels = Dataset & { channels: Channel[] };
+type Align = "index" | "absolute" | "relative";
+type CompareResp = {
+  x: number[];
+  has_time: boolean;
+  mode: "absolute" | "relative";
+  series: { name: string; y: (number | null)[] }[];
+};
+
+// Message d'erreur FastAPI: detail est une chaîne (HTTPException) ou une liste (422)
+function errorDetail(body: any, r: Response): string {
+  if (typeof body?.detail === "string") return body.detail;
+  return body?.detail ? JSON.stringify(body.detail) : `${r.status} ${r.statusText}`;
+}
 
 export default function CompareGlobalPage() {
   const [all, setAll] = useState<DsWithChannels[]>([]);
   const [selected, setSelected] = useState<Set<number>>(new Set());
   const [points, setPoints] = useState(2000);
-  const [agg, setAgg] = useState<"mean"|"max"|"min">("max");
+  const [agg, setAgg] = useState<"mean"|"max"|"min"|"interp">("max");
+  const [align, setAlign] = useState<Align>("absolute");
   const [series, setSeries] = useState<Series[]|null>(null);
   const [loading, setLoading] = useState(false);
+  const [error, setError] = useState<string|null>(null);
 
   // Load every dataset + its channels
   useEffect(() => {
@@ -34,6 +49,16 @@ export default function CompareGlobalPage() {
 
   const totalSelected = selected.size;
 
+  // Canaux horodatés et indexés mélangés: /compare ne peut pas les aligner,
+  // on retombe sur le mode index
+  const mixed = useMemo(() => {
+    const kinds = new Set(
+      all.flatMap(d => d.channels).filter(c => selected.has(c.id)).map(c => c.has_time)
+    );
+    return kinds.size > 1;
+  }, [all, selected]);
+  const effectiveAlign: Align = mixed ? "index" : align;
+
   function toggle(id: number) {
     const s = new Set(selected);
     s.has(id) ? s.delete(id) : s.add(id);
@@ -54,12 +79,31 @@ export default function CompareGlobalPage() {
   async function compare() {
     if (!selected.size) return;
     setLoading(true);
+    setError(null);
     try {
       const ids = Array.from(selected).join(",");
-      const r = await fetch(`${API}/multi_window?channel_ids=${ids}&points=${points}&agg=${agg}`, { cache:"no-store" });
-      const j = await r.json(); // { series: [{name, x, y}] }
-      // PlotMulti accepts Series[] directly
-      setSeries(j.series);
+      if (effectiveAlign === "index") {
+        // Ancien mode: découpage par index de ligne, canal par canal
+        const a = agg === "interp" ? "mean" : agg;
+        const r = await fetch(`${API}/multi_window?channel_ids=${ids}&points=${points}&agg=${a}`, { cache:"no-store" });
+        const j = await r.json(); // { series: [{name, x, y}] }
+        if (!r.ok) throw new Error(errorDetail(j, r));
+        // PlotMulti accepts Series[] directly
+        setSeries(j.series);
+        return;
+      }
+      // Grille de temps commune calculée côté serveur: un seul x pour toutes les séries
+      const r = await fetch(`${API}/compare?channel_ids=${ids}&points=${points}&agg=${agg}&mode=${effectiveAlign}`, { cache:"no-store" });
+      const body = await r.json();
+      if (!r.ok) throw new Error(errorDetail(body, r));
+      const j: CompareResp = body;
+      const x = j.has_time && j.mode === "absolute"
+        ? j.x.map(t => new Date(t * 1000).toISOString())
+        : j.x;
+      setSeries(j.series.map(s => ({ name: s.name, x, y: s.y as number[] })));
+    } catch (e: any) {
+      setSeries(null);
+      setError(String(e?.message ?? e));
     } finally {
       setLoading(false);
     }
@@ -87,11 +131,20 @@ export default function CompareGlobalPage() {
             <option value="mean">mean</option>
             <option value="max">max</option>
             <option value="min">min</option>
+            <option value="interp" disabled={effectiveAlign === "index"}>interp</option>
+          </select>
+        </span>
+        <span> Alignement:&nbsp;
+          <select value={effectiveAlign} onChange={e=>setAlign(e.target.value as Align)}>
+            <option value="absolute" disabled={mixed}>temps absolu</option>
+            <option value="relative" disabled={mixed}>relatif au début</option>
+            <option value="index">index (sans alignement)</option>
           </select>
         </span>
         <button onClick={compare} disabled={!selected.size || loading}>
           {loading ? "Chargement…" : `Comparer (${totalSelected})`}
         </button>
+        {mixed && <span style={{fontSize:12, color:"#666"}}>canaux horodatés et indexés mélangés: alignement par index</span>}
       </div>
 
       {/* Datasets & channels list */}
@@ -134,7 +187,8 @@ export default function CompareGlobalPage() {
       </div>
 
       <div style={{marginTop:28}}>
-        {!series && <div>Sélectionne des canaux (de n’importe quels datasets) puis clique “Comparer”.</div>}
+        {error && <div style={{color:"crimson", marginBottom:8}}>Erreur: {error}</div>}
+        {!series && !error && <div>Sélectionne des canaux (de n’importe quels datasets) puis clique “Comparer”.</div>}
         {series && <PlotMulti series={series} title={title} />}
       </div>
     </main>
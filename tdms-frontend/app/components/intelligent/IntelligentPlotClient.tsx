@@ -25,7 +25,7 @@ interface IntelligentPlotProps {
     max_index?: number;
     has_time: boolean;
   };
-  onZoomReload?: (range: { start: number; end: number }) => Promise<{ x: number[]; y: number[]; }>;
+  onZoomReload?: (range: { start: number; end: number }, signal?: AbortSignal) => Promise<{ x: number[]; y: number[]; }>;
 }
 
 export default function IntelligentPlotClient({ 
@@ -1,4 +1,5 @@
 import { useState, useEffect, useCallback, useRef } from "react";
+import { isAbortError } from "../utils/viewportCache";
 
 interface IntelligentPlotData {
   x: (string | number)[];
@@ -22,13 +23,16 @@ interface BoundsAlert {
   timestamp: number;
 }
 
+// Délai de regroupement des événements relayout d'un même geste (zoom molette, pan)
+const RELAYOUT_DEBOUNCE_MS = 150;
+
 type DragMode = 'zoom' | 'pan' | 'select' | 'lasso' | 'drawclosedpath' | 'drawopenpath' | 'drawline' | 'drawrect' | 'drawcircle' | 'orbit' | 'turntable' | false;
 
 export function useIntelligentPlot(
   channelId: number,
   initialData: IntelligentPlotData,
   timeRange?: TimeRange,
-  onZoomReload?: (range: { start: number; end: number }) => Promise<{ x: number[]; y: number[]; }>
+  onZoomReload?: (range: { start: number; end: number }, signal?: AbortSignal) => Promise<{ x: number[]; y: number[]; }>
 ) {
   const [plotData, setPlotData] = useState(initialData);
   const [isLoading, setIsLoading] = useState(false);
@@ -37,15 +41,30 @@ export function useIntelligentPlot(
   const [boundsAlert, setBoundsAlert] = useState<BoundsAlert | null>(null);
   
   const lastZoomRef = useRef<{ start: number; end: number } | null>(null);
+  const debounceRef = useRef<ReturnType<typeof setTimeout> | null>(null);
+  const abortRef = useRef<AbortController | null>(null);
+
+  // Annule le rechargement en attente (debounce) et la requête en cours
+  const cancelPending = useCallback(() => {
+    if (debounceRef.current) {
+      clearTimeout(debounceRef.current);
+      debounceRef.current = null;
+    }
+    abortRef.current?.abort();
+    abortRef.current = null;
+  }, []);
 
   // Reset des données quand le channel change
   useEffect(() => {
+    cancelPending();
     setPlotData(initialData);
     setZoomLevel(0);
     lastZoomRef.current = null;
     setIsLoading(false);
     setBoundsAlert(null);
-  }, [channelId, initialData]);
+  }, [channelId, initialData, cancelPending]);
+
+  useEffect(() => cancelPending, [cancelPending]);
 
   // Auto-dismiss alert après 3 secondes
   useEffect(() => {
@@ -106,28 +125,41 @@ export function useIntelligentPlot(
       }
       
       lastZoomRef.current = { start, end };
-      
-      console.log(`Navigation détectée: ${start.toFixed(2)} → ${end.toFixed(2)}`);
-      
+
+      // Une nouvelle vue remplace la précédente: la requête en cours est annulée
+      // et les événements rapprochés d'un même geste sont regroupés
+      cancelPending();
       setIsLoading(true);
-      try {
-        const newData = await onZoomReload({ start, end });
-        
-        setPlotData(prev => ({
-          ...prev,
-          x: newData.x,
-          y: newData.y
-        }));
-        
-        setZoomLevel(prev => prev + 1);
-        
-        console.log(`Données rechargées: ${newData.x.length} points dans la zone`);
-        
-      } catch (error) {
-        console.error('Erreur rechargement:', error);
-      } finally {
-        setIsLoading(false);
-      }
+      debounceRef.current = setTimeout(async () => {
+        debounceRef.current = null;
+        const controller = new AbortController();
+        abortRef.current = controller;
+
+        console.log(`Navigation détectée: ${start.toFixed(2)} → ${end.toFixed(2)}`);
+
+        try {
+          const newData = await onZoomReload({ start, end }, controller.signal);
+          if (controller.signal.aborted) return;
+
+          setPlotData(prev => ({
+            ...prev,
+            x: newData.x,
+            y: newData.y
+          }));
+          
+          setZoomLevel(prev => prev + 1);
+          
+          console.log(`Données rechargées: ${newData.x.length} points dans la zone`);
+          
+        } catch (error) {
+          if (!isAbortError(error)) console.error('Erreur rechargement:', error);
+        } finally {
+          if (abortRef.current === controller) {
+            abortRef.current = null;
+            setIsLoading(false);
+          }
+        }
+      }, RELAYOUT_DEBOUNCE_MS);
     }
     
     // Reset sur double-clic (auto-scale)
@@ -135,15 +167,17 @@ export function useIntelligentPlot(
       console.log('Reset zoom détecté');
       handleResetZoom();
     }
-  }, [onZoomReload, initialData, currentDragMode, checkBounds]);
+  }, [onZoomReload, initialData, currentDragMode, checkBounds, cancelPending]);
 
   // Fonction de reset accessible depuis l'extérieur
   const handleResetZoom = useCallback(() => {
+    cancelPending();
+    setIsLoading(false);
     setPlotData(initialData);
     setZoomLevel(0);
     lastZoomRef.current = null;
     setBoundsAlert(null);
-  }, [initialData]);
+  }, [initialData, cancelPending]);
 
   return {
     // États
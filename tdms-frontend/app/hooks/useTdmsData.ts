@@ -1,4 +1,5 @@
-import { useState, useEffect, useCallback } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
+import { ViewportTileCache, tilesForView, tileAt, mergeTiles, whenIdle, isAbortError } from "../utils/viewportCache";
 
 interface Dataset {
   id: number;
@@ -41,6 +42,11 @@ interface TimeRange {
 
 const API = process.env.NEXT_PUBLIC_API_BASE ?? "http://localhost:8000";
 
+// Nombre de tuiles de zoom gardées en mémoire (tous canaux confondus)
+const TILE_CACHE_SIZE = 64;
+// Vues globales gardées en mémoire (retour instantané sur un canal déjà affiché)
+const GLOBAL_CACHE_SIZE = 8;
+
 export function useTdmsData() {
   const [datasets, setDatasets] = useState<Dataset[]>([]);
   const [datasetId, setDatasetId] = useState<number | null>(null);
@@ -50,6 +56,11 @@ export function useTdmsData() {
   const [globalData, setGlobalData] = useState<FilteredWindowResp | null>(null);
   const [loading, setLoading] = useState(false);
 
+  const tileCacheRef = useRef(new ViewportTileCache(TILE_CACHE_SIZE));
+  const globalCacheRef = useRef(new ViewportTileCache<FilteredWindowResp>(GLOBAL_CACHE_SIZE));
+  const globalAbortRef = useRef<AbortController | null>(null);
+  const prefetchAbortRef = useRef<AbortController | null>(null);
+
   // Chargement des datasets
   const loadDatasets = useCallback(async () => {
     try {
@@ -94,12 +105,16 @@ export function useTdmsData() {
     }
   }, []);
 
-  // Chargement de la vue globale
+  // Chargement de la vue globale (la requête précédente est annulée si l'utilisateur change de canal)
   const loadGlobalView = useCallback(async (
     selectedChannelId: number, 
     globalPoints: number, 
     initialLimit: number
   ) => {
+    globalAbortRef.current?.abort();
+    const controller = new AbortController();
+    globalAbortRef.current = controller;
+
     setLoading(true);
     try {
       const params = new URLSearchParams({
@@ -109,47 +124,77 @@ export function useTdmsData() {
         limit: initialLimit.toString()
       });
 
-      const response = await fetch(`${API}/get_window_filtered?${params}`, { cache: "no-store" });
-      if (!response.ok) throw new Error(await response.text());
-      const result = await response.json();
+      const result = await globalCacheRef.current.load(
+        params.toString(),
+        `${API}/get_window_filtered?${params}`,
+        controller.signal
+      );
 
       setGlobalData(result);
       console.log(`Vue globale chargée: ${result.original_points} → ${result.sampled_points} points`);
     } catch (error) {
-      console.error("Erreur chargement vue globale:", error);
+      if (!isAbortError(error)) console.error("Erreur chargement vue globale:", error);
     } finally {
-      setLoading(false);
+      if (globalAbortRef.current === controller) setLoading(false);
     }
   }, []);
 
-  // Fonction de rechargement pour le zoom
+  // Fonction de rechargement pour le zoom: la vue est servie par tuiles (cache LRU
+  // par canal et niveau de zoom), puis les tuiles voisines sont préchargées à l'inactivité
   const createZoomReloadHandler = useCallback((zoomPoints: number) => {
-    return async (range: { start: number; end: number }) => {
-      if (!channelId || !timeRange) {
-        throw new Error("Channel ou time range non disponible");
-      }
-
-      console.log(`Rechargement zoom: ${range.start.toFixed(2)} → ${range.end.toFixed(2)}`);
-
+    const tileUrl = (tile: { start: number; end: number }) => {
       const params = new URLSearchParams({
-        channel_id: channelId.toString(),
-        start_timestamp: range.start.toString(),
-        end_timestamp: range.end.toString(),
+        channel_id: channelId!.toString(),
+        start_timestamp: tile.start.toString(),
+        end_timestamp: tile.end.toString(),
         points: zoomPoints.toString(),
         method: "lttb",
         limit: "200000"
       });
+      return `${API}/get_window_filtered?${params}`;
+    };
+    const tileKey = (level: number, index: number) => `${channelId}:${zoomPoints}:${level}:${index}`;
 
-      const response = await fetch(`${API}/get_window_filtered?${params}`, { cache: "no-store" });
-      if (!response.ok) throw new Error(await response.text());
-      const result = await response.json();
+    return async (range: { start: number; end: number }, signal?: AbortSignal) => {
+      if (!channelId || !timeRange) {
+        throw new Error("Channel ou time range non disponible");
+      }
 
-      console.log(`Zoom rechargé: ${result.original_points} → ${result.sampled_points} points dans la zone`);
+      const min = timeRange.has_time ? timeRange.min_timestamp! : timeRange.min_index!;
+      const max = timeRange.has_time ? timeRange.max_timestamp! : timeRange.max_index!;
+      const cache = tileCacheRef.current;
+      const tiles = tilesForView(range.start, range.end, min, max);
+      const hits = tiles.filter(tile => cache.has(tileKey(tile.level, tile.index))).length;
+
+      console.log(`Rechargement zoom: ${range.start.toFixed(2)} → ${range.end.toFixed(2)} (niveau ${tiles[0].level}, ${tiles.length} tuile(s), ${hits} en cache)`);
+
+      // les tuiles de la vue sont demandées avant d'annuler les préchargements:
+      // une tuile en cours de préchargement et nécessaire ici n'est pas annulée
+      const foreground = signal ?? new AbortController().signal;
+      const loading = tiles.map(tile => cache.load(tileKey(tile.level, tile.index), tileUrl(tile), foreground));
+      prefetchAbortRef.current?.abort();
+      const loaded = await Promise.all(loading);
+
+      // préchargement des tuiles voisines (gauche/droite) au même niveau
+      const prefetch = new AbortController();
+      prefetchAbortRef.current = prefetch;
+      const level = tiles[0].level;
+      const neighbours = [tiles[0].index - 1, tiles[tiles.length - 1].index + 1]
+        .filter(index => index >= 0 && index < 2 ** level)
+        .map(index => tileAt(level, index, min, max))
+        .filter(tile => !cache.has(tileKey(tile.level, tile.index)));
+      if (neighbours.length) {
+        const cancelIdle = whenIdle(() => {
+          neighbours.forEach(tile => {
+            cache.load(tileKey(tile.level, tile.index), tileUrl(tile), prefetch.signal).catch(error => {
+              if (!isAbortError(error)) console.warn("Préchargement échoué:", error);
+            });
+          });
+        });
+        prefetch.signal.addEventListener("abort", cancelIdle, { once: true });
+      }
 
-      return {
-        x: result.x,
-        y: result.y
-      };
+      return mergeTiles(loaded);
     };
   }, [channelId, timeRange]);
 
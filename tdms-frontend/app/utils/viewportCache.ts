@@ -0,0 +1,174 @@
+// Cache de tuiles de vue (par canal et niveau de zoom) pour le zoom intelligent.
+//
+// La plage complète d'un canal est découpée en 2^niveau tuiles alignées; le
+// niveau est choisi pour que la largeur d'une tuile soit entre 1 et 2 fois
+// celle de la vue, donc une vue est couverte par une ou deux tuiles. Une
+// tuile déjà chargée est réutilisée à l'identique quand on revient sur une
+// zone, et les tuiles voisines peuvent être préchargées.
+
+export interface Tile {
+  x: number[];
+  y: number[];
+}
+
+export interface TileSpec {
+  level: number;
+  index: number;
+  start: number;
+  end: number;
+}
+
+interface Pending<T> {
+  promise: Promise<T>;
+  controller: AbortController;
+  waiters: number;
+}
+
+// Nombre de niveaux de zoom au-delà duquel on ne subdivise plus
+const MAX_LEVEL = 40;
+
+export function tileLevel(viewStart: number, viewEnd: number, min: number, max: number): number {
+  const span = max - min;
+  const view = viewEnd - viewStart;
+  if (!(span > 0) || !(view > 0) || view >= span) return 0;
+  return Math.min(MAX_LEVEL, Math.floor(Math.log2(span / view)));
+}
+
+export function tileAt(level: number, index: number, min: number, max: number): TileSpec {
+  const width = (max - min) / 2 ** level;
+  return { level, index, start: min + index * width, end: min + (index + 1) * width };
+}
+
+// Tuiles (au niveau adapté) qui recouvrent [viewStart, viewEnd], bornées à la plage du canal
+export function tilesForView(viewStart: number, viewEnd: number, min: number, max: number): TileSpec[] {
+  const level = tileLevel(viewStart, viewEnd, min, max);
+  const count = 2 ** level;
+  const width = (max - min) / count;
+  if (!(width > 0)) return [tileAt(0, 0, min, max)];
+
+  const clamp = (i: number) => Math.min(count - 1, Math.max(0, i));
+  const first = clamp(Math.floor((viewStart - min) / width));
+  const last = clamp(Math.floor((viewEnd - min) / width));
+  const tiles: TileSpec[] = [];
+  for (let i = first; i <= last; i++) tiles.push(tileAt(level, i, min, max));
+  return tiles;
+}
+
+// Concatène des tuiles contiguës (triées) en retirant les doublons de bord
+export function mergeTiles(tiles: Tile[]): Tile {
+  const x: number[] = [];
+  const y: number[] = [];
+  for (const tile of tiles) {
+    const last = x.length ? x[x.length - 1] : -Infinity;
+    for (let i = 0; i < tile.x.length; i++) {
+      if (tile.x[i] <= last) continue;
+      x.push(tile.x[i]);
+      y.push(tile.y[i]);
+    }
+  }
+  return { x, y };
+}
+
+function abortError() {
+  return new DOMException("Requête annulée", "AbortError");
+}
+
+export function isAbortError(error: unknown) {
+  return error instanceof DOMException && error.name === "AbortError";
+}
+
+// Appelle fn quand le navigateur est inactif (setTimeout en repli); renvoie une fonction d'annulation
+export function whenIdle(fn: () => void): () => void {
+  if (typeof window !== "undefined" && "requestIdleCallback" in window) {
+    const handle = window.requestIdleCallback(fn, { timeout: 1000 });
+    return () => window.cancelIdleCallback(handle);
+  }
+  const handle = setTimeout(fn, 50);
+  return () => clearTimeout(handle);
+}
+
+/**
+ * LRU borné (en nombre de tuiles) + dédoublonnage des requêtes en cours.
+ * Une requête partagée n'est réellement annulée que lorsque tous ceux qui
+ * l'attendent ont annulé: un préchargement repris par la vue courante survit
+ * à l'annulation des préchargements.
+ */
+export class ViewportTileCache<T extends Tile = Tile> {
+  private tiles = new Map<string, T>();
+  private pending = new Map<string, Pending<T>>();
+
+  constructor(private maxTiles: number) {}
+
+  get(key: string): T | undefined {
+    const tile = this.tiles.get(key);
+    if (tile) {
+      // réinsertion = plus récemment utilisé
+      this.tiles.delete(key);
+      this.tiles.set(key, tile);
+    }
+    return tile;
+  }
+
+  has(key: string) {
+    return this.tiles.has(key) || this.pending.has(key);
+  }
+
+  private set(key: string, tile: T) {
+    this.tiles.delete(key);
+    this.tiles.set(key, tile);
+    while (this.tiles.size > this.maxTiles) {
+      this.tiles.delete(this.tiles.keys().next().value!);
+    }
+  }
+
+  // Charge une réponse JSON {x, y, ...} (cache, requête déjà en cours, ou nouvelle requête sur url)
+  load(key: string, url: string, signal: AbortSignal): Promise<T> {
+    const cached = this.get(key);
+    if (cached) return Promise.resolve(cached);
+    if (signal.aborted) return Promise.reject(abortError());
+
+    let entry = this.pending.get(key);
+    if (!entry) {
+      const controller = new AbortController();
+      const created: Pending<T> = {
+        controller,
+        waiters: 0,
+        promise: fetch(url, { cache: "no-store", signal: controller.signal })
+          .then(async response => {
+            if (!response.ok) throw new Error(await response.text());
+            const tile: T = await response.json();
+            this.set(key, tile);
+            return tile;
+          })
+          .finally(() => {
+            if (this.pending.get(key) === created) this.pending.delete(key);
+          })
+      };
+      this.pending.set(key, created);
+      entry = created;
+    }
+
+    const shared = entry;
+    shared.waiters++;
+    return new Promise<T>((resolve, reject) => {
+      const onAbort = () => {
+        shared.waiters--;
+        if (shared.waiters === 0) {
+          shared.controller.abort();
+          if (this.pending.get(key) === shared) this.pending.delete(key);
+        }
+        reject(abortError());
+      };
+      signal.addEventListener("abort", onAbort, { once: true });
+      shared.promise
+        .then(resolve, reject)
+        .finally(() => signal.removeEventListener("abort", onAbort));
+    });
+  }
+
+  clear() {
+    this.pending.forEach(entry => entry.controller.abort());
+    this.pending.clear();
+    this.tiles.clear();
+  }
+}